@@ -8,17 +8,14 @@ from alembic import context
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 from app.models import Base
-from app.config import settings
+from app.database import SQLALCHEMY_DATABASE_URL
 
 # This is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
 # set the sqlalchemy url
-config.set_main_option(
-    "sqlalchemy.url", 
-    f"postgresql://{settings.database_user}:{settings.database_password}@{settings.database_host}:{settings.database_port}/{settings.database_name}"
-)
+config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
@@ -75,8 +72,11 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        # One transaction per migration file, so locks taken by one migration are released
+        # before the next starts (and app.migration_helpers can commit between batches)
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            transaction_per_migration=True,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,53 @@
+"""Add restaurant and menu item daily sales rollup tables
+
+Revision ID: 3fd1dce4087c
+Revises: ca9b6b0e47c3
+Create Date: 2026-10-19 10:00:00.000000
+
+Tables start empty; fill them with `python -m app.jobs.rebuild_sales_rollups`
+after upgrading.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3fd1dce4087c'
+down_revision: Union[str, Sequence[str], None] = 'ca9b6b0e47c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('restaurant_daily_sales',
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('order_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('cancelled_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('delivered_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('revenue', sa.Float(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('restaurant_id', 'day')
+    )
+    op.create_table('menu_item_daily_sales',
+    sa.Column('menu_item_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('revenue', sa.Float(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['menu_item_id'], ['restaurant_menu_items.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('menu_item_id', 'day')
+    )
+    op.create_index('ix_menu_item_daily_sales_restaurant_day', 'menu_item_daily_sales', ['restaurant_id', 'day'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_menu_item_daily_sales_restaurant_day', table_name='menu_item_daily_sales')
+    op.drop_table('menu_item_daily_sales')
+    op.drop_table('restaurant_daily_sales')
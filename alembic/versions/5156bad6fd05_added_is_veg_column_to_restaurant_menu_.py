@@ -1,7 +1,7 @@
 """Added is_veg column to restaurant_menu_item table
 
 Revision ID: 5156bad6fd05
-Revises: 
+Revises: 0542de197855
 Create Date: 2025-12-18 10:31:29.486838
 
 """
@@ -13,7 +13,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = '5156bad6fd05'
-down_revision: Union[str, Sequence[str], None] = None
+down_revision: Union[str, Sequence[str], None] = '0542de197855'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
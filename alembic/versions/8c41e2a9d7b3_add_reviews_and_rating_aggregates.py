@@ -0,0 +1,57 @@
+"""Add reviews table and running rating aggregates on restaurants
+
+Revision ID: 8c41e2a9d7b3
+Revises: 3fd1dce4087c
+Create Date: 2026-10-19 12:00:00.000000
+
+Existing restaurants start with rating_sum = rating_count = 0; their admin set
+rating is left as is until the first review (or the next run of
+`python -m app.jobs.reaggregate_ratings`) replaces it.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41e2a9d7b3'
+down_revision: Union[str, Sequence[str], None] = '3fd1dce4087c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('restaurants', sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('restaurants', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_restaurants_rating', 'restaurants', ['rating', 'id'], unique=False)
+
+    op.create_table('reviews',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('rating', sa.SmallInteger(), nullable=False),
+    sa.Column('comment', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.CheckConstraint('rating BETWEEN 1 AND 5', name='ck_reviews_rating'),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('order_id')
+    )
+    op.create_index(op.f('ix_reviews_id'), 'reviews', ['id'], unique=False)
+    op.create_index('ix_reviews_restaurant_id_id', 'reviews', ['restaurant_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reviews_restaurant_id_id', table_name='reviews')
+    op.drop_index(op.f('ix_reviews_id'), table_name='reviews')
+    op.drop_table('reviews')
+
+    op.drop_index('ix_restaurants_rating', table_name='restaurants')
+    op.drop_column('restaurants', 'rating_count')
+    op.drop_column('restaurants', 'rating_sum')
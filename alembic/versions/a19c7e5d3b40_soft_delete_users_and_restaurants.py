@@ -0,0 +1,63 @@
+"""Soft delete for users and restaurants, partial indexes on live rows
+
+Revision ID: a19c7e5d3b40
+Revises: f3a8d61c29e4
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a19c7e5d3b40'
+down_revision: Union[str, Sequence[str], None] = 'f3a8d61c29e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LIVE = sa.text('deleted_at IS NULL')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.add_column('restaurants', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+    # Unique among live users only (the unnamed constraints from the initial schema)
+    op.drop_constraint('users_email_key', 'users', type_='unique')
+    op.drop_constraint('users_phone_number_key', 'users', type_='unique')
+    op.create_index('uq_users_email', 'users', ['email'], unique=True, postgresql_where=LIVE)
+    op.create_index('uq_users_phone_number', 'users', ['phone_number'], unique=True, postgresql_where=LIVE)
+    op.create_index('ix_users_name', 'users', ['name'], unique=False, postgresql_where=LIVE)
+
+    op.drop_index('ix_restaurants_rating', table_name='restaurants')
+    op.create_index('ix_restaurants_rating', 'restaurants', ['rating', 'id'], unique=False, postgresql_where=LIVE)
+    op.drop_constraint('uq_restaurants_name', 'restaurants', type_='unique')
+    op.create_index('uq_restaurants_name', 'restaurants', ['name'], unique=True, postgresql_where=LIVE)
+    op.create_index('ix_restaurants_owner_id', 'restaurants', ['owner_id'], unique=False, postgresql_where=LIVE)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Soft deleted rows could violate the full unique constraints and would reappear as live
+    bind = op.get_bind()
+    for table in ('restaurants', 'users'):
+        if bind.execute(sa.text(f"SELECT count(*) FROM {table} WHERE deleted_at IS NOT NULL")).scalar():
+            raise RuntimeError(f"{table} has soft deleted rows, run `python -m app.jobs.purge_deleted --grace-days 0` first")
+
+    op.drop_index('ix_restaurants_owner_id', table_name='restaurants', postgresql_where=LIVE)
+    op.drop_index('uq_restaurants_name', table_name='restaurants', postgresql_where=LIVE)
+    op.create_unique_constraint('uq_restaurants_name', 'restaurants', ['name'])
+    op.drop_index('ix_restaurants_rating', table_name='restaurants', postgresql_where=LIVE)
+    op.create_index('ix_restaurants_rating', 'restaurants', ['rating', 'id'], unique=False)
+
+    op.drop_index('ix_users_name', table_name='users', postgresql_where=LIVE)
+    op.drop_index('uq_users_phone_number', table_name='users', postgresql_where=LIVE)
+    op.drop_index('uq_users_email', table_name='users', postgresql_where=LIVE)
+    op.create_unique_constraint('users_phone_number_key', 'users', ['phone_number'])
+    op.create_unique_constraint('users_email_key', 'users', ['email'])
+
+    op.drop_column('restaurants', 'deleted_at')
+    op.drop_column('users', 'deleted_at')
@@ -0,0 +1,102 @@
+"""Case-insensitive unique emails and E.164 phone numbers, the keys /login looks users up by
+
+Revision ID: a6d3f8b2e915
+Revises: f9d4a1c6e2b7
+Create Date: 2026-10-22 10:00:00.000000
+
+uq_users_email_lower replaces uq_users_email. Building it fails if two live
+users have emails differing only in case; resolve those first:
+
+    SELECT lower(email) FROM users WHERE deleted_at IS NULL GROUP BY 1 HAVING count(*) > 1;
+
+Live users' phone numbers are rewritten to E.164 (as app.utils.normalize_phone
+did at this revision) in batches. A number that would collide with another
+user's, or that can't be parsed, is left as it is and logged; those users can
+still log in by email. Offline (--sql) the rewrite is skipped with a warning,
+it needs to read the rows.
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import context, op
+import phonenumbers
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+
+from app import migration_helpers as mh
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d3f8b2e915'
+down_revision: Union[str, Sequence[str], None] = 'f9d4a1c6e2b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5_000
+
+# Phone numbers without a country code are taken as Indian
+PHONE_REGION = "IN"
+
+
+def _normalize_phone(phone_number: str) -> str | None:
+    # A copy of app.utils.normalize_phone, so later changes to it don't change this migration
+    try:
+        parsed = phonenumbers.parse(phone_number, PHONE_REGION)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_possible_number(parsed):
+        return None
+    return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+
+
+def _normalize_phone_numbers() -> None:
+    if context.is_offline_mode():
+        logger.warning("Offline mode: phone numbers are not rewritten to E.164, users with local numbers log in by email")
+        return
+    update = sa.text("UPDATE users SET phone_number = :phone_number WHERE id = :id")
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        last_id = 0
+        while True:
+            rows = conn.execute(sa.text(
+                "SELECT id, phone_number FROM users WHERE id > :last_id AND deleted_at IS NULL ORDER BY id LIMIT :limit"
+            ), {"last_id": last_id, "limit": BATCH_SIZE}).all()
+            if not rows:
+                return
+            last_id = rows[-1].id
+
+            changes = []
+            for row in rows:
+                phone_number = _normalize_phone(row.phone_number)
+                if phone_number is None:
+                    logger.warning("User %s: phone number %r is not valid, left as is", row.id, row.phone_number)
+                elif phone_number != row.phone_number:
+                    changes.append({"id": row.id, "phone_number": phone_number})
+            if not changes:
+                continue
+            try:
+                conn.execute(update, changes)
+            except IntegrityError:
+                # Row by row to find the collisions; rows already rewritten are simply written again
+                for change in changes:
+                    try:
+                        conn.execute(update, change)
+                    except IntegrityError:
+                        logger.warning("User %s: %s belongs to another user, left as is", change["id"], change["phone_number"])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    mh.create_index('uq_users_email_lower', 'users', [sa.text('lower(email)')], unique=True, where='deleted_at IS NULL')
+    mh.drop_index('uq_users_email', 'users')
+    _normalize_phone_numbers()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Phone numbers stay in E.164
+    mh.create_index('uq_users_email', 'users', ['email'], unique=True, where='deleted_at IS NULL')
+    mh.drop_index('uq_users_email_lower', 'users')
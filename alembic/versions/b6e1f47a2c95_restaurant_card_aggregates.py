@@ -0,0 +1,71 @@
+"""Menu card aggregates on restaurants
+
+Revision ID: b6e1f47a2c95
+Revises: a19c7e5d3b40
+Create Date: 2026-10-20 15:00:00.000000
+
+menu_item_count / veg_item_count / min_price / max_price / is_pure_veg are
+maintained by svc_menu from this release on. The columns are added with
+constant defaults (no rewrite) and backfilled in batches; menu writes made by
+the previous release while the backfill runs are not counted, so run
+`python -m app.jobs.reaggregate_ratings` (which also refreshes the cards)
+once the new code is deployed.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app import migration_helpers as mh
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e1f47a2c95'
+down_revision: Union[str, Sequence[str], None] = 'a19c7e5d3b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MENU = "FROM restaurant_menu_items m WHERE m.restaurant_id = restaurants.id"
+VEG_MENU = (
+    "FROM restaurant_menu_items m JOIN global_dishes d ON d.id = m.global_dish_id "
+    "WHERE m.restaurant_id = restaurants.id"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    mh.add_column('restaurants', sa.Column('menu_item_count', sa.Integer(), nullable=False, server_default='0'))
+    mh.add_column('restaurants', sa.Column('veg_item_count', sa.Integer(), nullable=False, server_default='0'))
+    mh.add_column('restaurants', sa.Column('min_price', sa.Float(), nullable=True))
+    mh.add_column('restaurants', sa.Column('max_price', sa.Float(), nullable=True))
+    mh.add_column('restaurants', sa.Column('is_pure_veg', sa.Boolean(), nullable=False, server_default=sa.text('false')))
+
+    # Restaurants without a menu already have the right values; done rows have the right count
+    mh.backfill(
+        'restaurants',
+        set_=(
+            f"menu_item_count = (SELECT count(*) {MENU}), "
+            f"veg_item_count = (SELECT count(*) {VEG_MENU} AND d.is_veg), "
+            f"min_price = (SELECT min(m.price) {MENU}), "
+            f"max_price = (SELECT max(m.price) {MENU}), "
+            f"is_pure_veg = (SELECT count(*) > 0 AND count(*) = sum(CASE WHEN d.is_veg THEN 1 ELSE 0 END) {VEG_MENU})"
+        ),
+        where=f"menu_item_count <> (SELECT count(*) {MENU})",
+        batch_size=1_000,
+    )
+
+    mh.create_index('ix_restaurants_min_price', 'restaurants', ['min_price', 'id'], where='deleted_at IS NULL')
+    mh.create_index('ix_restaurants_menu_item_count', 'restaurants', ['menu_item_count', 'id'], where='deleted_at IS NULL')
+    mh.create_index('ix_restaurants_pure_veg', 'restaurants', ['rating', 'id'], where='is_pure_veg AND deleted_at IS NULL')
+    mh.create_index('ix_restaurant_menu_items_global_dish_id', 'restaurant_menu_items', ['global_dish_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    mh.drop_index('ix_restaurant_menu_items_global_dish_id', 'restaurant_menu_items')
+    mh.drop_index('ix_restaurants_pure_veg', 'restaurants')
+    mh.drop_index('ix_restaurants_menu_item_count', 'restaurants')
+    mh.drop_index('ix_restaurants_min_price', 'restaurants')
+    for column in ('is_pure_veg', 'max_price', 'min_price', 'veg_item_count', 'menu_item_count'):
+        mh.run_with_lock_retries(lambda column=column: op.drop_column('restaurants', column))
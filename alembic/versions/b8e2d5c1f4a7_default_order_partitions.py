@@ -0,0 +1,146 @@
+"""DEFAULT partitions for orders and order_items
+
+Revision ID: b8e2d5c1f4a7
+Revises: a6d3f8b2e915
+Create Date: 2026-10-23 09:00:00.000000
+
+Orders placed in a month without a partition (app.jobs.order_partitions not run
+for months_ahead months) used to fail with "no partition of relation found";
+they now land in orders_default / order_items_default. create_order_partitions()
+moves such rows into the month's partition when it creates it, including months
+already past. app/partitions.py reports rows waiting in the default partitions.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e2d5c1f4a7'
+down_revision: Union[str, Sequence[str], None] = 'a6d3f8b2e915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# A partition can't be attached while the default partition holds rows in its range, so a
+# missing month is built as a plain table, the month's rows are moved into it from the
+# default partition, and only then attached. Items are moved before the orders they
+# reference (deleting a referenced order fails) and attached after them (attaching
+# validates the foreign key).
+CREATE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_order_partitions(
+    months_ahead integer DEFAULT 3,
+    from_month date DEFAULT date_trunc('month', now())::date
+) RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    partition_month date;
+    month_end date;
+    suffix text;
+    new_orders boolean;
+    new_items boolean;
+    created integer := 0;
+BEGIN
+    FOR partition_month IN
+        SELECT generate_series(
+            LEAST(date_trunc('month', from_month), (SELECT date_trunc('month', min(created_at)) FROM orders_default)),
+            date_trunc('month', now()) + make_interval(months => months_ahead),
+            interval '1 month'
+        )::date
+    LOOP
+        month_end := partition_month + interval '1 month';
+        suffix := to_char(partition_month, '"y"YYYY"m"MM');
+        new_orders := to_regclass('orders_' || suffix) IS NULL;
+        new_items := to_regclass('order_items_' || suffix) IS NULL;
+
+        IF new_items THEN
+            EXECUTE format(
+                'CREATE TABLE %I (LIKE order_items INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', 'order_items_' || suffix
+            );
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM order_items_default WHERE created_at >= %L AND created_at < %L RETURNING *) '
+                || 'INSERT INTO %I SELECT * FROM moved',
+                partition_month, month_end, 'order_items_' || suffix
+            );
+        END IF;
+        IF new_orders THEN
+            EXECUTE format(
+                'CREATE TABLE %I (LIKE orders INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', 'orders_' || suffix
+            );
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM orders_default WHERE created_at >= %L AND created_at < %L RETURNING *) '
+                || 'INSERT INTO %I SELECT * FROM moved',
+                partition_month, month_end, 'orders_' || suffix
+            );
+            EXECUTE format(
+                'ALTER TABLE orders ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                'orders_' || suffix, partition_month, month_end
+            );
+            created := created + 1;
+        END IF;
+        IF new_items THEN
+            EXECUTE format(
+                'ALTER TABLE order_items ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                'order_items_' || suffix, partition_month, month_end
+            );
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$;
+"""
+
+# As created by ca9b6b0e47c3
+PREVIOUS_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_order_partitions(
+    months_ahead integer DEFAULT 3,
+    from_month date DEFAULT date_trunc('month', now())::date
+) RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    partition_month date;
+    suffix text;
+    created integer := 0;
+BEGIN
+    FOR partition_month IN
+        SELECT generate_series(
+            date_trunc('month', from_month),
+            date_trunc('month', now()) + make_interval(months => months_ahead),
+            interval '1 month'
+        )::date
+    LOOP
+        suffix := to_char(partition_month, '"y"YYYY"m"MM');
+        IF to_regclass('orders_' || suffix) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF orders FOR VALUES FROM (%L) TO (%L)',
+                'orders_' || suffix, partition_month, partition_month + interval '1 month'
+            );
+            created := created + 1;
+        END IF;
+        IF to_regclass('order_items_' || suffix) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF order_items FOR VALUES FROM (%L) TO (%L)',
+                'order_items_' || suffix, partition_month, partition_month + interval '1 month'
+            );
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE TABLE orders_default PARTITION OF orders DEFAULT")
+    op.execute("CREATE TABLE order_items_default PARTITION OF order_items DEFAULT")
+    op.execute(CREATE_PARTITIONS_FUNCTION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Moves anything in the default partitions into monthly ones before dropping them
+    op.execute("SELECT create_order_partitions(0)")
+    op.execute(PREVIOUS_PARTITIONS_FUNCTION)
+    op.drop_table('order_items_default')
+    op.drop_table('orders_default')
@@ -0,0 +1,45 @@
+"""One pending order export per restaurant, month and format
+
+Revision ID: c3f7a9d2e6b1
+Revises: b8e2d5c1f4a7
+Create Date: 2026-10-24 09:00:00.000000
+
+Two concurrent POST /dashboard/exports could both queue the same export.
+Duplicates already pending are marked FAILED, keeping the oldest, before the
+unique index is built.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app import migration_helpers as mh
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f7a9d2e6b1'
+down_revision: Union[str, Sequence[str], None] = 'b8e2d5c1f4a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PENDING = "status IN ('QUEUED', 'RUNNING')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(f"""
+        UPDATE order_exports SET status = 'FAILED', finished_at = CURRENT_TIMESTAMP, locked_until = NULL,
+            error = 'Duplicate of an earlier export'
+        WHERE {PENDING} AND EXISTS (
+            SELECT 1 FROM order_exports earlier
+            WHERE earlier.restaurant_id = order_exports.restaurant_id AND earlier.month = order_exports.month
+                AND earlier.format = order_exports.format AND earlier.{PENDING} AND earlier.id < order_exports.id
+        )
+    """)
+    mh.create_index('uq_order_exports_pending', 'order_exports', ['restaurant_id', 'month', 'format'], unique=True, where=PENDING)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    mh.drop_index('uq_order_exports_pending', 'order_exports')
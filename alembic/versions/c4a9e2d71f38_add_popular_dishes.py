@@ -0,0 +1,44 @@
+"""Add popular_dishes, the precomputed top dishes per city
+
+Revision ID: c4a9e2d71f38
+Revises: b6e1f47a2c95
+Create Date: 2026-10-20 18:00:00.000000
+
+Filled by `python -m app.jobs.popular_dishes`; empty until its first run.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a9e2d71f38'
+down_revision: Union[str, Sequence[str], None] = 'b6e1f47a2c95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('popular_dishes',
+    sa.Column('city', sa.String(), nullable=False),
+    sa.Column('period', sa.String(), nullable=False),
+    sa.Column('rank', sa.SmallInteger(), nullable=False),
+    sa.Column('global_dish_id', sa.Integer(), nullable=False),
+    sa.Column('dish_name', sa.String(), nullable=False),
+    sa.Column('menu_item_id', sa.Integer(), nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['global_dish_id'], ['global_dishes.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['menu_item_id'], ['restaurant_menu_items.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('city', 'period', 'rank')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('popular_dishes')
@@ -0,0 +1,199 @@
+"""Partition orders and order_items by month on created_at
+
+Revision ID: ca9b6b0e47c3
+Revises: 3b25df26d7c5
+Create Date: 2026-10-19 09:00:00.000000
+
+orders and order_items become declarative RANGE partitioned tables with one
+partition per calendar month. order_items gets its own created_at (always the
+parent order's created_at) so both tables share the partition key and the
+order_items -> orders foreign key can stay enforced as (order_id, created_at).
+
+Primary keys become (id, created_at) because Postgres requires the partition
+key in every unique constraint; ids still come from the same sequences, so the
+ORM keeps treating id as the primary key.
+
+create_order_partitions(months_ahead) creates any missing monthly partitions up
+to months_ahead months from now; app/jobs/order_partitions.py calls it on a
+schedule and app/jobs/archive_orders.py detaches and exports cold months.
+
+Rows are copied into the new tables inside the migration, so run it in a
+maintenance window on large databases.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ca9b6b0e47c3'
+down_revision: Union[str, Sequence[str], None] = '3b25df26d7c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+CREATE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_order_partitions(
+    months_ahead integer DEFAULT 3,
+    from_month date DEFAULT date_trunc('month', now())::date
+) RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    partition_month date;
+    suffix text;
+    created integer := 0;
+BEGIN
+    FOR partition_month IN
+        SELECT generate_series(
+            date_trunc('month', from_month),
+            date_trunc('month', now()) + make_interval(months => months_ahead),
+            interval '1 month'
+        )::date
+    LOOP
+        suffix := to_char(partition_month, '"y"YYYY"m"MM');
+        IF to_regclass('orders_' || suffix) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF orders FOR VALUES FROM (%L) TO (%L)',
+                'orders_' || suffix, partition_month, partition_month + interval '1 month'
+            );
+            created := created + 1;
+        END IF;
+        IF to_regclass('order_items_' || suffix) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF order_items FOR VALUES FROM (%L) TO (%L)',
+                'order_items_' || suffix, partition_month, partition_month + interval '1 month'
+            );
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Move the plain tables aside; their index-backed names would clash with the new ones
+    op.execute("ALTER TABLE order_items RENAME TO order_items_unpartitioned")
+    op.execute("ALTER TABLE order_items_unpartitioned RENAME CONSTRAINT order_items_pkey TO order_items_unpartitioned_pkey")
+    op.execute("ALTER INDEX ix_order_items_id RENAME TO ix_order_items_unpartitioned_id")
+    op.execute("ALTER TABLE orders RENAME TO orders_unpartitioned")
+    op.execute("ALTER TABLE orders_unpartitioned RENAME CONSTRAINT orders_pkey TO orders_unpartitioned_pkey")
+    op.execute("ALTER INDEX ix_orders_id RENAME TO ix_orders_unpartitioned_id")
+
+    # Keep the sequences alive when the old tables are dropped
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY NONE")
+    op.execute("ALTER SEQUENCE order_items_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE orders (
+            id                  integer NOT NULL DEFAULT nextval('orders_id_seq'),
+            user_id             integer NOT NULL REFERENCES users (id),
+            restaurant_id       integer NOT NULL REFERENCES restaurants (id),
+            total_amount        double precision NOT NULL,
+            status              orderstatus,
+            delivery_address    varchar NOT NULL,
+            created_at          timestamp without time zone NOT NULL DEFAULT now(),
+            CONSTRAINT orders_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("""
+        CREATE TABLE order_items (
+            id                  integer NOT NULL DEFAULT nextval('order_items_id_seq'),
+            order_id            integer NOT NULL,
+            menu_item_id        integer NOT NULL REFERENCES restaurant_menu_items (id),
+            quantity            integer NOT NULL,
+            price_at_order      double precision NOT NULL,
+            created_at          timestamp without time zone NOT NULL DEFAULT now(),
+            CONSTRAINT order_items_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT order_items_order_fkey FOREIGN KEY (order_id, created_at)
+                REFERENCES orders (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    op.create_index('ix_orders_id', 'orders', ['id'])
+    op.create_index('ix_orders_user_id_created_at', 'orders', ['user_id', sa.text('created_at DESC')])
+    op.create_index('ix_orders_restaurant_id_created_at', 'orders', ['restaurant_id', sa.text('created_at DESC')])
+    op.create_index('ix_order_items_id', 'order_items', ['id'])
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'])
+
+    op.execute(CREATE_PARTITIONS_FUNCTION)
+    op.execute("""
+        SELECT create_order_partitions(
+            3, COALESCE((SELECT min(created_at) FROM orders_unpartitioned), now())::date
+        )
+    """)
+
+    op.execute("""
+        INSERT INTO orders (id, user_id, restaurant_id, total_amount, status, delivery_address, created_at)
+        SELECT id, user_id, restaurant_id, total_amount, status, delivery_address, created_at
+        FROM orders_unpartitioned
+    """)
+    op.execute("""
+        INSERT INTO order_items (id, order_id, menu_item_id, quantity, price_at_order, created_at)
+        SELECT oi.id, oi.order_id, oi.menu_item_id, oi.quantity, oi.price_at_order, o.created_at
+        FROM order_items_unpartitioned oi
+        JOIN orders_unpartitioned o ON o.id = oi.order_id
+    """)
+
+    op.drop_table('order_items_unpartitioned')
+    op.drop_table('orders_unpartitioned')
+
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY orders.id")
+    op.execute("ALTER SEQUENCE order_items_id_seq OWNED BY order_items.id")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE order_items RENAME TO order_items_partitioned")
+    op.execute("ALTER TABLE order_items_partitioned RENAME CONSTRAINT order_items_pkey TO order_items_partitioned_pkey")
+    op.execute("ALTER INDEX ix_order_items_id RENAME TO ix_order_items_partitioned_id")
+    op.execute("ALTER TABLE orders RENAME TO orders_partitioned")
+    op.execute("ALTER TABLE orders_partitioned RENAME CONSTRAINT orders_pkey TO orders_partitioned_pkey")
+    op.execute("ALTER INDEX ix_orders_id RENAME TO ix_orders_partitioned_id")
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY NONE")
+    op.execute("ALTER SEQUENCE order_items_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE orders (
+            id                  integer NOT NULL DEFAULT nextval('orders_id_seq'),
+            user_id             integer NOT NULL REFERENCES users (id),
+            restaurant_id       integer NOT NULL REFERENCES restaurants (id),
+            total_amount        double precision NOT NULL,
+            status              orderstatus,
+            delivery_address    varchar NOT NULL,
+            created_at          timestamp without time zone NOT NULL DEFAULT now(),
+            CONSTRAINT orders_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("""
+        CREATE TABLE order_items (
+            id                  integer NOT NULL DEFAULT nextval('order_items_id_seq'),
+            order_id            integer NOT NULL REFERENCES orders (id),
+            menu_item_id        integer NOT NULL REFERENCES restaurant_menu_items (id),
+            quantity            integer NOT NULL,
+            price_at_order      double precision NOT NULL,
+            CONSTRAINT order_items_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("""
+        INSERT INTO orders (id, user_id, restaurant_id, total_amount, status, delivery_address, created_at)
+        SELECT id, user_id, restaurant_id, total_amount, status, delivery_address, created_at
+        FROM orders_partitioned
+    """)
+    op.execute("""
+        INSERT INTO order_items (id, order_id, menu_item_id, quantity, price_at_order)
+        SELECT id, order_id, menu_item_id, quantity, price_at_order
+        FROM order_items_partitioned
+    """)
+    op.create_index('ix_orders_id', 'orders', ['id'])
+    op.create_index('ix_order_items_id', 'order_items', ['id'])
+
+    # Dropping the parents drops every monthly partition with them
+    op.drop_table('order_items_partitioned')
+    op.drop_table('orders_partitioned')
+    op.execute("DROP FUNCTION IF EXISTS create_order_partitions(integer, date)")
+
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY orders.id")
+    op.execute("ALTER SEQUENCE order_items_id_seq OWNED BY order_items.id")
@@ -0,0 +1,67 @@
+"""Add idempotency_keys table and unique (restaurant_id, global_dish_id) on menu items
+
+Revision ID: d5f0a3c6b812
+Revises: 8c41e2a9d7b3
+Create Date: 2026-10-19 14:00:00.000000
+
+Existing duplicate menu items are merged into the lowest id of each
+(restaurant_id, global_dish_id) group before the constraint is added: order
+items are repointed and the duplicates' sales rollup rows are dropped, run
+`python -m app.jobs.rebuild_sales_rollups` afterwards to restore them.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f0a3c6b812'
+down_revision: Union[str, Sequence[str], None] = '8c41e2a9d7b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+DUPLICATES = """
+    SELECT id, min(id) OVER (PARTITION BY restaurant_id, global_dish_id) AS keep_id
+    FROM restaurant_menu_items
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('idempotency_keys',
+    sa.Column('principal', sa.String(), nullable=False),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('request_hash', sa.String(), nullable=False),
+    sa.Column('status_code', sa.SmallInteger(), nullable=True),
+    sa.Column('content_type', sa.String(), nullable=True),
+    sa.Column('body', sa.LargeBinary(), nullable=True),
+    sa.Column('locked_until', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('principal', 'key')
+    )
+    op.create_index(op.f('ix_idempotency_keys_expires_at'), 'idempotency_keys', ['expires_at'], unique=False)
+
+    op.execute(f"""
+        UPDATE order_items SET menu_item_id = d.keep_id
+        FROM ({DUPLICATES}) d
+        WHERE order_items.menu_item_id = d.id AND d.id <> d.keep_id
+    """)
+    op.execute(f"""
+        DELETE FROM menu_item_daily_sales
+        WHERE menu_item_id IN (SELECT id FROM ({DUPLICATES}) d WHERE d.id <> d.keep_id)
+    """)
+    op.execute(f"""
+        DELETE FROM restaurant_menu_items
+        WHERE id IN (SELECT id FROM ({DUPLICATES}) d WHERE d.id <> d.keep_id)
+    """)
+    op.create_unique_constraint('uq_restaurant_menu_items_restaurant_dish', 'restaurant_menu_items', ['restaurant_id', 'global_dish_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_restaurant_menu_items_restaurant_dish', 'restaurant_menu_items', type_='unique')
+    op.drop_index(op.f('ix_idempotency_keys_expires_at'), table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
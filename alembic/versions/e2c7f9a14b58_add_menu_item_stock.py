@@ -0,0 +1,45 @@
+"""Daily stock counters on menu items
+
+Revision ID: e2c7f9a14b58
+Revises: c4a9e2d71f38
+Create Date: 2026-10-21 10:00:00.000000
+
+stock / daily_stock are nullable (NULL = unlimited), so existing items keep
+their behaviour and nothing is backfilled.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app import migration_helpers as mh
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2c7f9a14b58'
+down_revision: Union[str, Sequence[str], None] = 'c4a9e2d71f38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    mh.add_column('restaurant_menu_items', sa.Column('stock', sa.Integer(), nullable=True))
+    mh.add_column('restaurant_menu_items', sa.Column('daily_stock', sa.Integer(), nullable=True))
+    mh.add_check_constraint('ck_restaurant_menu_items_stock', 'restaurant_menu_items', 'stock >= 0')
+    mh.create_index('ix_restaurant_menu_items_daily_stock', 'restaurant_menu_items', ['id'], where='daily_stock IS NOT NULL')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    mh.drop_index('ix_restaurant_menu_items_daily_stock', 'restaurant_menu_items')
+    if not mh.is_postgres():
+        with op.batch_alter_table('restaurant_menu_items') as batch:
+            batch.drop_constraint('ck_restaurant_menu_items_stock', type_='check')
+            batch.drop_column('daily_stock')
+            batch.drop_column('stock')
+        return
+    mh.run_with_lock_retries(lambda: op.drop_constraint('ck_restaurant_menu_items_stock', 'restaurant_menu_items', type_='check'))
+    for column in ('daily_stock', 'stock'):
+        mh.run_with_lock_retries(lambda column=column: op.drop_column('restaurant_menu_items', column))
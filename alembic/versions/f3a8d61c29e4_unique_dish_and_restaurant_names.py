@@ -0,0 +1,46 @@
+"""Make global dish and restaurant names unique
+
+Revision ID: f3a8d61c29e4
+Revises: e7b2c9f41a06
+Create Date: 2026-10-19 18:00:00.000000
+
+Existing duplicates keep their lowest id's name; the others are renamed to
+"<name> (<id>)" so nothing referencing them has to change.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8d61c29e4'
+down_revision: Union[str, Sequence[str], None] = 'e7b2c9f41a06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _rename_duplicates(table: str) -> None:
+    op.execute(f"""
+        UPDATE {table} SET name = {table}.name || ' (' || {table}.id || ')'
+        FROM (SELECT id, min(id) OVER (PARTITION BY name) AS keep_id FROM {table}) d
+        WHERE {table}.id = d.id AND d.id <> d.keep_id
+    """)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _rename_duplicates('global_dishes')
+    op.drop_index(op.f('ix_global_dishes_name'), table_name='global_dishes')
+    op.create_index(op.f('ix_global_dishes_name'), 'global_dishes', ['name'], unique=True)
+
+    _rename_duplicates('restaurants')
+    op.create_unique_constraint('uq_restaurants_name', 'restaurants', ['name'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_restaurants_name', 'restaurants', type_='unique')
+    op.drop_index(op.f('ix_global_dishes_name'), table_name='global_dishes')
+    op.create_index(op.f('ix_global_dishes_name'), 'global_dishes', ['name'], unique=False)
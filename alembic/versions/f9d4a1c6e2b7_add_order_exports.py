@@ -0,0 +1,54 @@
+"""Add order_exports, the queue and status of background order exports
+
+Revision ID: f9d4a1c6e2b7
+Revises: e2c7f9a14b58
+Create Date: 2026-10-21 14:00:00.000000
+
+Processed by `python -m app.jobs.export_worker`.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f9d4a1c6e2b7'
+down_revision: Union[str, Sequence[str], None] = 'e2c7f9a14b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('order_exports',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('requested_by', sa.Integer(), nullable=True),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('format', sa.String(), nullable=False),
+    sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'DONE', 'FAILED', name='exportstatus'), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=True),
+    sa.Column('file_bytes', sa.BigInteger(), nullable=True),
+    sa.Column('path', sa.String(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['requested_by'], ['users.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_order_exports_pending', 'order_exports', ['created_at'], unique=False, postgresql_where=sa.text("status IN ('QUEUED', 'RUNNING')"), sqlite_where=sa.text("status IN ('QUEUED', 'RUNNING')"))
+    op.create_index('ix_order_exports_restaurant_id', 'order_exports', ['restaurant_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_order_exports_restaurant_id', table_name='order_exports')
+    op.drop_index('ix_order_exports_pending', table_name='order_exports', postgresql_where=sa.text("status IN ('QUEUED', 'RUNNING')"), sqlite_where=sa.text("status IN ('QUEUED', 'RUNNING')"))
+    op.drop_table('order_exports')
+    sa.Enum(name='exportstatus').drop(op.get_bind(), checkfirst=True)
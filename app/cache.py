@@ -0,0 +1,118 @@
+# This file contains the in-process caches (one copy per uvicorn worker). They
+# are only correct together with invalidation.py: write paths publish which keys
+# changed, and every worker's listener evicts them. While a worker's listener is
+# not connected its caches are flushed and bypassed, so a missed invalidation can
+# never be served; cache_ttl_seconds bounds staleness should everything else fail.
+import threading
+import time
+from typing import Callable, Hashable
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from . import metrics
+from .config import settings
+
+_enabled = settings.cache_enabled
+
+
+class LocalCache:
+    # Thread safe: sync routes run in the threadpool and the listener evicts from its own thread
+    def __init__(self, name: str, ttl_seconds: float | None = None, max_entries: int | None = None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.cache_ttl_seconds
+        self.max_entries = max_entries or settings.cache_max_entries
+        self._entries: dict[Hashable, tuple[float, object]] = {}    # key -> (expires_at, value)
+        self._generation = 0
+        self._lock = threading.Lock()
+        CACHES[name] = self
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], object], store: bool = True):
+        # None results (not found) are returned but not cached, nor is anything when store is False
+        if _enabled:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                metrics.record_cache(self.name, True)
+                return entry[1]
+        metrics.record_cache(self.name, False)
+
+        # A value loaded while an invalidation arrived may predate the write, don't keep it
+        generation = self._generation
+        value = loader()
+        if value is not None and store and _enabled:
+            with self._lock:
+                if generation == self._generation:
+                    if len(self._entries) >= self.max_entries:
+                        self._evict_expired()
+                    self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        return value
+
+    def peek(self, key: Hashable):
+        # The cached value or None, never loads
+        entry = self._entries.get(key) if _enabled else None
+        hit = entry is not None and entry[0] > time.monotonic()
+        metrics.record_cache(self.name, hit)
+        return entry[1] if hit else None
+
+    def evict(self, keys)-> None:
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self)-> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def _evict_expired(self)-> None:
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+
+    def __len__(self)-> int:
+        return len(self._entries)
+
+
+CACHES: dict[str, LocalCache] = {}
+
+# restaurant_id -> schemas.RestaurantWithMenuResponse (GET /restaurants/{id})
+menus = LocalCache("menus")
+# dish name -> detached GlobalDish (adding menu items)
+dishes = LocalCache("dishes")
+# user_id -> detached User (oauth2.get_current_user, every authenticated request)
+principals = LocalCache("principals")
+
+
+def flush_all()-> None:
+    for cache in CACHES.values():
+        cache.clear()
+
+
+def suspend()-> None:
+    # Listener lost: nothing cached can be trusted, and nothing loaded now can be invalidated
+    global _enabled
+    _enabled = False
+    flush_all()
+
+
+def resume()-> None:
+    # Listener (re)connected: flush what was cached before, invalidations from here on arrive
+    global _enabled
+    flush_all()
+    _enabled = settings.cache_enabled
+
+
+def snapshot(obj):
+    # Detached copy of a loaded ORM row with only its columns, safe to share between threads
+    mapper = inspect(obj).mapper
+    copy = mapper.class_(**{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+
+def attach(db: Session, cached):
+    # Puts a snapshot into the request's session without a query; the cached copy stays untouched
+    return db.merge(cached, load=False)
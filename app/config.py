@@ -11,6 +11,61 @@ class Settings(BaseSettings):
     algorithm                   : str
     access_token_expire_minutes : int
 
+    # Full SQLAlchemy URL, overrides the database_* fields (e.g. sqlite:///bench.db for benchmarks)
+    database_url                : str | None = None
+
+    # Optional read replica for read-only catalog routes (see database.get_read_db)
+    database_replica_url        : str | None = None
+    replica_sticky_seconds      : int = 5       # reads go to the primary this long after a client's write
+    replica_retry_seconds       : int = 30      # stay on the primary this long after the replica fails
+
+    # SQL instrumentation
+    slow_query_ms               : float = 200.0
+    query_budget                : int = 0       # 0 disables the per-request query budget
+    query_budget_strict         : bool = False  # raise instead of logging when the budget is exceeded
+
+    # Bearer token Prometheus sends to scrape /metrics; unset, only clients on this host may scrape
+    metrics_token               : str | None = None
+
+    # Token-bucket rate limiting per user (per IP when anonymous), see ratelimit.py.
+    # Limits are "<requests>/<seconds>" or "off"; rate_limits is keyed on "METHOD /route/template"
+    rate_limit_enabled          : bool = True
+    rate_limit_default          : str = "120/60"
+    rate_limits                 : dict[str, str] = {
+        "POST /login": "10/60",
+        "GET /restaurants/menu": "60/60",
+        "GET /metrics": "off",
+    }
+    rate_limit_redis_url        : str | None = None     # share buckets between workers (needs the redis package)
+
+    # Idempotency-Key handling for write requests, see idempotency.py
+    idempotency_ttl_hours       : int = 24      # how long a stored response is replayed
+    idempotency_wait_seconds    : float = 10.0  # how long a duplicate waits for the in-flight request
+    idempotency_lock_seconds    : int = 60      # renewed while the request runs; a key not renewed this long is abandoned (dead worker)
+
+    # Outbox worker (jobs/outbox_worker.py)
+    outbox_batch_size           : int = 100
+    outbox_concurrency          : int = 20      # handlers running at once per worker
+    outbox_max_attempts         : int = 10      # then the event is marked dead
+    outbox_lease_seconds        : int = 60      # events of a worker that died are retried after this
+    outbox_poll_seconds         : float = 0.5
+    order_webhook_url           : str | None = None     # order events are POSTed here when set
+
+    # Order exports (svc_exports, jobs/export_worker.py)
+    export_dir                  : str = "exports"   # local directory shared by the workers and the API
+    export_concurrency          : int = 2       # exports running at once across all workers
+    export_batch_size           : int = 5_000   # rows fetched from the server-side cursor per batch
+    export_lease_seconds        : int = 120     # an export of a worker that died is restarted after this
+    export_max_attempts         : int = 3
+    export_poll_seconds         : float = 2.0
+    export_retention_days       : int = 30      # finished exports and their files are deleted after this
+
+    # In-process caches (cache.py), invalidated across workers through Postgres NOTIFY (invalidation.py)
+    cache_enabled               : bool = True
+    cache_ttl_seconds           : int = 300     # upper bound on staleness, invalidations normally evict first
+    cache_max_entries           : int = 10_000  # per cache
+    cache_heartbeat_seconds     : float = 10.0  # how often an idle listener connection is checked
+
     class Config:
         env_file = '.env'   
 
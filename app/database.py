@@ -1,10 +1,20 @@
 # This file handles database session management and connection
+import logging
+import os
+import time
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
 from sqlalchemy import create_engine 
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base 
 from sqlalchemy.orm import sessionmaker
 
 
 from .config import settings
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
 
 # This URL should be fetched from environment variables
 # Database URL syntax:
@@ -19,19 +29,171 @@ from .config import settings
 
 # SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.database_user}:{settings.database_password}@{settings.database_host}:{settings.database_port}/{settings.database_name}"
 
-SQLALCHEMY_DATABASE_URL = (
+SQLALCHEMY_DATABASE_URL = settings.database_url or (
     f"postgresql://{settings.database_user}:{settings.database_password}"
     f"@{settings.database_host}:{settings.database_port}/"
     f"{settings.database_name}"
     )
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _connect_args(url: str)-> dict:
+    # SQLite connections are shared across the threadpool that serves sync routes
+    return {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+# The engine is created by init_engine() (called from the app lifespan), not at import,
+# so importing the app never needs a live database. Schema changes go through Alembic.
+engine: Engine | None = None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 Base = declarative_base()
 
+# Optional read replica, only used through get_read_db()
+replica_engine: Engine | None = None
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False)
+_replica_down_until = 0.0
+
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+
+def init_engine()-> Engine:
+    global engine, replica_engine
+    if engine is None:
+        engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=_connect_args(SQLALCHEMY_DATABASE_URL))
+        instrumentation.install(engine)
+        SessionLocal.configure(bind=engine)
+
+    if settings.database_replica_url and replica_engine is None:
+        # pre_ping so a replica restart shows up as a checkout failure, which falls back to the primary
+        replica_engine = create_engine(
+            settings.database_replica_url,
+            connect_args=_connect_args(settings.database_replica_url),
+            pool_pre_ping=True,
+        )
+        instrumentation.install(replica_engine)
+        ReplicaSessionLocal.configure(bind=replica_engine)
+    return engine
+
+
+def dispose_engine()-> None:
+    global engine, replica_engine
+    for current in (engine, replica_engine):
+        if current is not None:
+            current.dispose()
+    engine = replica_engine = None
+
+
+def _dispose_inherited_pool()-> None:
+    # A worker forked after the app was loaded (gunicorn --preload) inherits the parent's
+    # pooled connections. Drop them without closing, the parent still owns those sockets.
+    for current in (engine, replica_engine):
+        if current is not None:
+            current.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_inherited_pool)
+
+
 def get_db():
+    if engine is None:
+        init_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def _reads_from_replica(request: Request)-> bool:
+    if replica_engine is None or request.method not in ("GET", "HEAD"):
+        return False
+
+    if time.monotonic() < _replica_down_until:
+        return False
+
+    # Set by ReadYourWritesMiddleware after this client wrote something
+    until = request.cookies.get(READ_PRIMARY_COOKIE)
+    try:
+        return until is None or float(until) < time.time()
+    except ValueError:
+        return True
+
+
+def _mark_replica_down()-> None:
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + settings.replica_retry_seconds
+    logger.warning("Read replica unavailable, using the primary for %ss", settings.replica_retry_seconds, exc_info=True)
+
+
+def _open_replica_session():
+    db = ReplicaSessionLocal()
+    try:
+        # Check out the connection now, so an unreachable replica falls back before the route runs
+        db.connection()
+    except DBAPIError:
+        db.close()
+        _mark_replica_down()
+        return None
+    return db
+
+
+# Use for read-only routes. Sessions come from the replica when one is configured,
+# except for unsafe methods, clients that wrote recently and while the replica is down.
+# Routers serving such routes use ReplicaFallbackRoute, so a read failing on the replica is retried on the primary.
+def get_read_db(request: Request):
+    if engine is None:
+        init_engine()
+    db = None
+    if _reads_from_replica(request) and not getattr(request.state, "read_primary", False):
+        db = _open_replica_session()
+    request.state.read_replica = db is not None
+    if db is None:
+        db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class ReplicaFallbackRoute(APIRoute):
+    # The checkout in get_read_db only catches a replica that is already down. A read can still fail
+    # on it afterwards (connection lost mid-query, query cancelled by a recovery conflict on the
+    # standby); the route then runs once more, with every get_read_db session on the primary.
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request)-> Response:
+            try:
+                return await handler(request)
+            except DBAPIError as exc:
+                if not getattr(request.state, "read_replica", False):
+                    raise
+                if exc.connection_invalidated:
+                    _mark_replica_down()
+                else:
+                    logger.warning("Read failed on the replica, retrying on the primary", exc_info=True)
+                request.state.read_primary = True
+                return await handler(request)
+
+        return route_handler
+
+
+class ReadYourWritesMiddleware:
+    # After a successful write, pin the client's reads to the primary for
+    # settings.replica_sticky_seconds so it doesn't read stale data from a lagging replica
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS") or not settings.database_replica_url:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + settings.replica_sticky_seconds
+                cookie = (
+                    f"{READ_PRIMARY_COOKIE}={until:.3f}; Max-Age={settings.replica_sticky_seconds}; "
+                    f"Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
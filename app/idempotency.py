@@ -0,0 +1,286 @@
+# This file contains the Idempotency-Key middleware. A write request (POST, PUT,
+# PATCH, DELETE) that carries the header is executed once per (client, key):
+# its response is stored in idempotency_keys and replayed on retries, and a
+# duplicate that arrives while the first one is still running waits for it.
+#
+# The key row is claimed with a single INSERT ... ON CONFLICT, so two workers
+# can never both execute the request. Waiters in the same process are woken by
+# an asyncio.Event, waiters in other processes poll the row.
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.routing import Match
+
+from . import database, ratelimit
+from .config import settings
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = b"idempotency-key"
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+POLL_SECONDS = 0.05
+MAX_KEY_LENGTH = 255
+STORE_ATTEMPTS = 3
+
+# (principal, key) -> set when the in-flight request of this process finishes
+_inflight: dict[tuple[str, str], asyncio.Event] = {}
+
+
+def _should_store(status_code: int)-> bool:
+    # Server errors, conflicts and rate limiting did not (fully) happen, a retry should re-execute.
+    # Neither did auth failures: the key is claimed before auth runs, a retry with a fresh token must not replay a 401.
+    return status_code < 500 and status_code not in (401, 403, 409, 429)
+
+
+class _Attempt:
+    __slots__ = ("committed",)
+
+    def __init__(self):
+        self.committed = False
+
+
+# Set while the app handles a claimed request; copied into threadpool workers (sync routes), so a
+# commit made there flips the shared _Attempt
+_current_attempt: contextvars.ContextVar[_Attempt | None] = contextvars.ContextVar("idempotency_attempt", default=None)
+
+
+@event.listens_for(Engine, "commit")
+def _note_commit(conn)-> None:
+    attempt = _current_attempt.get()
+    if attempt is not None:
+        attempt.committed = True
+
+
+def _insert(bind):
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(IdempotencyKey)
+
+
+def _claim(principal: str, key: str, request_hash: str)-> bool:
+    # True if this request now owns the key: it was unused, expired, or its holder
+    # has held it longer than idempotency_lock_seconds (crashed worker)
+    now = datetime.now()
+    engine = database.init_engine()
+    stmt = _insert(engine).values(
+        principal=principal, key=key, request_hash=request_hash,
+        locked_until=now + timedelta(seconds=settings.idempotency_lock_seconds),
+        expires_at=now + timedelta(hours=settings.idempotency_ttl_hours),
+    )
+    table = IdempotencyKey.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["principal", "key"],
+        set_={
+            "request_hash": stmt.excluded.request_hash, "status_code": None, "content_type": None, "body": None,
+            "locked_until": stmt.excluded.locked_until, "expires_at": stmt.excluded.expires_at,
+        },
+        where=(table.c.expires_at < now) | (table.c.status_code.is_(None) & (table.c.locked_until < now)),
+    )
+    with engine.begin() as conn:
+        return conn.execute(stmt).rowcount == 1
+
+
+def _load(principal: str, key: str):
+    with database.init_engine().connect() as conn:
+        return conn.execute(
+            select(IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.content_type, IdempotencyKey.body)
+            .where(IdempotencyKey.principal == principal, IdempotencyKey.key == key)
+        ).first()
+
+
+def _store(principal: str, key: str, status_code: int, content_type: str | None, body: bytes)-> None:
+    with database.init_engine().begin() as conn:
+        conn.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.principal == principal, IdempotencyKey.key == key)
+            .values(status_code=status_code, content_type=content_type, body=body)
+        )
+
+
+def _renew(principal: str, key: str)-> None:
+    with database.init_engine().begin() as conn:
+        conn.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.principal == principal, IdempotencyKey.key == key, IdempotencyKey.status_code.is_(None))
+            .values(locked_until=datetime.now() + timedelta(seconds=settings.idempotency_lock_seconds))
+        )
+
+
+def _release(principal: str, key: str)-> None:
+    with database.init_engine().begin() as conn:
+        conn.execute(delete(IdempotencyKey).where(IdempotencyKey.principal == principal, IdempotencyKey.key == key))
+
+
+def _match_route(scope)-> None:
+    # Responses answered here never reach the router; resolve the route template anyway,
+    # so MetricsMiddleware labels them like the executed request
+    for route in getattr(scope.get("app"), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            scope["route"] = route
+            return
+
+
+async def _respond(send, status_code: int, body: bytes, content_type: str | None = "application/json", extra=())-> None:
+    headers = [(b"content-length", str(len(body)).encode())]
+    if content_type:
+        headers.append((b"content-type", content_type.encode("latin-1")))
+    headers.extend(extra)
+    await send({"type": "http.response.start", "status": status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _error(send, status_code: int, detail: str, extra=())-> None:
+    await _respond(send, status_code, json.dumps({"detail": detail}).encode(), extra=extra)
+
+
+class IdempotencyMiddleware:
+    # Plain ASGI middleware, requests without the header pass straight through
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in UNSAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        key = next((value for name, value in scope["headers"] if name == HEADER), None)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = key.decode("latin-1")
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _error(send, 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+            return
+
+        # The body is part of the request fingerprint, so read it up front and replay it to the app
+        messages, more_body = [], True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            messages.append(message)
+            more_body = message.get("more_body", False)
+        body = b"".join(message.get("body", b"") for message in messages)
+
+        async def replay_receive():
+            return messages.pop(0) if messages else await receive()
+
+        principal = ratelimit.principal(Request(scope))
+        request_hash = hashlib.sha256(
+            b"\n".join([scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body])
+        ).hexdigest()
+
+        deadline = time.monotonic() + settings.idempotency_wait_seconds
+        while True:
+            if await run_in_threadpool(_claim, principal, key, request_hash):
+                await self._execute(scope, replay_receive, send, principal, key)
+                return
+
+            row = await run_in_threadpool(_load, principal, key)
+            if row is None:
+                continue        # released by a failed first attempt, claim it
+
+            _match_route(scope)
+            if row.request_hash != request_hash:
+                await _error(send, 422, "Idempotency-Key was already used for a different request")
+                return
+
+            if row.status_code is not None:
+                await _respond(send, row.status_code, row.body or b"", row.content_type, extra=[(b"idempotency-replayed", b"true")])
+                return
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                await _error(
+                    send, 409, "A request with this Idempotency-Key is still in progress",
+                    extra=[(b"retry-after", b"1")],
+                )
+                return
+
+            event = _inflight.get((principal, key))
+            try:
+                if event is not None:
+                    await asyncio.wait_for(event.wait(), remaining)
+                else:
+                    await asyncio.sleep(min(POLL_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, scope, receive, send, principal: str, key: str)-> None:
+        event = _inflight[(principal, key)] = asyncio.Event()
+        response = {"status": 500, "content_type": None, "body": []}
+
+        async def send_and_capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["content_type"] = next(
+                    (value.decode("latin-1") for name, value in message.get("headers", []) if name == b"content-type"), None
+                )
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        # Renew the lock while the request runs, so a slow request is never claimed a second time;
+        # only a dead worker's key expires after idempotency_lock_seconds
+        async def keep_locked():
+            while True:
+                await asyncio.sleep(settings.idempotency_lock_seconds / 3)
+                try:
+                    await run_in_threadpool(_renew, principal, key)
+                except Exception:
+                    logger.exception("Could not renew idempotency key %s for %s", key, principal)
+
+        # Started first: the task copies the current context, its own commits must not count
+        renewer = asyncio.create_task(keep_locked())
+        attempt = _Attempt()
+        token = _current_attempt.set(attempt)
+        release = True
+        try:
+            await self.app(scope, receive, send_and_capture)
+            if _should_store(response["status"]) or attempt.committed:
+                # Once the app committed, a retry must never run it again, whatever it answered
+                release = False
+                await self._store(principal, key, response)
+        finally:
+            _current_attempt.reset(token)
+            renewer.cancel()
+            # Released only when nothing was committed (app raised, or answered 5xx/409/429/401/403 before
+            # writing), so a retry executes it again. A committed request whose response could not be stored
+            # keeps its lock until idempotency_lock_seconds pass.
+            release = release and not attempt.committed
+            try:
+                if release:
+                    await run_in_threadpool(_release, principal, key)
+            except Exception:
+                # The lock expires after idempotency_lock_seconds and the key can be claimed again
+                logger.exception("Could not release idempotency key %s for %s", key, principal)
+            _inflight.pop((principal, key), None)
+            event.set()
+
+    async def _store(self, principal: str, key: str, response: dict)-> None:
+        # Retried: giving up leaves the key locked but without a response to replay
+        for attempt in range(STORE_ATTEMPTS):
+            try:
+                await run_in_threadpool(
+                    _store, principal, key, response["status"], response["content_type"], b"".join(response["body"])
+                )
+                return
+            except Exception:
+                if attempt == STORE_ATTEMPTS - 1:
+                    logger.exception("Could not store the response for idempotency key %s of %s", key, principal)
+                    return
+                await asyncio.sleep(0.1 * 2 ** attempt)
@@ -0,0 +1,141 @@
+# This file contains per-request SQL instrumentation: statement count, DB time,
+# slow query logging and the Server-Timing response header
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_time", "started")
+
+    def __init__(self, scope: dict | None = None):
+        self.scope = scope
+        self.queries = 0
+        self.db_time = 0.0
+        self.started = time.perf_counter()
+
+    @property
+    def route(self)-> str:
+        return route_of(self.scope)
+
+    def server_timing(self)-> str:
+        total_ms = (time.perf_counter() - self.started) * 1000
+        return (
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries", '
+            f'total;dur={total_ms:.2f}'
+        )
+
+
+# Holds a mutable RequestStats so that updates made from threadpool workers
+# (sync routes and dependencies) are visible to the middleware
+_current_stats: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar(
+    "request_sql_stats", default=None
+)
+
+# Set by query_budget() in tests, takes precedence over settings.query_budget
+_strict_budget: int | None = None
+
+
+def route_of(scope: dict | None)-> str:
+    # Prefer the route template (/restaurants/{restaurant_id}) over the raw path
+    if not scope:
+        return "-"
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path", "-")
+
+
+def current_stats()-> RequestStats | None:
+    return _current_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, not the connection: after_cursor_execute doesn't run
+    # for a statement that raises, and the context goes away with it
+    context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_start
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+
+    if elapsed * 1000 >= settings.slow_query_ms:
+        logger.warning(
+            "Slow query (%.1f ms) on %s: %s",
+            elapsed * 1000, route_of(stats.scope if stats else None), statement,
+        )
+
+
+def install(engine: Engine)-> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _check_budget(stats: RequestStats)-> None:
+    strict = _strict_budget is not None or settings.query_budget_strict
+    budget = _strict_budget if _strict_budget is not None else settings.query_budget
+
+    if not budget or stats.queries <= budget:
+        return
+
+    message = f"{stats.route} issued {stats.queries} queries (budget: {budget})"
+    if strict:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    # Use in tests: any request served inside this block that issues more than
+    # max_queries statements raises QueryBudgetExceeded
+    global _strict_budget
+    previous = _strict_budget
+    _strict_budget = max_queries
+    try:
+        yield
+    finally:
+        _strict_budget = previous
+
+
+class SQLTimingMiddleware:
+    # Plain ASGI middleware (no BaseHTTPMiddleware) so it adds no extra task per request
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                _check_budget(stats)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
@@ -0,0 +1,152 @@
+# This file contains the cache invalidation bus that keeps the in-process caches
+# of all workers (cache.py) consistent. Write paths call publish() inside their
+# transaction; on Postgres that runs pg_notify, which is only delivered once the
+# transaction commits (and never if it rolls back). Every worker runs a listener
+# thread on its own connection that evicts the published keys.
+#
+# The publishing worker evicts its own keys right after commit, without waiting
+# for the round trip. When the listener loses its connection the caches are
+# flushed and bypassed until it is listening again (cache.suspend/resume), so
+# invalidations sent during the gap cannot be missed.
+import json
+import logging
+import select
+import threading
+
+from sqlalchemy import event, func
+from sqlalchemy import select as sql_select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from . import cache, metrics
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+MAX_PAYLOAD_BYTES = 7_000       # NOTIFY payloads are limited to 8000 bytes
+MAX_RECONNECT_SECONDS = 30
+
+
+def publish(db: Session | Connection, target: cache.LocalCache, *keys)-> None:
+    # Does not commit: the keys are evicted everywhere once the caller's transaction commits.
+    # Without keys the whole cache is flushed.
+    if isinstance(db, Session):
+        db.info.setdefault("invalidations", []).append((target.name, list(keys) or None))
+        dialect = db.get_bind().dialect
+    else:
+        # Core connections (jobs, datagen) only notify, their process has no cache to evict
+        dialect = db.dialect
+
+    if dialect.name == "postgresql":
+        payload = json.dumps({"cache": target.name, "keys": list(keys) or None})
+        if len(payload) > MAX_PAYLOAD_BYTES:
+            payload = json.dumps({"cache": target.name, "keys": None})
+        db.execute(sql_select(func.pg_notify(CHANNEL, payload)))
+
+
+def apply(name: str, keys: list | None)-> None:
+    target = cache.CACHES.get(name)
+    if target is None:
+        # Published by a newer deployment with a cache this worker doesn't know, play it safe
+        cache.flush_all()
+    elif keys is None:
+        target.clear()
+    else:
+        target.evict(keys)
+    metrics.CACHE_INVALIDATIONS.inc((name,))
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_committed(db: Session)-> None:
+    for name, keys in db.info.pop("invalidations", ()):
+        apply(name, keys)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(db: Session, previous_transaction)-> None:
+    db.info.pop("invalidations", None)
+
+
+class Listener(threading.Thread):
+    # LISTENs on a dedicated connection (outside the pool), reconnecting with backoff
+    def __init__(self, engine: Engine):
+        super().__init__(name="cache-invalidation", daemon=True)
+        self.engine = engine
+        self.stopping = threading.Event()
+        self.connected = threading.Event()
+
+    def run(self)-> None:
+        delay = 0.5
+        while not self.stopping.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.warning("Cache invalidation listener disconnected, retrying in %.1fs", delay, exc_info=True)
+            if self.stopping.is_set():
+                return
+            if self.connected.is_set():
+                delay = 0.5
+            self.connected.clear()
+            cache.suspend()
+            metrics.CACHE_INVALIDATIONS.inc(("*",))
+            self.stopping.wait(delay)
+            delay = min(delay * 2, MAX_RECONNECT_SECONDS)
+
+    def _listen(self)-> None:
+        raw = self.engine.raw_connection()
+        raw.detach()
+        try:
+            conn = raw.driver_connection
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL}")
+            # Anything published before LISTEN took effect is unknown, start from empty caches
+            cache.resume()
+            self.connected.set()
+            logger.info("Listening for cache invalidations")
+
+            while not self.stopping.is_set():
+                readable, _, _ = select.select([conn], [], [], settings.cache_heartbeat_seconds)
+                if not readable:
+                    # Idle: a round trip makes a silently dropped connection raise
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1")
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        message = json.loads(notify.payload)
+                        apply(message["cache"], message.get("keys"))
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning("Bad cache invalidation payload %r, flushing", notify.payload)
+                        cache.flush_all()
+        finally:
+            raw.close()
+
+    def stop(self, timeout: float = 5.0)-> None:
+        self.stopping.set()
+        self.join(timeout)
+
+
+_listener: Listener | None = None
+
+
+def start(engine: Engine)-> None:
+    # Called from the app lifespan. Other databases (SQLite benchmarks) run a single
+    # process, where the after-commit eviction alone keeps the caches correct.
+    global _listener
+    if engine.dialect.name != "postgresql" or not settings.cache_enabled or _listener is not None:
+        return
+    cache.suspend()
+    _listener = Listener(engine)
+    _listener.start()
+    # Don't serve the first requests uncached if the database answers quickly
+    _listener.connected.wait(timeout=2.0)
+
+
+def stop()-> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,63 @@
+# This file applies a bulk price change (city-wide promotions, surge multipliers)
+# to the menu items of live restaurants. The rules are a JSON PriceRuleSet, e.g.
+#
+#   {"rules": [{"city": "Bangalore", "percent": -10}, {"category": "Desserts", "is_veg": true, "amount": 5}],
+#    "round_to": 5, "rounding": "nearest", "floor": 10}
+#
+# Rules apply in order, each to the items it matches; rounding and the floor apply
+# once to every item a rule touched. Only changed rows are written, in short
+# batches; an item edited by its owner while the job runs keeps the owner's price.
+#
+#   python -m app.jobs.adjust_prices --rules promo.json --dry-run --diff promo.csv
+#   python -m app.jobs.adjust_prices --rules promo.json [--batch-size 1000]
+import argparse
+import logging
+import time
+
+from app import database
+from app.schemas import PriceRuleSet
+from app.services import svc_pricing
+
+logger = logging.getLogger(__name__)
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Apply a price rule set to the menu items")
+    parser.add_argument("--rules", required=True, help="path to a JSON PriceRuleSet")
+    parser.add_argument("--dry-run", action="store_true", help="compute and report the changes without writing them")
+    parser.add_argument("--diff", help="write the changed items (old and new price) to this CSV file")
+    parser.add_argument("--batch-size", type=int, default=1_000, help="rows per write transaction")
+    args = parser.parse_args()
+
+    with open(args.rules) as handle:
+        rule_set = PriceRuleSet.model_validate_json(handle.read())
+
+    logging.basicConfig(level=logging.INFO)
+    database.init_engine()
+    with database.SessionLocal() as db:
+        started = time.perf_counter()
+        table = svc_pricing.load_prices(db)
+        # Release the read transaction before the writes start
+        db.rollback()
+        loaded = time.perf_counter()
+        new_prices = svc_pricing.apply_rules(table, rule_set)
+        changed = svc_pricing.changed_rows(table, new_prices)
+        computed = time.perf_counter()
+
+        summary = svc_pricing.summarize(table, new_prices, changed)
+        if args.diff:
+            svc_pricing.write_diff(args.diff, table, new_prices, changed)
+        if not args.dry_run:
+            summary.update(svc_pricing.write_prices(db, table, new_prices, changed, args.batch_size))
+        written = time.perf_counter()
+
+    summary["timings"] = {
+        "load_s": round(loaded - started, 3),
+        "compute_s": round(computed - loaded, 3),
+        "write_s": round(written - computed, 3),
+    }
+    logger.info("%s price changes: %s", "Computed" if args.dry_run else "Applied", summary)
+
+
+if __name__ == "__main__":
+    main()
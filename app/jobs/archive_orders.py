@@ -0,0 +1,144 @@
+# This file archives cold monthly partitions of orders and order_items: each
+# month older than the retention window is detached (CONCURRENTLY, so live
+# traffic is not blocked), exported to gzipped CSV and then dropped.
+#
+#   python -m app.jobs.archive_orders --keep-months 12 --output-dir archive/ [--dry-run] [--keep-tables]
+#
+# Safe to re-run after a failure: partitions that are already detached are not
+# detached again, an interrupted concurrent detach is finalized, and tables are
+# only dropped once their export row count matches the table.
+import argparse
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+from app import database
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r"^(?:orders|order_items)_y(\d{4})m(\d{2})$")
+
+
+def month_suffix(month: date)-> str:
+    return month.strftime("y%Ym%m")
+
+
+def cutoff_month(keep_months: int, today: date | None = None)-> date:
+    today = today or date.today()
+    months = today.year * 12 + today.month - 1 - keep_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_months(conn)-> list[date]:
+    # Attached or not: a month detached by an interrupted run still has to be exported and dropped
+    names = conn.execute(text(
+        "SELECT relname FROM pg_class WHERE relkind = 'r' AND relname ~ '^orders_y[0-9]{4}m[0-9]{2}$'"
+    )).scalars()
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def _detach(conn, parent: str, partition: str)-> None:
+    pending = conn.execute(text(
+        "SELECT i.inhdetachpending FROM pg_inherits i "
+        "WHERE i.inhparent = to_regclass(:parent) AND i.inhrelid = to_regclass(:partition)"
+    ), {"parent": parent, "partition": partition}).scalar()
+
+    if pending is None:
+        return      # already detached by an earlier run
+    if pending:
+        conn.execute(text(f'ALTER TABLE {parent} DETACH PARTITION "{partition}" FINALIZE'))
+    else:
+        conn.execute(text(f'ALTER TABLE {parent} DETACH PARTITION "{partition}" CONCURRENTLY'))
+
+
+def _export(engine, table: str, output_dir: str)-> dict:
+    path = os.path.join(output_dir, f"{table}.csv.gz")
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(f'SELECT count(*) FROM "{table}"')
+        expected = cursor.fetchone()[0]
+        with gzip.open(path, "wb") as fh:
+            cursor.copy_expert(f'COPY "{table}" TO STDOUT WITH (FORMAT csv, HEADER)', fh)
+        exported = cursor.rowcount
+        cursor.close()
+    finally:
+        raw.close()
+    return {"table": table, "path": path, "rows": exported, "expected_rows": expected}
+
+
+def archive_month(month: date, output_dir: str, drop: bool = True)-> dict:
+    engine = database.init_engine()
+    suffix = month_suffix(month)
+    items_partition, orders_partition = f"order_items_{suffix}", f"orders_{suffix}"
+
+    # DETACH ... CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # Items first: their rows reference the orders partition
+        _detach(conn, "order_items", items_partition)
+
+        # The detached table keeps its copy of the foreign key to orders, which
+        # would make detaching the orders partition fail
+        foreign_keys = conn.execute(text(
+            "SELECT conname FROM pg_constraint "
+            "WHERE conrelid = to_regclass(:table) AND contype = 'f' AND confrelid = 'orders'::regclass"
+        ), {"table": items_partition}).scalars().all()
+        for name in foreign_keys:
+            conn.execute(text(f'ALTER TABLE "{items_partition}" DROP CONSTRAINT "{name}"'))
+
+        _detach(conn, "orders", orders_partition)
+
+    os.makedirs(output_dir, exist_ok=True)
+    exports = [_export(engine, table, output_dir) for table in (items_partition, orders_partition)]
+    complete = all(export["rows"] == export["expected_rows"] for export in exports)
+
+    if drop and complete:
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE "{items_partition}"'))
+            conn.execute(text(f'DROP TABLE "{orders_partition}"'))
+
+    result = {"month": month.isoformat(), "exports": exports, "dropped": drop and complete}
+    with open(os.path.join(output_dir, f"orders_{suffix}.manifest.json"), "w") as fh:
+        json.dump(result, fh, indent=2)
+
+    if not complete:
+        logger.error("Export of %s is incomplete, detached tables were kept: %s", suffix, exports)
+    return result
+
+
+def archive_cold_partitions(keep_months: int, output_dir: str, drop: bool = True, dry_run: bool = False)-> list[dict]:
+    cutoff = cutoff_month(keep_months)
+    with database.init_engine().connect() as conn:
+        months = [month for month in partition_months(conn) if month < cutoff]
+
+    if dry_run:
+        return [{"month": month.isoformat(), "dry_run": True} for month in months]
+
+    return [archive_month(month, output_dir, drop=drop) for month in months]
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Detach, export and drop cold order partitions")
+    parser.add_argument("--keep-months", type=int, default=12, help="months (besides the current one) kept online")
+    parser.add_argument("--output-dir", default="archive")
+    parser.add_argument("--keep-tables", action="store_true", help="detach and export but do not drop")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for result in archive_cold_partitions(args.keep_months, args.output_dir, drop=not args.keep_tables, dry_run=args.dry_run):
+        logger.info("%s", json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# This file runs the order export worker: it claims the oldest queued export
+# (POST /dashboard/exports) and writes it to settings.export_dir, one export at a
+# time. Any number of workers can run side by side; at most export_concurrency
+# exports run at once across all of them, so reporting never takes more than a
+# few connections from order traffic. Every hour the workers also delete exports
+# finished more than export_retention_days ago, with their files. Stop it with
+# SIGTERM/SIGINT, it finishes the current export first.
+#
+#   python -m app.jobs.export_worker [--once]
+import argparse
+import logging
+import signal
+import threading
+import time
+
+from app import database
+from app.config import settings
+from app.services import svc_exports
+
+logger = logging.getLogger(__name__)
+
+EXPIRE_EVERY_SECONDS = 3600
+
+
+def run(once: bool = False)-> None:
+    database.init_engine()
+    stopping = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stopping.set())
+
+    expired_at = None
+    while not stopping.is_set():
+        if expired_at is None or time.monotonic() - expired_at >= EXPIRE_EVERY_SECONDS:
+            with database.SessionLocal() as db:
+                expired = svc_exports.expire_exports(db)
+            if expired:
+                logger.info("Deleted %s expired exports", expired)
+            expired_at = time.monotonic()
+        with database.SessionLocal() as db:
+            export_id = svc_exports.claim(db)
+        if export_id is not None:
+            logger.info("Exported: %s", svc_exports.run_export(export_id))
+        if once:
+            break
+        if export_id is None:
+            # Nothing queued, or every slot taken
+            stopping.wait(settings.export_poll_seconds)
+
+    database.dispose_engine()
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Run the order export worker")
+    parser.add_argument("--once", action="store_true", help="run at most one export and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# This file creates the upcoming monthly partitions of orders and order_items.
+# Run it daily (cron / CronJob) so inserts never hit a month without a partition.
+# If it did not run in time, those orders went to the DEFAULT partitions and are
+# moved into their month's partition here (alembic b8e2d5c1f4a7):
+#
+#   python -m app.jobs.order_partitions --months-ahead 3
+import argparse
+import logging
+
+from sqlalchemy import text
+
+from app import database, partitions
+
+logger = logging.getLogger(__name__)
+
+
+def create_future_partitions(months_ahead: int = 3)-> int:
+    # create_order_partitions() is defined by alembic revision ca9b6b0e47c3 and skips existing months
+    with database.init_engine().begin() as conn:
+        return conn.execute(
+            text("SELECT create_order_partitions(:months_ahead)"), {"months_ahead": months_ahead}
+        ).scalar()
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Create upcoming monthly order partitions")
+    parser.add_argument("--months-ahead", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    created = create_future_partitions(args.months_ahead)
+    logger.info("Created %s new monthly partition(s)", created)
+    logger.info("Partitions: %s", partitions.check(database.engine))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# This file runs the outbox worker: it claims batches of events (FOR UPDATE
+# SKIP LOCKED, so any number of workers can run side by side), runs their
+# handlers concurrently, deletes what succeeded and reschedules failures with
+# exponential backoff. Stop it with SIGTERM/SIGINT, it finishes the current batch.
+#
+#   python -m app.jobs.outbox_worker [--once]
+import argparse
+import asyncio
+import logging
+import signal
+
+from app import database, outbox
+from app.config import settings
+from app.services import svc_notifications  # noqa: F401  (registers the handlers)
+
+logger = logging.getLogger(__name__)
+
+
+async def _handle(event, semaphore: asyncio.Semaphore)-> str | None:
+    # -> None on success, otherwise the error to record
+    handlers = outbox.HANDLERS.get(event.topic)
+    if not handlers:
+        return f"No handler registered for topic '{event.topic}'"
+
+    async with semaphore:
+        try:
+            for fn in handlers:
+                if asyncio.iscoroutinefunction(fn):
+                    await fn(event.payload)
+                else:
+                    await asyncio.to_thread(fn, event.payload)
+        except Exception as exc:
+            logger.warning("Outbox event %s (%s), attempt %s failed: %r", event.id, event.topic, event.attempts, exc)
+            return repr(exc)
+    return None
+
+
+async def process_batch(semaphore: asyncio.Semaphore)-> int:
+    # -> number of events claimed
+    def claim():
+        with database.SessionLocal() as db:
+            return outbox.claim(db, settings.outbox_batch_size, settings.outbox_lease_seconds)
+
+    events = await asyncio.to_thread(claim)
+    if not events:
+        return 0
+
+    errors = await asyncio.gather(*(_handle(event, semaphore) for event in events))
+    done = [event.id for event, error in zip(events, errors) if error is None]
+    failed = [(event.id, event.attempts, error) for event, error in zip(events, errors) if error is not None]
+
+    def record():
+        with database.SessionLocal() as db:
+            outbox.complete(db, done)
+            if failed:
+                outbox.fail(db, failed)
+
+    await asyncio.to_thread(record)
+    logger.info("Handled %s outbox event(s), %s failed", len(done), len(failed))
+    return len(events)
+
+
+async def run(once: bool = False)-> None:
+    database.init_engine()
+    semaphore = asyncio.Semaphore(settings.outbox_concurrency)
+    stopping = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    while not stopping.is_set():
+        claimed = await process_batch(semaphore)
+        if once:
+            break
+        # A full batch means more is probably waiting, otherwise wait for new events
+        if claimed < settings.outbox_batch_size:
+            try:
+                await asyncio.wait_for(stopping.wait(), settings.outbox_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    database.dispose_engine()
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Run the outbox worker")
+    parser.add_argument("--once", action="store_true", help="handle one batch and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(once=args.once))
+
+
+if __name__ == "__main__":
+    main()
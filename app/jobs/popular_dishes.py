@@ -0,0 +1,38 @@
+# This file ranks the most ordered dishes per city over the recent order items
+# (svc_popular.PERIODS, newer orders weigh more) into popular_dishes, which the
+# home screen reads through GET /restaurants/popular-dishes. Memory stays fixed
+# (count-min sketches and a heap of candidates per city) however many orders
+# there are. Run it periodically, e.g. every 15 minutes from cron:
+#
+#   python -m app.jobs.popular_dishes [--periods 1d,7d] [--top 20]
+import argparse
+import logging
+
+from app import database
+from app.services import svc_popular
+
+logger = logging.getLogger(__name__)
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Rank the popular dishes per city")
+    parser.add_argument("--periods", default=",".join(svc_popular.PERIODS), help="comma separated, from svc_popular.PERIODS")
+    parser.add_argument("--top", type=int, default=20, help="dishes kept per city and period")
+    parser.add_argument("--sketch-width", type=int, default=1 << 15, help="counters per sketch row")
+    parser.add_argument("--sketch-depth", type=int, default=4, help="sketch rows")
+    args = parser.parse_args()
+
+    periods = [period for period in args.periods.split(",") if period]
+    unknown = [period for period in periods if period not in svc_popular.PERIODS]
+    if unknown:
+        parser.error(f"unknown period(s): {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.INFO)
+    database.init_engine()
+    with database.SessionLocal() as db:
+        result = svc_popular.compute_popular(db, periods, k=args.top, width=args.sketch_width, depth=args.sketch_depth)
+    logger.info("Ranked popular dishes: %s", result)
+
+
+if __name__ == "__main__":
+    main()
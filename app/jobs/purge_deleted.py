@@ -0,0 +1,163 @@
+# This file permanently removes restaurants and users that were soft deleted
+# more than --grace-days ago. Their dependent rows (order items, orders, reviews,
+# sales rollups, menu items) are deleted first, in small batches that each commit
+# on their own with a pause in between, so no transaction holds many row locks
+# or competes with peak traffic for long. A purged customer's orders at other
+# restaurants stay (order history, exports, sales rollups), moved to a tombstone
+# user and without the delivery address. Run it nightly:
+#
+#   python -m app.jobs.purge_deleted [--grace-days 30] [--batch-size 1000] [--sleep 0.1]
+#
+# Safe to interrupt and re-run: a parent row is only deleted once nothing refers to it.
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, update
+
+from app import database
+from app.models import MenuItemDailySales, Order, OrderItem, Restaurant, RestaurantDailySales, RestaurantMenuItem, Review, User, UserRole
+from app.services import svc_review
+
+logger = logging.getLogger(__name__)
+
+# Owner of the orders of purged customers. Soft deleted itself, so it can't log in, and never purged.
+TOMBSTONE_EMAIL = "purged-user@tombstone.invalid"
+
+
+class Purger:
+    def __init__(self, batch_size: int, sleep: float):
+        self.engine = database.init_engine()
+        self.batch_size = batch_size
+        self.sleep = sleep
+        self.deleted: dict[str, int] = {}
+        self.tombstone_id = tombstone_user_id(self.engine)
+
+    def _batches(self, table, key_column, where)-> None:
+        # Deletes the rows matching `where`, batch_size at a time, one transaction per batch
+        name = table.__tablename__
+        while True:
+            keys = select(key_column).where(where).limit(self.batch_size)
+            with self.engine.begin() as conn:
+                # `where` again: the key is only unique per parent for the rollup tables
+                deleted = conn.execute(delete(table).where(key_column.in_(keys.scalar_subquery()), where)).rowcount
+            self.deleted[name] = self.deleted.get(name, 0) + deleted
+            if deleted < self.batch_size:
+                return
+            time.sleep(self.sleep)
+
+    def _orders(self, where)-> None:
+        # Items go with their orders, one batch of orders at a time
+        while True:
+            with self.engine.begin() as conn:
+                order_ids = conn.execute(select(Order.id).where(where).limit(self.batch_size)).scalars().all()
+                if not order_ids:
+                    return
+                items = conn.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids))).rowcount
+                orders = conn.execute(delete(Order).where(Order.id.in_(order_ids))).rowcount
+            self.deleted["order_items"] = self.deleted.get("order_items", 0) + items
+            self.deleted["orders"] = self.deleted.get("orders", 0) + orders
+            time.sleep(self.sleep)
+
+    def restaurant(self, restaurant_id: int)-> None:
+        self._orders(Order.restaurant_id == restaurant_id)
+        self._batches(Review, Review.id, Review.restaurant_id == restaurant_id)
+        self._batches(MenuItemDailySales, MenuItemDailySales.menu_item_id, MenuItemDailySales.restaurant_id == restaurant_id)
+        self._batches(RestaurantDailySales, RestaurantDailySales.day, RestaurantDailySales.restaurant_id == restaurant_id)
+        self._batches(RestaurantMenuItem, RestaurantMenuItem.id, RestaurantMenuItem.restaurant_id == restaurant_id)
+        with self.engine.begin() as conn:
+            deleted = conn.execute(delete(Restaurant).where(Restaurant.id == restaurant_id, Restaurant.deleted_at.is_not(None))).rowcount
+        self.deleted["restaurants"] = self.deleted.get("restaurants", 0) + deleted
+
+    def _anonymize_orders(self, user_id: int)-> None:
+        # Orders at live restaurants are history of the restaurant too; only who placed them goes
+        while True:
+            order_ids = select(Order.id).where(Order.user_id == user_id).limit(self.batch_size)
+            with self.engine.begin() as conn:
+                updated = conn.execute(
+                    update(Order)
+                    .where(Order.id.in_(order_ids.scalar_subquery()), Order.user_id == user_id)
+                    .values(user_id=self.tombstone_id, delivery_address="")
+                ).rowcount
+            self.deleted["orders_anonymized"] = self.deleted.get("orders_anonymized", 0) + updated
+            if updated < self.batch_size:
+                return
+            time.sleep(self.sleep)
+
+    def user(self, user_id: int)-> None:
+        # Orders at restaurants purged before this user are already gone
+        self._anonymize_orders(user_id)
+
+        # Their reviews counted towards restaurant ratings, recompute those once the reviews are gone
+        with self.engine.connect() as conn:
+            rated = conn.execute(select(Review.restaurant_id).where(Review.user_id == user_id).distinct()).scalars().all()
+        self._batches(Review, Review.id, Review.user_id == user_id)
+        if rated:
+            with database.SessionLocal() as db:
+                svc_review.reaggregate_ratings(db, rated)
+                db.commit()
+
+        with self.engine.begin() as conn:
+            remaining = conn.execute(
+                select(Restaurant.id).where(Restaurant.owner_id == user_id).limit(1)
+            ).first()
+            if remaining is not None:
+                # Restaurants still inside their grace period, the user goes with them on a later run
+                logger.info("User %s still owns restaurant %s, skipping", user_id, remaining.id)
+                return
+            deleted = conn.execute(delete(User).where(User.id == user_id, User.deleted_at.is_not(None))).rowcount
+        self.deleted["users"] = self.deleted.get("users", 0) + deleted
+
+
+def tombstone_user_id(engine)-> int:
+    with engine.begin() as conn:
+        user_id = conn.execute(select(User.id).where(User.email == TOMBSTONE_EMAIL).order_by(User.id).limit(1)).scalar()
+        if user_id is None:
+            user_id = conn.execute(
+                User.__table__.insert().values(
+                    name="Purged user", email=TOMBSTONE_EMAIL, password="!", phone_number="", address="",
+                    role=UserRole.USER, deleted_at=datetime.now(),
+                ).returning(User.id)
+            ).scalar()
+    return user_id
+
+
+def purge_deleted(grace_days: int = 30, batch_size: int = 1_000, sleep: float = 0.1)-> dict[str, int]:
+    purger = Purger(batch_size, sleep)
+    cutoff = datetime.now() - timedelta(days=grace_days)
+
+    # Restaurants first, a deleted user's restaurants are deleted along with them
+    with purger.engine.connect() as conn:
+        restaurant_ids = conn.execute(
+            select(Restaurant.id).where(Restaurant.deleted_at < cutoff).order_by(Restaurant.id)
+        ).scalars().all()
+    for restaurant_id in restaurant_ids:
+        purger.restaurant(restaurant_id)
+        logger.info("Purged restaurant %s", restaurant_id)
+
+    with purger.engine.connect() as conn:
+        user_ids = conn.execute(
+            select(User.id).where(User.deleted_at < cutoff, User.id != purger.tombstone_id).order_by(User.id)
+        ).scalars().all()
+    for user_id in user_ids:
+        purger.user(user_id)
+        logger.info("Purged user %s", user_id)
+
+    return purger.deleted
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Permanently delete soft deleted restaurants and users")
+    parser.add_argument("--grace-days", type=int, default=30, help="only purge rows deleted at least this many days ago")
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--sleep", type=float, default=0.1, help="seconds to pause between batches")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    deleted = purge_deleted(args.grace_days, args.batch_size, args.sleep)
+    logger.info("Deleted rows: %s", ", ".join(f"{table}={count}" for table, count in sorted(deleted.items())) or "none")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# This file deletes expired rows from idempotency_keys in small batches, so the
+# table stays compact without long-running deletes. Run it hourly:
+#
+#   python -m app.jobs.purge_idempotency_keys [--batch-size 5000]
+import argparse
+import logging
+from datetime import datetime
+
+from sqlalchemy import delete, select, tuple_
+
+from app import database
+from app.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+
+def purge_expired(batch_size: int = 5_000)-> int:
+    engine = database.init_engine()
+    now = datetime.now()
+    purged = 0
+    while True:
+        # Uses ix_idempotency_keys_expires_at; one short transaction per batch
+        expired = (
+            select(IdempotencyKey.principal, IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at < now)
+            .limit(batch_size)
+        )
+        with engine.begin() as conn:
+            deleted = conn.execute(
+                delete(IdempotencyKey).where(tuple_(IdempotencyKey.principal, IdempotencyKey.key).in_(expired))
+            ).rowcount
+        purged += deleted
+        if deleted < batch_size:
+            return purged
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Delete expired idempotency keys")
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info("Purged %s expired idempotency key(s)", purge_expired(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
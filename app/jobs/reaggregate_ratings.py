@@ -0,0 +1,56 @@
+# This file recomputes restaurants.rating_sum / rating_count / rating from the
+# reviews table and fixes any restaurant whose running aggregates have drifted
+# (manual edits, deleted reviews, restores). The menu card aggregates
+# (menu_item_count, min_price, ...) are checked the same way. Safe to run while
+# reviews and menu writes come in:
+#
+#   python -m app.jobs.reaggregate_ratings [--batch-size 500]
+import argparse
+import logging
+
+from sqlalchemy import select
+
+from app import database
+from app.models import Restaurant
+from app.services import svc_menu, svc_review
+
+logger = logging.getLogger(__name__)
+
+
+def reaggregate_all(batch_size: int = 500)-> dict:
+    # Short transaction per batch of restaurants, so row locks are held briefly
+    checked = drifted = cards_drifted = 0
+    last_id = 0
+    database.init_engine()
+    with database.SessionLocal() as db:
+        while True:
+            ids = db.execute(
+                select(Restaurant.id).where(Restaurant.id > last_id).order_by(Restaurant.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+
+            drifted += svc_review.reaggregate_ratings(db, ids)
+            cards_drifted += svc_menu.refresh_cards(db, ids)
+            db.commit()
+            checked += len(ids)
+            last_id = ids[-1]
+
+    return {"checked": checked, "drifted": drifted, "cards_drifted": cards_drifted}
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Re-aggregate restaurant ratings from reviews")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = reaggregate_all(args.batch_size)
+    logger.info(
+        "Checked %s restaurant(s), corrected %s rating(s) and %s menu card(s)",
+        result["checked"], result["drifted"], result["cards_drifted"],
+    )
+
+
+if __name__ == "__main__":
+    main()
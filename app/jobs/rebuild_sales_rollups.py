@@ -0,0 +1,30 @@
+# This file reconciles the sales rollup tables (restaurant_daily_sales,
+# menu_item_daily_sales) with the raw orders. Run it after the migration that
+# adds them, and whenever the incremental counters are suspected to be off:
+#
+#   python -m app.jobs.rebuild_sales_rollups [--since 2026-01-01] [--restaurant-id 42]
+import argparse
+import logging
+from datetime import date
+
+from app import database
+from app.services import svc_sales
+
+logger = logging.getLogger(__name__)
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Rebuild the daily sales rollups from orders")
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="first day to rebuild (default: everything)")
+    parser.add_argument("--restaurant-id", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    database.init_engine()
+    with database.SessionLocal() as db:
+        counts = svc_sales.rebuild(db, since=args.since, restaurant_id=args.restaurant_id)
+    logger.info("Rebuilt rollups: %s", counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# This file refills the stock of every menu item with a daily cap (daily_stock)
+# and makes the items that sold out available again. Batches of items are reset
+# in short transactions, so orders for popular items only wait briefly. Run it
+# once a day before the restaurants open, e.g. from cron:
+#
+#   python -m app.jobs.reset_stock [--batch-size 1000]
+import argparse
+import logging
+
+from sqlalchemy import case, select, update
+
+from app import cache, database, invalidation
+from app.models import RestaurantMenuItem
+
+logger = logging.getLogger(__name__)
+
+
+def reset_stock(batch_size: int = 1_000)-> dict:
+    engine = database.init_engine()
+    items = 0
+    restaurants: set[int] = set()
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            # ix_restaurant_menu_items_daily_stock
+            ids = conn.execute(
+                select(RestaurantMenuItem.id)
+                .where(RestaurantMenuItem.daily_stock.is_not(None), RestaurantMenuItem.id > last_id)
+                .order_by(RestaurantMenuItem.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            # Only sold out items change availability; one the owner switched off stays off
+            restaurant_ids = conn.execute(
+                update(RestaurantMenuItem)
+                .where(RestaurantMenuItem.id.in_(ids), RestaurantMenuItem.stock.is_distinct_from(RestaurantMenuItem.daily_stock))
+                .values(
+                    stock=RestaurantMenuItem.daily_stock,
+                    is_available=case(
+                        ((RestaurantMenuItem.stock == 0) | (RestaurantMenuItem.daily_stock == 0), RestaurantMenuItem.daily_stock > 0),
+                        else_=RestaurantMenuItem.is_available,
+                    ),
+                )
+                .returning(RestaurantMenuItem.restaurant_id)
+            ).scalars().all()
+            if restaurant_ids:
+                invalidation.publish(conn, cache.menus, *sorted(set(restaurant_ids)))
+        items += len(restaurant_ids)
+        restaurants.update(restaurant_ids)
+        last_id = ids[-1]
+    return {"items": items, "restaurants": len(restaurants)}
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Refill the daily stock of menu items")
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info("Reset daily stock: %s", reset_stock(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,48 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 
 
-from .database import engine
-from . import models
-from .routes import user, auth, admin, restaurant
+from . import database, invalidation, partitions, ratelimit, utils
+from .idempotency import IdempotencyMiddleware
+from .instrumentation import SQLTimingMiddleware
+from .metrics import MetricsMiddleware
+from .routes import user, auth, admin, restaurant, order, dashboard, metrics
 
-# Create database tables. Only use this for testing purposes
-models.Base.metadata.create_all(bind=engine)
+# Tables are managed by Alembic (alembic upgrade head), nothing touches the database at import
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Each worker listens for cache invalidations published by the others
+    invalidation.start(database.init_engine())
+    # Logs an error when the partition job has fallen behind (also on /metrics)
+    partitions.check(database.engine)
+    # Otherwise the first login of an unknown user would hash twice
+    utils.dummy_password_hash()
+    yield
+    invalidation.stop()
+    database.dispose_engine()
 
-app = FastAPI()
+
+# App-level dependency rather than middleware: it runs after routing, so limits can be per route template
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(ratelimit.rate_limit)])
+
+# Counts statements and DB time per request, adds the Server-Timing header
+app.add_middleware(SQLTimingMiddleware)
+# Replays the stored response of write requests retried with the same Idempotency-Key
+app.add_middleware(IdempotencyMiddleware)
+# Latency histograms and status counts per route template, served on /metrics.
+# Outside IdempotencyMiddleware, so replayed and 409 responses are counted too
+app.add_middleware(MetricsMiddleware)
+# Pins a client's reads to the primary for a few seconds after it writes (replica routing)
+app.add_middleware(database.ReadYourWritesMiddleware)
 
 # Import routes
 app.include_router(user.router)
 app.include_router(auth.router)
 app.include_router(admin.router)
 app.include_router(restaurant.router)
+app.include_router(order.router)
+app.include_router(dashboard.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,304 @@
+# This file contains a small Prometheus-style metrics registry and the
+# request metrics middleware. Each thread writes to its own shard, so recording
+# a value never takes a lock; shards are only merged when /metrics is scraped.
+import threading
+import time
+from bisect import bisect_left
+
+from . import database, outbox, partitions
+from .instrumentation import route_of
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+REGISTRY: list["_Metric"] = []
+
+
+def _escape(value)-> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "")-> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float)-> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._lock = threading.Lock()   # only taken the first time a thread records a value
+        REGISTRY.append(self)
+
+    def _shard(self)-> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _merged(self)-> dict:
+        merged = {}
+        for shard in list(self._shards):
+            for key, value in list(shard.items()):
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def samples(self)-> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._merged().items())
+        ]
+
+    def render(self)-> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels: tuple = (), amount: float = 1)-> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), collect=None):
+        # collect: optional callable returning [(labels, value), ...] at scrape time
+        super().__init__(name, documentation, labelnames)
+        self._collect = collect
+
+    def inc(self, labels: tuple = (), amount: float = 1)-> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def dec(self, labels: tuple = (), amount: float = 1)-> None:
+        self.inc(labels, -amount)
+
+    def samples(self)-> list[str]:
+        if self._collect is None:
+            return super().samples()
+        try:
+            values = self._collect()
+        except Exception:
+            return []
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: tuple, value: float)-> None:
+        shard = self._shard()
+        counts = shard.get(labels)
+        if counts is None:
+            # one slot per bucket, one for +Inf, then sum
+            counts = shard[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def _merged(self)-> dict:
+        merged = {}
+        for shard in list(self._shards):
+            for key, counts in list(shard.items()):
+                total = merged.setdefault(key, [0] * (len(self.buckets) + 2))
+                for index, count in enumerate(list(counts)):
+                    total[index] += count
+        return merged
+
+    def samples(self)-> list[str]:
+        lines = []
+        for key, counts in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else _format_value(bound)
+                labels = _format_labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render()-> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# HTTP
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served", ("method",))
+
+
+# Database pool
+def _pool_stats():
+    stats = []
+    pools = {"primary": database.engine, "replica": database.replica_engine}
+    for name, engine in pools.items():
+        pool = getattr(engine, "pool", None)
+        if pool is None or not hasattr(pool, "checkedout"):
+            continue
+        stats.append(((name, "size"), pool.size()))
+        stats.append(((name, "checked_out"), pool.checkedout()))
+        stats.append(((name, "checked_in"), pool.checkedin()))
+        stats.append(((name, "overflow"), pool.overflow()))
+    return stats
+
+
+DB_POOL = Gauge("db_pool_connections", "SQLAlchemy connection pool state", ("pool", "state"), collect=_pool_stats)
+
+
+# Password hashing (see utils)
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_seconds", "Time spent hashing/verifying passwords", ("operation",), buckets=HASH_BUCKETS
+)
+
+
+# Outbox (see outbox.py). Both gauges come from one query, reused for a second
+_outbox_cache = {"at": 0.0, "stats": None}
+
+
+def _outbox_stats()-> dict | None:
+    if database.engine is None:
+        return None
+    if time.monotonic() - _outbox_cache["at"] > 1.0:
+        with database.SessionLocal() as db:
+            _outbox_cache["stats"] = outbox.stats(db)
+        _outbox_cache["at"] = time.monotonic()
+    return _outbox_cache["stats"]
+
+
+def _outbox_depth():
+    stats = _outbox_stats()
+    return [(("pending",), stats["pending"]), (("dead",), stats["dead"])] if stats else []
+
+
+def _outbox_lag():
+    stats = _outbox_stats()
+    return [((), stats["lag_seconds"])] if stats else []
+
+
+OUTBOX_DEPTH = Gauge("outbox_events", "Outbox events waiting to be handled, or given up on", ("state",), collect=_outbox_depth)
+OUTBOX_LAG = Gauge("outbox_lag_seconds", "Age of the oldest outbox event not yet handled", collect=_outbox_lag)
+
+
+# Order partitions (see partitions.py). Changes at most daily, so the query runs once a minute
+_partitions_cache = {"at": -60.0, "status": None}
+
+
+def _partition_status()-> dict | None:
+    if database.engine is None:
+        return None
+    if time.monotonic() - _partitions_cache["at"] > 60.0:
+        with database.engine.connect() as conn:
+            _partitions_cache["status"] = partitions.status(conn)
+        _partitions_cache["at"] = time.monotonic()
+    return _partitions_cache["status"]
+
+
+def _partitions_ahead():
+    status = _partition_status()
+    return [((), status["months_ahead"])] if status else []
+
+
+def _partition_default_rows():
+    status = _partition_status()
+    return [((table,), rows) for table, rows in status["default_rows"].items()] if status else []
+
+
+ORDER_PARTITIONS_AHEAD = Gauge(
+    "order_partitions_months_ahead", "Months after the current one with an orders partition", collect=_partitions_ahead
+)
+ORDER_PARTITION_DEFAULT_ROWS = Gauge(
+    "order_partition_default_rows", "Rows in the default partition (no monthly partition for them yet)", ("table",),
+    collect=_partition_default_rows,
+)
+
+
+# Rate limiting (see ratelimit.py)
+RATE_LIMITED = Counter("rate_limited_total", "Requests rejected by the rate limiter", ("route",))
+
+
+# Caches
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+
+
+# Evictions published through invalidation.py, "*" counts full flushes after listener gaps
+CACHE_INVALIDATIONS = Counter("cache_invalidations_total", "Cache invalidations applied by cache", ("cache",))
+
+
+def record_cache(cache: str, hit: bool)-> None:
+    CACHE_REQUESTS.inc((cache, "hit" if hit else "miss"))
+
+
+def _cache_ratios():
+    totals = {}
+    for (cache, result), count in CACHE_REQUESTS._merged().items():
+        hits, lookups = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (count if result == "hit" else 0), lookups + count)
+    return [((cache,), hits / lookups) for cache, (hits, lookups) in sorted(totals.items()) if lookups]
+
+
+CACHE_HIT_RATIO = Gauge("cache_hit_ratio", "Cache hits / lookups since start", ("cache",), collect=_cache_ratios)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc((method,))
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec((method,))
+            # Unmatched paths are collapsed so raw URLs never become label values
+            route = route_of(scope) if "route" in scope else "<unmatched>"
+            HTTP_LATENCY.observe((method, route), time.perf_counter() - start)
+            HTTP_REQUESTS.inc((method, route, str(status_code)))
@@ -0,0 +1,276 @@
+# This file contains helpers for Alembic migrations that must not block traffic
+# on large tables (orders, order_items, users, restaurant_menu_items). The
+# conventions for when to use which are in alembic/README; in short:
+#
+#   - indexes are built with CREATE INDEX CONCURRENTLY (create_index / drop_index)
+#   - DDL that needs an ACCESS EXCLUSIVE lock gives up quickly instead of queueing
+#     in front of every other query, and is retried (run_with_lock_retries)
+#   - constraints are added NOT VALID and validated afterwards, which only takes
+#     a lock that lets reads and writes continue
+#   - data is backfilled in small committed batches, never in one UPDATE
+#
+# On other databases (the SQLite benchmarks) they fall back to the plain Alembic
+# operation, locking doesn't matter there.
+#
+# Offline (alembic upgrade --sql) nothing can be retried or looked up, so the
+# script gets the same statements without retries: a lock_timeout around the
+# DDL, and one UPDATE per backfill. Partitioned tables can't be indexed offline.
+import logging
+import time
+from typing import Callable
+
+import sqlalchemy as sa
+from alembic import context, op
+from sqlalchemy.exc import OperationalError
+
+# alembic.ini only shows INFO for the alembic logger hierarchy
+logger = logging.getLogger("alembic.migration_helpers")
+
+LOCK_TIMEOUT_MS = 2_000
+LOCK_RETRIES = 10
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+def is_postgres()-> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _lock_not_available(exc: OperationalError)-> bool:
+    return getattr(exc.orig, "pgcode", None) == LOCK_NOT_AVAILABLE
+
+
+def run_with_lock_retries(
+    operation: Callable[[], None], lock_timeout_ms: int = LOCK_TIMEOUT_MS, retries: int = LOCK_RETRIES
+)-> None:
+    # Runs operation (e.g. lambda: op.add_column(...)) in its own short transaction with a
+    # lock_timeout. While waiting for its ACCESS EXCLUSIVE lock a statement blocks everything
+    # queued behind it, so it is better to give up after lock_timeout_ms and try again later.
+    if not is_postgres():
+        operation()
+        return
+    if context.is_offline_mode():
+        op.execute(f"SET lock_timeout = '{int(lock_timeout_ms)}ms'")
+        operation()
+        op.execute("RESET lock_timeout")
+        return
+
+    with op.get_context().autocommit_block():
+        _with_lock_retries(operation, lock_timeout_ms, retries)
+
+
+def _with_lock_retries(operation: Callable[[], None], lock_timeout_ms: int, retries: int)-> None:
+    # Must run inside an autocommit block, the BEGIN / COMMIT here are the only transaction
+    conn = op.get_bind()
+    for attempt in range(1, retries + 1):
+        conn.exec_driver_sql(f"SET lock_timeout = '{int(lock_timeout_ms)}ms'")
+        try:
+            conn.exec_driver_sql("BEGIN")
+            operation()
+            conn.exec_driver_sql("COMMIT")
+            return
+        except Exception as exc:
+            # Any failure, or the RESET below would fail on the aborted transaction and hide it
+            conn.exec_driver_sql("ROLLBACK")
+            if not isinstance(exc, OperationalError) or not _lock_not_available(exc) or attempt == retries:
+                raise
+            delay = min(0.5 * 2 ** attempt, 30)
+            logger.info("Lock not available (attempt %s/%s), retrying in %.1fs", attempt, retries, delay)
+            time.sleep(delay)
+        finally:
+            conn.exec_driver_sql("RESET lock_timeout")
+
+
+def add_column(table: str, column: sa.Column)-> None:
+    # Adding a nullable column, or one with a constant server default, only touches the catalog
+    # (Postgres 11+). A NOT NULL column without a default would fail on existing rows anyway:
+    # add it nullable, backfill(), then set_not_null().
+    if not column.nullable and column.server_default is None:
+        raise ValueError(
+            f"{table}.{column.name}: add NOT NULL columns as nullable, backfill, then set_not_null()"
+        )
+    run_with_lock_retries(lambda: op.add_column(table, column))
+
+
+def _is_partitioned(table: str)-> bool:
+    if context.is_offline_mode():
+        # alembic ca9b6b0e47c3
+        return table in ("orders", "order_items")
+    return op.get_bind().execute(
+        sa.text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+    ).scalar() or False
+
+
+def _drop_invalid_index(name: str)-> None:
+    # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which would make
+    # the IF NOT EXISTS of the next attempt skip the build
+    if context.is_offline_mode():
+        return
+    invalid = op.get_bind().execute(
+        sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}
+    ).scalar()
+    if invalid:
+        logger.info("Dropping invalid index %s left by an earlier attempt", name)
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+def create_index(
+    name: str, table: str, columns: list[str], unique: bool = False, where: str | None = None
+)-> None:
+    # Builds the index without blocking writes. Partitioned tables (orders, order_items) cannot
+    # be indexed concurrently as a whole: the parent index is created ON ONLY (instant, invalid),
+    # each partition is indexed concurrently and attached, which makes the parent index valid.
+    if not is_postgres():
+        op.create_index(name, table, columns, unique=unique, sqlite_where=sa.text(where) if where else None)
+        return
+
+    where_clause = sa.text(where) if where else None
+    with op.get_context().autocommit_block():
+        if not _is_partitioned(table):
+            _drop_invalid_index(name)
+            op.create_index(
+                name, table, columns, unique=unique, postgresql_where=where_clause,
+                postgresql_concurrently=True, if_not_exists=True,
+            )
+            return
+
+        if context.is_offline_mode():
+            raise NotImplementedError(f"{name}: indexes on partitioned tables need a live connection, run this migration online")
+        partitions = op.get_bind().execute(sa.text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+        ), {"table": table}).scalars().all()
+
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        predicate = f" WHERE {where}" if where else ""
+        _with_lock_retries(lambda: op.execute(
+            f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS "{name}" ON ONLY "{table}" ({column_list}){predicate}'
+        ), LOCK_TIMEOUT_MS, LOCK_RETRIES)
+        for partition in partitions:
+            partition_index = f"{partition}_{name}"[:63]
+            _drop_invalid_index(partition_index)
+            logger.info("Indexing partition %s", partition)
+            op.execute(
+                f'CREATE {"UNIQUE " if unique else ""}INDEX CONCURRENTLY IF NOT EXISTS "{partition_index}" '
+                f'ON "{partition}" ({column_list}){predicate}'
+            )
+            attached = op.get_bind().execute(
+                sa.text("SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(:index)"), {"index": partition_index}
+            ).first()
+            if attached is None:
+                op.execute(f'ALTER INDEX "{name}" ATTACH PARTITION "{partition_index}"')
+
+
+def drop_index(name: str, table: str)-> None:
+    if not is_postgres():
+        op.drop_index(name, table_name=table)
+        return
+    if _is_partitioned(table):
+        # Partitioned indexes cannot be dropped concurrently, the partition indexes go with it
+        run_with_lock_retries(lambda: op.execute(f'DROP INDEX IF EXISTS "{name}"'))
+        return
+    with op.get_context().autocommit_block():
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+def add_check_constraint(name: str, table: str, condition: str)-> None:
+    # NOT VALID only checks new rows (brief lock); VALIDATE scans the table under a
+    # SHARE UPDATE EXCLUSIVE lock, which reads and writes don't conflict with
+    if not is_postgres():
+        with op.batch_alter_table(table) as batch:
+            batch.create_check_constraint(name, sa.text(condition))
+        return
+    run_with_lock_retries(lambda: op.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" CHECK ({condition}) NOT VALID'))
+    run_with_lock_retries(lambda: op.execute(f'ALTER TABLE "{table}" VALIDATE CONSTRAINT "{name}"'))
+
+
+def add_foreign_key(
+    name: str, source: str, referent: str, local_columns: list[str], remote_columns: list[str], ondelete: str | None = None
+)-> None:
+    # Same two steps as add_check_constraint; the validation locks the referenced table SHARE ROW EXCLUSIVE only briefly
+    if not is_postgres():
+        with op.batch_alter_table(source) as batch:
+            batch.create_foreign_key(name, referent, local_columns, remote_columns, ondelete=ondelete)
+        return
+    local_list = ", ".join(f'"{column}"' for column in local_columns)
+    remote_list = ", ".join(f'"{column}"' for column in remote_columns)
+    on_delete = f" ON DELETE {ondelete}" if ondelete else ""
+    run_with_lock_retries(lambda: op.execute(
+        f'ALTER TABLE "{source}" ADD CONSTRAINT "{name}" FOREIGN KEY ({local_list}) '
+        f'REFERENCES "{referent}" ({remote_list}){on_delete} NOT VALID'
+    ))
+    run_with_lock_retries(lambda: op.execute(f'ALTER TABLE "{source}" VALIDATE CONSTRAINT "{name}"'))
+
+
+def set_not_null(table: str, column: str)-> None:
+    # SET NOT NULL normally scans the table under ACCESS EXCLUSIVE. With a validated
+    # CHECK (column IS NOT NULL) in place Postgres 12+ skips the scan.
+    if not is_postgres():
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column(column, nullable=False)
+        return
+    check = f"ck_{table}_{column}_not_null"[:63]
+    add_check_constraint(check, table, f'"{column}" IS NOT NULL')
+    run_with_lock_retries(lambda: op.execute(f'ALTER TABLE "{table}" ALTER COLUMN "{column}" SET NOT NULL'))
+    run_with_lock_retries(lambda: op.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT "{check}"'))
+
+
+def backfill(
+    table: str,
+    set_: str,
+    where: str,
+    key: str = "id",
+    batch_size: int = 5_000,
+    sleep: float = 0.05,
+    target_batch_seconds: float = 0.5,
+    progress_seconds: float = 10.0,
+)-> int:
+    # UPDATE table SET <set_> WHERE <where>, walking the key in ranges of batch_size with one
+    # committed transaction per range, so locks are held for one batch and replicas keep up.
+    #
+    # Resumable: `where` must be false for rows that are already done (e.g. "new_col IS NULL"),
+    # so an interrupted migration simply runs again. The batch size adapts to keep each batch
+    # near target_batch_seconds, and `sleep` leaves room for other traffic between batches.
+    #
+    # Returns the number of rows updated.
+    if context.is_offline_mode():
+        op.execute(f'UPDATE "{table}" SET {set_} WHERE {where}')
+        return 0
+
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        low, high = conn.execute(sa.text(f'SELECT min("{key}"), max("{key}") FROM "{table}"')).one()
+        if low is None:
+            return 0
+
+        updated = 0
+        started = last_report = time.monotonic()
+        start = low - 1
+        while start < high:
+            end = min(start + batch_size, high)
+            batch_started = time.monotonic()
+            # Autocommit: every batch is its own transaction
+            updated += conn.execute(sa.text(
+                f'UPDATE "{table}" SET {set_} WHERE "{key}" > :start AND "{key}" <= :end AND ({where})'
+            ), {"start": start, "end": end}).rowcount
+            elapsed = time.monotonic() - batch_started
+            start = end
+
+            # Grow while batches are cheap, shrink when one took too long (lock waits, bloat)
+            if elapsed < target_batch_seconds / 2:
+                batch_size = min(batch_size * 2, 100_000)
+            elif elapsed > target_batch_seconds * 2:
+                batch_size = max(batch_size // 2, 100)
+
+            now = time.monotonic()
+            if now - last_report >= progress_seconds or start >= high:
+                done = (start - low + 1) / (high - low + 1)
+                rate = updated / (now - started) if now > started else 0.0
+                eta = (now - started) * (1 - done) / done if done else 0.0
+                logger.info(
+                    "Backfill %s: %.1f%% of %s range, %s rows updated (%.0f rows/s, ~%.0fs left)",
+                    table, done * 100, key, updated, rate, eta,
+                )
+                last_report = now
+            if sleep:
+                time.sleep(sleep)
+    return updated
@@ -1,6 +1,6 @@
 # This file contains SQLAlchemy models for the database
 from sqlalchemy.sql._elements_constructors import null
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, Float, ForeignKey, Enum
+from sqlalchemy import Boolean, Column, Integer, SmallInteger, String, Date, DateTime, Float, ForeignKey, Enum, Index, CheckConstraint, LargeBinary, UniqueConstraint, BigInteger, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -23,22 +23,40 @@ class UserRole(str, enum.Enum):
     RESTAURANT_ADMIN = "RESTAURANT_ADMIN"
     ADMIN = "ADMIN"
 
+# Lifecycle of an order export (OrderExport): QUEUED -> RUNNING -> DONE or FAILED
+class ExportStatus(str, enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
 class User(Base):
     __tablename__       = "users"
     id                  = Column(Integer, primary_key=True, autoincrement=True)
     name                = Column(String, nullable=False)
-    email               = Column(String, unique=True, nullable=False)
+    email               = Column(String, nullable=False)
     password            = Column(String, nullable=False)
-    phone_number        = Column(String, unique=True, nullable=False)
+    phone_number        = Column(String, nullable=False)
     address             = Column(String, nullable=False)
     created_at          = Column(DateTime, nullable=False, server_default=func.now())
     updated_at          = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
     role                = Column(Enum(UserRole), nullable=False, default=UserRole.USER)
+    # Soft delete: set by DELETE /users/{id}, rows are removed later by jobs/purge_deleted.py
+    deleted_at          = Column(DateTime)
     
     # Relationship
     orders              = relationship("Order", back_populates="user")
     managed_restaurant  = relationship("Restaurant", back_populates="owner")
 
+    # Partial indexes only cover live users: every hot query filters deleted_at IS NULL,
+    # and a deleted account's email / phone number can be registered again
+    __table_args__      = (
+        # Case-insensitive, so /login finds an email however it is typed (utils.normalize_email)
+        Index("uq_users_email_lower", text("lower(email)"), unique=True, postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL")),
+        Index("uq_users_phone_number", "phone_number", unique=True, postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL")),
+        Index("ix_users_name", "name", postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL")),
+    )
+
 
 class Restaurant(Base):
     __tablename__   = "restaurants"
@@ -46,21 +64,49 @@ class Restaurant(Base):
     name            = Column(String, nullable=False)
     address         = Column(String, nullable=False)
     city            = Column(String, index=True)
+    # rating is rating_sum / rating_count, kept current by svc_review on every review
+    # (never AVG() on read); jobs/reaggregate_ratings.py corrects drift
     rating          = Column(Float, default=0.0)
+    rating_sum      = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count    = Column(Integer, nullable=False, default=0, server_default="0")
+    # Listing card aggregates over all menu items, kept current by svc_menu on every menu or
+    # dish write (never aggregated on read); svc_menu.refresh_cards() recomputes them
+    menu_item_count = Column(Integer, nullable=False, default=0, server_default="0")
+    veg_item_count  = Column(Integer, nullable=False, default=0, server_default="0")
+    min_price       = Column(Float)
+    max_price       = Column(Float)
+    is_pure_veg     = Column(Boolean, nullable=False, default=False, server_default=text("false"))
     is_open         = Column(Boolean, default=True)
     owner_id        = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at      = Column(DateTime, nullable=False, server_default=func.now())
+    # Soft delete: set by DELETE /admin/restaurant/{id}, purged by jobs/purge_deleted.py
+    deleted_at      = Column(DateTime)
 
     # Relationship:
     menu_items      = relationship("RestaurantMenuItem", back_populates="restaurant")
     orders          = relationship("Order", back_populates="restaurant")
     owner           = relationship("User", back_populates="managed_restaurant")
+    reviews         = relationship("Review", back_populates="restaurant")
+
+    # All partial on deleted_at IS NULL, like the users indexes
+    __table_args__  = (
+        # Backs the ?sort=rating listing (ORDER BY rating DESC, id DESC is a backward index scan)
+        Index("ix_restaurants_rating", "rating", "id", postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL")),
+        # Duplicate names are rejected by the insert itself (admin.add_restaurant)
+        Index("uq_restaurants_name", "name", unique=True, postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL")),
+        # Restaurant admins are resolved to their restaurant on every dashboard / menu request
+        Index("ix_restaurants_owner_id", "owner_id", postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL")),
+        # ?sort=price / ?max_price= and ?sort=menu_size, ?pure_veg=true keeps the rating order
+        Index("ix_restaurants_min_price", "min_price", "id", postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL")),
+        Index("ix_restaurants_menu_item_count", "menu_item_count", "id", postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL")),
+        Index("ix_restaurants_pure_veg", "rating", "id", postgresql_where=text("is_pure_veg AND deleted_at IS NULL"), sqlite_where=text("is_pure_veg AND deleted_at IS NULL")),
+    )
 
 
 class GlobalDish(Base):
     __tablename__   = "global_dishes"
     id              = Column(Integer, primary_key=True, index=True)
-    name            = Column(String, index=True, nullable=False) # Index for fast search
+    name            = Column(String, index=True, unique=True, nullable=False) # Index for fast search, rejects duplicates
     description     = Column(String)
     category        = Column(String) # e.g., Starters, Indian, Chinese
     is_veg          = Column(Boolean, default=True)
@@ -84,11 +130,27 @@ class RestaurantMenuItem(Base):
     # Think of applying discounts too
     price           = Column(Float, nullable=False)
     is_available    = Column(Boolean, default=True)
+    # Daily quantity cap, NULL = unlimited. Orders count stock down (svc_menu.take_stock) and the
+    # item goes unavailable at zero; jobs/reset_stock.py refills stock from daily_stock.
+    stock           = Column(Integer)
+    daily_stock     = Column(Integer)
     
     # Relationships
     restaurant      = relationship("Restaurant", back_populates="menu_items")
     dish            = relationship("GlobalDish", back_populates="restaurant_listings")
-    order_items     = relationship("OrderItem", back_populates="menu_item")
+    # Never loaded to be nulled on delete: menu_item_id is NOT NULL, deleting an ordered item is refused
+    order_items     = relationship("OrderItem", back_populates="menu_item", passive_deletes="all")
+
+    __table_args__  = (
+        # A dish is listed once per restaurant; duplicates are rejected with a 400 (svc_menu)
+        UniqueConstraint("restaurant_id", "global_dish_id", name="uq_restaurant_menu_items_restaurant_dish"),
+        # Restaurants listing a dish, for dish updates (admin.update_dish)
+        Index("ix_restaurant_menu_items_global_dish_id", "global_dish_id"),
+        # take_stock never goes below zero on its own; this also holds every other writer to it
+        CheckConstraint("stock >= 0", name="ck_restaurant_menu_items_stock"),
+        # Only the capped items, for the daily reset
+        Index("ix_restaurant_menu_items_daily_stock", "id", postgresql_where=text("daily_stock IS NOT NULL"), sqlite_where=text("daily_stock IS NOT NULL")),
+    )
 
 
 class Order(Base):
@@ -113,11 +175,154 @@ class OrderItem(Base):
     menu_item_id    = Column(Integer, ForeignKey("restaurant_menu_items.id"), nullable=False)
     quantity        = Column(Integer, nullable=False)
     price_at_order  = Column(Float, nullable=False)
+    # Partition key shared with orders (monthly partitions, see alembic ca9b6b0e47c3).
+    # Must equal the order's created_at; now() is the transaction start time in Postgres,
+    # so inserting the order and its items in one transaction guarantees that.
+    created_at      = Column(DateTime, nullable=False, server_default=func.now())
     
     # Relationships
     menu_item       = relationship("RestaurantMenuItem", back_populates="order_items")
     order           = relationship("Order", back_populates="items")
 
+
+class Review(Base):
+    __tablename__   = "reviews"
+
+    id              = Column(Integer, primary_key=True, index=True)
+    # One review per order. No foreign key to orders: it is partitioned on (id, created_at)
+    # and old partitions are detached and dropped by jobs/archive_orders.py, reviews stay.
+    order_id        = Column(Integer, nullable=False, unique=True)
+    user_id         = Column(Integer, ForeignKey("users.id"), nullable=False)
+    restaurant_id   = Column(Integer, ForeignKey("restaurants.id", ondelete="CASCADE"), nullable=False)
+    rating          = Column(SmallInteger, nullable=False)
+    comment         = Column(String)
+    created_at      = Column(DateTime, nullable=False, server_default=func.now())
+
+    restaurant      = relationship("Restaurant", back_populates="reviews")
+
+    __table_args__  = (
+        CheckConstraint("rating BETWEEN 1 AND 5", name="ck_reviews_rating"),
+        Index("ix_reviews_restaurant_id_id", "restaurant_id", "id"),
+    )
+
+
+# Transactional outbox: side effects of a write (notifications, webhooks) are queued here in
+# the same transaction and run by jobs/outbox_worker.py. Rows are deleted once handled.
+class OutboxEvent(Base):
+    __tablename__   = "outbox_events"
+
+    id              = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    topic           = Column(String, nullable=False)
+    payload         = Column(JSON, nullable=False)
+    created_at      = Column(DateTime, nullable=False, default=datetime.now)
+    available_at    = Column(DateTime, nullable=False, default=datetime.now)   # next attempt, pushed back on failure
+    locked_until    = Column(DateTime)                                        # lease of the worker handling it
+    attempts        = Column(Integer, nullable=False, default=0, server_default="0")
+    last_error      = Column(String)
+    dead_at         = Column(DateTime)                                        # gave up after outbox_max_attempts
+
+    __table_args__  = (
+        # The worker's claim query only ever looks at live events
+        Index(
+            "ix_outbox_events_available_at", "available_at",
+            postgresql_where=text("dead_at IS NULL"), sqlite_where=text("dead_at IS NULL"),
+        ),
+    )
+
+
+# Stored first responses of requests sent with an Idempotency-Key header (see idempotency.py).
+# status_code is NULL while the first request is still running.
+class IdempotencyKey(Base):
+    __tablename__   = "idempotency_keys"
+
+    principal       = Column(String, primary_key=True)     # "user:<id>" or "ip:<address>"
+    key             = Column(String, primary_key=True)
+    request_hash    = Column(String, nullable=False)
+    status_code     = Column(SmallInteger)
+    content_type    = Column(String)
+    body            = Column(LargeBinary)
+    locked_until    = Column(DateTime, nullable=False)
+    expires_at      = Column(DateTime, nullable=False, index=True)
+
+
+# Sales rollups, maintained by services/svc_sales.py in the same transaction as the
+# order write. Dashboards read only these; jobs/rebuild_sales_rollups.py reconciles them.
+class RestaurantDailySales(Base):
+    __tablename__   = "restaurant_daily_sales"
+
+    restaurant_id   = Column(Integer, ForeignKey("restaurants.id", ondelete="CASCADE"), primary_key=True)
+    day             = Column(Date, primary_key=True)
+    order_count     = Column(Integer, nullable=False, default=0, server_default="0")  # every placed order
+    cancelled_count = Column(Integer, nullable=False, default=0, server_default="0")
+    delivered_count = Column(Integer, nullable=False, default=0, server_default="0")
+    revenue         = Column(Float, nullable=False, default=0, server_default="0")    # excludes cancelled orders
+
+
+class MenuItemDailySales(Base):
+    __tablename__   = "menu_item_daily_sales"
+
+    menu_item_id    = Column(Integer, ForeignKey("restaurant_menu_items.id", ondelete="CASCADE"), primary_key=True)
+    day             = Column(Date, primary_key=True)
+    restaurant_id   = Column(Integer, ForeignKey("restaurants.id", ondelete="CASCADE"), nullable=False)
+    quantity        = Column(Integer, nullable=False, default=0, server_default="0")  # excludes cancelled orders
+    revenue         = Column(Float, nullable=False, default=0, server_default="0")
+
+    __table_args__  = (
+        Index("ix_menu_item_daily_sales_restaurant_day", "restaurant_id", "day"),
+    )
+
+
+class PopularDish(Base):
+    # Top dishes per city, written by jobs/popular_dishes.py (all rows of a period replaced per run).
+    # Names are copied in so GET /restaurants/popular-dishes is one primary key lookup.
+    __tablename__   = "popular_dishes"
+
+    city            = Column(String, primary_key=True)
+    period          = Column(String, primary_key=True)      # svc_popular.PERIODS
+    rank            = Column(SmallInteger, primary_key=True)
+    global_dish_id  = Column(Integer, ForeignKey("global_dishes.id", ondelete="CASCADE"), nullable=False)
+    dish_name       = Column(String, nullable=False)
+    menu_item_id    = Column(Integer, ForeignKey("restaurant_menu_items.id", ondelete="CASCADE"), nullable=False)   # best selling listing in the city
+    restaurant_id   = Column(Integer, ForeignKey("restaurants.id", ondelete="CASCADE"), nullable=False)
+    score           = Column(Float, nullable=False)         # decayed quantity ordered
+    computed_at     = Column(DateTime, nullable=False)
+
+
+class OrderExport(Base):
+    # A restaurant's order history for one month, written to a file by jobs/export_worker.py.
+    # The table is the worker's queue: claimed with a lease, like outbox_events.
+    __tablename__   = "order_exports"
+
+    id              = Column(Integer, primary_key=True, autoincrement=True)
+    restaurant_id   = Column(Integer, ForeignKey("restaurants.id", ondelete="CASCADE"), nullable=False)
+    requested_by    = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
+    month           = Column(Date, nullable=False)          # first day of the month
+    format          = Column(String, nullable=False)        # svc_exports.FORMATS
+    status          = Column(Enum(ExportStatus), nullable=False, default=ExportStatus.QUEUED)
+    created_at      = Column(DateTime, nullable=False, default=datetime.now)
+    started_at      = Column(DateTime)
+    finished_at     = Column(DateTime)
+    locked_until    = Column(DateTime)                      # lease of the worker running it, renewed every batch
+    attempts        = Column(Integer, nullable=False, default=0, server_default="0")
+    row_count       = Column(Integer)
+    file_bytes      = Column(BigInteger)
+    path            = Column(String)                        # under settings.export_dir
+    error           = Column(String)
+
+    __table_args__  = (
+        # The worker's claim query only looks at unfinished exports
+        Index(
+            "ix_order_exports_pending", "created_at",
+            postgresql_where=text("status IN ('QUEUED', 'RUNNING')"), sqlite_where=text("status IN ('QUEUED', 'RUNNING')"),
+        ),
+        Index("ix_order_exports_restaurant_id", "restaurant_id", "id"),
+        # One pending export per month and format, svc_exports.submit_export returns it to later requests
+        Index(
+            "uq_order_exports_pending", "restaurant_id", "month", "format", unique=True,
+            postgresql_where=text("status IN ('QUEUED', 'RUNNING')"), sqlite_where=text("status IN ('QUEUED', 'RUNNING')"),
+        ),
+    )
+
 """
 Notes Section:
 1. PHONE NUMBER VALIDATION:
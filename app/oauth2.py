@@ -6,9 +6,10 @@ from datetime import datetime, timedelta, timezone
 import jwt
 from jwt.exceptions import InvalidTokenError
 
+from app import cache
 from app.config import settings
 from app.utils import verify_password
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import User, UserRole
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='login')
@@ -28,8 +29,26 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None)-> st
     return encoded_jwt
 
 
+def decode_user_id(token: str)-> tuple[int | None, float | None]:
+    # Verifies the token without touching the database -> (user_id, exp timestamp), (None, None) if invalid
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except InvalidTokenError:
+        return None, None
+    return payload.get("user_id"), payload.get("exp")
+
+
 def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db))-> User:
-    
+    return _authenticate(token, db)
+
+
+def get_current_reader(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_read_db))-> User:
+    # For routes on get_read_db: a principal cache miss reads the user through the route's own
+    # session (the replica for most GETs) instead of checking out a primary connection as well
+    return _authenticate(token, db)
+
+
+def _authenticate(token: str, db: Session)-> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -46,15 +65,22 @@ def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session
     except InvalidTokenError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
+    # Runs on every authenticated request, so the row comes from the per-worker cache;
+    # user updates and deletes evict it in every worker (invalidation.publish)
+    def load():
+        user = db.query(User).filter(User.id == user_id, User.deleted_at.is_(None)).first()
+        return cache.snapshot(user) if user else None
+
+    user = cache.principals.get_or_load(user_id, load)
 
     if user is None:
         raise credentials_exception
 
-    return user
+    return cache.attach(db, user)
 
-def require_roles(*allowed_roles: UserRole):
-    def checker(current_user: User = Depends(get_current_user)):
+def require_roles(*allowed_roles: UserRole, read: bool = False):
+    # read=True on routes whose session comes from get_read_db
+    def checker(current_user: User = Depends(get_current_reader if read else get_current_user)):
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,94 @@
+# This file contains the transactional outbox. Services call enqueue() inside
+# the transaction of the business change, so an event exists if and only if the
+# change committed; jobs/outbox_worker.py later runs the handlers registered for
+# its topic. Handlers can run more than once (a worker may die after handling an
+# event but before deleting it), so they must be idempotent.
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import OutboxEvent
+
+Handler = Callable[[dict], Awaitable[None] | None]
+
+HANDLERS: dict[str, list[Handler]] = {}
+
+
+def enqueue(db: Session, topic: str, payload: dict)-> None:
+    # Does not commit: the event is written with the caller's transaction
+    db.add(OutboxEvent(topic=topic, payload=payload))
+
+
+def handler(topic: str):
+    # @outbox.handler("order.placed") registers an async (or sync) function taking the payload
+    def register(fn: Handler)-> Handler:
+        HANDLERS.setdefault(topic, []).append(fn)
+        return fn
+    return register
+
+
+def backoff(attempts: int)-> timedelta:
+    # 2, 4, 8 ... seconds, capped at 10 minutes, with jitter so failures do not retry in lockstep
+    delay = min(2 ** attempts, 600)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def claim(db: Session, batch_size: int, lease_seconds: int)-> list[OutboxEvent]:
+    # Concurrent workers skip each other's locked rows instead of queueing behind them.
+    # The lease lets another worker pick the events up again if this one dies.
+    now = datetime.now()
+    candidates = (
+        select(OutboxEvent.id)
+        .where(
+            OutboxEvent.dead_at.is_(None),
+            OutboxEvent.available_at <= now,
+            (OutboxEvent.locked_until.is_(None)) | (OutboxEvent.locked_until < now),
+        )
+        .order_by(OutboxEvent.available_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    events = db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(candidates.scalar_subquery()))
+        .values(locked_until=now + timedelta(seconds=lease_seconds), attempts=OutboxEvent.attempts + 1)
+        .returning(OutboxEvent.id, OutboxEvent.topic, OutboxEvent.payload, OutboxEvent.attempts, OutboxEvent.created_at)
+    ).all()
+    db.commit()
+    return events
+
+
+def complete(db: Session, event_ids: list[int])-> None:
+    if event_ids:
+        db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(event_ids)))
+        db.commit()
+
+
+def fail(db: Session, failures: list[tuple[int, int, str]])-> None:
+    # failures: (event id, attempts so far, error)
+    now = datetime.now()
+    for event_id, attempts, error in failures:
+        values = {"locked_until": None, "last_error": error[:1000]}
+        if attempts >= settings.outbox_max_attempts:
+            values["dead_at"] = now
+        else:
+            values["available_at"] = now + backoff(attempts)
+        db.execute(update(OutboxEvent).where(OutboxEvent.id == event_id).values(**values))
+    db.commit()
+
+
+def stats(db: Session)-> dict:
+    # Queue depth and the age of the oldest event still waiting, for /metrics
+    pending, dead, oldest = db.execute(
+        select(
+            func.count().filter(OutboxEvent.dead_at.is_(None)),
+            func.count().filter(OutboxEvent.dead_at.is_not(None)),
+            func.min(OutboxEvent.created_at).filter(OutboxEvent.dead_at.is_(None)),
+        )
+    ).one()
+    lag = (datetime.now() - oldest).total_seconds() if oldest else 0.0
+    return {"pending": pending, "dead": dead, "lag_seconds": max(lag, 0.0)}
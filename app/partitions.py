@@ -0,0 +1,60 @@
+# This file reports on the monthly partitions of orders and order_items
+# (alembic ca9b6b0e47c3): how many months ahead they go, and how many rows had to
+# fall back to the DEFAULT partitions because app.jobs.order_partitions did not
+# run in time. Checked at startup and exported on /metrics.
+import logging
+import re
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+MONTHLY_PARTITION = re.compile(r"^orders_y(\d{4})m(\d{2})$")
+
+# Counting stops here, the default partitions should be empty
+DEFAULT_ROWS_LIMIT = 100_000
+
+
+def status(conn: Connection)-> dict | None:
+    # None where orders is not partitioned (SQLite benchmarks)
+    if conn.dialect.name != "postgresql" or conn.execute(text("SELECT to_regclass('orders_default')")).scalar() is None:
+        return None
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = 'orders'::regclass"
+    )).scalars()
+    months = [int(m.group(1)) * 12 + int(m.group(2)) - 1 for m in map(MONTHLY_PARTITION.match, names) if m]
+    today = date.today()
+    default_rows = {
+        table: conn.execute(text(f"SELECT count(*) FROM (SELECT 1 FROM {table}_default LIMIT {DEFAULT_ROWS_LIMIT}) d")).scalar()
+        for table in ("orders", "order_items")
+    }
+    return {
+        # 0: only the current month has a partition, -1: not even that
+        "months_ahead": max(months) - (today.year * 12 + today.month - 1) if months else -1,
+        "default_rows": default_rows,
+    }
+
+
+def check(engine: Engine, months_ahead: int = 1)-> dict | None:
+    # Logs what would otherwise go unnoticed: orders still succeed once they land in the default
+    # partition, but every later month's partition has to move them out first
+    try:
+        with engine.connect() as conn:
+            current = status(conn)
+    except DBAPIError:
+        # Not a reason to keep the app from starting
+        logger.warning("Could not check the order partitions", exc_info=True)
+        return None
+    if current is None:
+        return None
+    if current["months_ahead"] < months_ahead:
+        logger.error(
+            "Order partitions only go %s month(s) ahead, run python -m app.jobs.order_partitions",
+            current["months_ahead"],
+        )
+    if any(current["default_rows"].values()):
+        logger.error("Rows in the default order partitions: %s, run python -m app.jobs.order_partitions", current["default_rows"])
+    return current
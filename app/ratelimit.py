@@ -0,0 +1,181 @@
+# This file contains token-bucket rate limiting, applied to every route as an
+# app-level dependency (so the matched route template is known). Clients are
+# keyed on the user_id of their JWT, or on their IP when anonymous (e.g. /login).
+#
+# Limits come from settings: rate_limits maps "METHOD /route/template" to
+# "<requests>/<seconds>" (or "off"), everything else shares rate_limit_default.
+# Buckets live in-process (per worker) unless rate_limit_redis_url is set.
+import logging
+import math
+import time
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request, status
+
+from . import metrics
+from .config import settings
+from .oauth2 import decode_user_id
+
+logger = logging.getLogger(__name__)
+
+MAX_LOCAL_KEYS = 100_000
+MAX_CACHED_TOKENS = 10_000
+REDIS_RETRY_SECONDS = 10
+
+
+@dataclass(frozen=True)
+class Limit:
+    capacity: float     # burst size
+    rate: float         # tokens added per second
+
+
+def parse_limit(value: str)-> Limit | None:
+    # "100/60" -> bursts of 100, refilled at 100 per 60 seconds; "off" -> unlimited
+    if value.strip().lower() == "off":
+        return None
+    requests, _, seconds = value.partition("/")
+    capacity = float(requests)
+    return Limit(capacity=capacity, rate=capacity / float(seconds or 1))
+
+
+class LocalBuckets:
+    # Only ever called from the event loop thread, so no locking is needed
+    def __init__(self, max_keys: int = MAX_LOCAL_KEYS):
+        self.max_keys = max_keys
+        self._buckets: dict[str, list[float]] = {}     # key -> [tokens, updated_at, full_at]
+
+    def take(self, key: str, limit: Limit, now: float | None = None)-> float:
+        # Returns 0 when a token was taken, otherwise the seconds until one is available
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._evict(now)
+            bucket = self._buckets[key] = [limit.capacity, now, now]
+
+        tokens = min(limit.capacity, bucket[0] + (now - bucket[1]) * limit.rate)
+        if tokens < 1:
+            bucket[0], bucket[1] = tokens, now
+            return (1 - tokens) / limit.rate
+
+        tokens -= 1
+        bucket[0], bucket[1], bucket[2] = tokens, now, now + (limit.capacity - tokens) / limit.rate
+        return 0.0
+
+    def _evict(self, now: float)-> None:
+        # Buckets that have refilled completely are indistinguishable from new ones
+        for key in [key for key, bucket in self._buckets.items() if bucket[2] <= now]:
+            del self._buckets[key]
+        if len(self._buckets) >= self.max_keys:
+            self._buckets.clear()
+
+    def clear(self)-> None:
+        self._buckets.clear()
+
+
+# Same algorithm as LocalBuckets, run atomically inside Redis
+_REDIS_TAKE = """
+local capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+else
+    tokens = tokens - 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    # Shared across workers and hosts. Falls back to the local buckets while Redis is unreachable.
+    def __init__(self, url: str, fallback: LocalBuckets):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("rate_limit_redis_url is set but the 'redis' package is not installed") from exc
+
+        self._client = redis.from_url(url, socket_timeout=0.05)
+        self._script = self._client.register_script(_REDIS_TAKE)
+        self._fallback = fallback
+        self._down_until = 0.0
+
+    async def take(self, key: str, limit: Limit)-> float:
+        if time.monotonic() < self._down_until:
+            return self._fallback.take(key, limit)
+        try:
+            wait = await self._script(keys=[f"ratelimit:{key}"], args=[limit.capacity, limit.rate, time.time()])
+        except Exception:
+            logger.warning("Rate limit backend unavailable, using in-process buckets", exc_info=True)
+            self._down_until = time.monotonic() + REDIS_RETRY_SECONDS
+            return self._fallback.take(key, limit)
+        return float(wait)
+
+
+_local = LocalBuckets()
+_redis: RedisBuckets | None = None
+_limits: dict[str, Limit | None] = {}
+_user_ids: dict[str, tuple[int | None, float]] = {}     # token -> (user_id, expires_at)
+
+
+def limit_for(rule: str)-> tuple[str, Limit | None]:
+    # -> (bucket name, limit). Routes without their own limit share the "*" bucket.
+    if rule not in _limits:
+        configured = settings.rate_limits.get(rule)
+        _limits[rule] = parse_limit(configured if configured is not None else settings.rate_limit_default)
+    return (rule if rule in settings.rate_limits else "*"), _limits[rule]
+
+
+def principal(request: Request)-> str:
+    # Who is calling: "user:<id>" from a valid bearer token, else "ip:<address>"
+    authorization = request.headers.get("authorization", "")
+    if authorization[:7].lower() == "bearer ":
+        token = authorization[7:]
+        # Verifying the signature costs tens of microseconds, so remember verified tokens
+        cached = _user_ids.get(token)
+        if cached is None or cached[1] <= time.time():
+            if len(_user_ids) >= MAX_CACHED_TOKENS:
+                _user_ids.clear()
+            user_id, expires_at = decode_user_id(token)
+            cached = _user_ids[token] = (user_id, expires_at or time.time() + 60)
+        if cached[0] is not None:
+            return f"user:{cached[0]}"
+
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the real client
+    return f"ip:{request.client.host if request.client else '-'}"
+
+
+def _backend():
+    global _redis
+    if settings.rate_limit_redis_url and _redis is None:
+        _redis = RedisBuckets(settings.rate_limit_redis_url, _local)
+    return _redis
+
+
+async def rate_limit(request: Request)-> None:
+    if not settings.rate_limit_enabled:
+        return
+
+    # Unmatched paths share one rule, so random URLs cannot grow the limit cache
+    route = request.scope.get("route")
+    rule = f"{request.method} {getattr(route, 'path', '<unmatched>')}"
+    bucket, limit = limit_for(rule)
+    if limit is None:
+        return
+
+    key = f"{bucket}|{principal(request)}"
+    backend = _backend()
+    wait = await backend.take(key, limit) if backend else _local.take(key, limit)
+
+    if wait > 0:
+        metrics.RATE_LIMITED.inc((rule,))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from .. import models
 from .. import schemas
 from .. import oauth2
+from .. import utils
+from .. import cache, invalidation
 from ..database import get_db
+from app.services import svc_menu
 
 
 router = APIRouter(
@@ -18,40 +23,76 @@ def add_dish(
     db: Session = Depends(get_db),
     current_user = Depends(oauth2.require_roles(models.UserRole.ADMIN))
 ):
-    dish = db.query(models.GlobalDish).filter(models.GlobalDish.name == dish_in.name).first()
-    
-    if dish:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Dish already exists")
+    # Duplicate names are rejected by ix_global_dishes_name (unique), see create_user
+    try:
+        new_dish = db.execute(
+            insert(models.GlobalDish).values(**dish_in.dict()).returning(*models.GlobalDish.__table__.c)
+        ).one()._asdict()
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        if "name" in utils.integrity_error_columns(exc):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Dish already exists")
+        raise
 
-    new_dish = models.GlobalDish(**dish_in.dict())
-    db.add(new_dish)
-    db.commit()
-    db.refresh(new_dish)
     return new_dish
 
 
+@router.put('/dish/{dish_id}', response_model=schemas.GlobalDishResponse)
+def update_dish(
+    dish_id: int,
+    dish_in: schemas.GlobalDishUpdate,
+    db: Session = Depends(get_db),
+    current_user = Depends(oauth2.require_roles(models.UserRole.ADMIN))
+):
+    # FOR UPDATE: menu writes lock the dish FOR SHARE before counting it (svc_menu.lock_menu)
+    dish = db.query(models.GlobalDish).filter(models.GlobalDish.id == dish_id).with_for_update().first()
+
+    if not dish:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Dish with ID: '{dish_id}' not found")
+
+    if dish_in.is_veg is not None and dish_in.is_veg != bool(dish.is_veg):
+        # Restaurants listing the dish gain or lose a veg item (and maybe their pure-veg badge)
+        restaurant_ids = svc_menu.record_dish_veg_changed(db, dish.id, dish_in.is_veg)
+    else:
+        # Description / category show on the menu of every restaurant listing it
+        restaurant_ids = [row.restaurant_id for row in db.query(models.RestaurantMenuItem.restaurant_id).filter(
+            models.RestaurantMenuItem.global_dish_id == dish.id
+        )]
+
+    for field, value in dish_in.dict(exclude_none=True).items():
+        setattr(dish, field, value)
+
+    invalidation.publish(db, cache.dishes, dish.name)
+    if restaurant_ids:
+        invalidation.publish(db, cache.menus, *restaurant_ids)
+    db.commit()
+    db.refresh(dish)
+    return dish
+
+
 @router.post('/restaurant', status_code=status.HTTP_201_CREATED)
 def add_restaurant(
     restaurant_in: schemas.RestaurantCreate,
     db: Session = Depends(get_db),
     current_user = Depends(oauth2.require_roles(models.UserRole.ADMIN))
 ):
-    restaurant = db.query(models.Restaurant).filter(models.Restaurant.name == restaurant_in.name).first()
-    
-    if restaurant:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Restaurant already exists")
-
-    # Check owner information from users table
-    owner = db.query(models.User).filter(models.User.id == restaurant_in.owner_id).first()
-    
-    if not owner:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with ID: '{restaurant_in.owner_id}' not found")
-
-    new_restaurant = models.Restaurant(**restaurant_in.dict())
-    db.add(new_restaurant)
-    db.commit()
-    db.refresh(new_restaurant)
-    return new_restaurant   
+    # uq_restaurants_name rejects duplicates and the owner_id foreign key unknown owners
+    try:
+        new_restaurant = db.execute(
+            insert(models.Restaurant).values(**restaurant_in.dict()).returning(*models.Restaurant.__table__.c)
+        ).one()._asdict()
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        columns = utils.integrity_error_columns(exc)
+        if "name" in columns:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Restaurant already exists")
+        if "owner_id" in columns:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with ID: '{restaurant_in.owner_id}' not found")
+        raise
+
+    return new_restaurant
 
 @router.delete('/restaurant/{restaurant_id}', status_code=status.HTTP_204_NO_CONTENT)
 def delete_restaurant(
@@ -59,11 +100,15 @@ def delete_restaurant(
     db: Session = Depends(get_db),
     current_user = Depends(oauth2.require_roles(models.UserRole.ADMIN))
 ):
-    restaurant = db.query(models.Restaurant).filter(models.Restaurant.id == restaurant_id).first()
-    
-    if not restaurant:
+    # Soft delete: a single-row UPDATE instead of deleting menu items and orders in this
+    # transaction; jobs/purge_deleted.py removes the restaurant and its rows later in small batches
+    deleted = db.query(models.Restaurant).filter(
+        models.Restaurant.id == restaurant_id, models.Restaurant.deleted_at.is_(None)
+    ).update({models.Restaurant.deleted_at: func.now(), models.Restaurant.is_open: False}, synchronize_session=False)
+
+    if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Restaurant with ID: '{restaurant_id}' not found")
-    
-    db.delete(restaurant)
+
+    invalidation.publish(db, cache.menus, restaurant_id)
     db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT) 
\ No newline at end of file
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from ..database import get_db
 from .. import models
@@ -11,20 +12,31 @@ router = APIRouter(
     tags=['Authentication']
 )
 
+def _find_user(db: Session, username: str)-> models.User | None:
+    # The username is an email or a phone number, normalized the way they are stored, so the
+    # lookup is one probe of uq_users_email_lower / uq_users_phone_number
+    if "@" in username:
+        condition = func.lower(models.User.email) == utils.normalize_email(username)
+    else:
+        phone_number = utils.normalize_phone(username)
+        if phone_number is None:
+            return None
+        condition = models.User.phone_number == phone_number
+    return db.query(models.User).filter(condition, models.User.deleted_at.is_(None)).first()
+
+
 @router.post('/login', response_model=schemas.Token)
 def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
 
-    user = db.query(models.User).filter(
-        models.User.name == user_credentials.username).first()
-
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail=f"Invalid Credentials")
+    user = _find_user(db, user_credentials.username)
 
-    if not utils.verify_password(user_credentials.password, user.password):
+    # Unknown users are checked against a dummy hash: the same Argon2 work as a wrong password,
+    # so the response time doesn't tell whether the account exists
+    hashed_password = user.password if user else utils.dummy_password_hash()
+    if not utils.verify_password(user_credentials.password, hashed_password) or not user:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail=f"Invalid Credentials")
 
     access_token = oauth2.create_access_token(data={"user_id": user.id, "role": user.role})
 
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    return {"access_token": access_token, "token_type": "bearer"}
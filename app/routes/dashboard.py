@@ -0,0 +1,98 @@
+import os
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from .. import models
+from .. import schemas
+from .. import oauth2
+from ..database import ReplicaFallbackRoute, get_db, get_read_db
+from app.services import svc_exports, svc_restaurant, svc_sales
+from typing import List
+
+# Dashboards read only the rollup tables, never orders/order_items (exports do, in jobs/export_worker.py)
+router = APIRouter(
+    prefix="/dashboard",
+    tags=['Dashboard'],
+    route_class=ReplicaFallbackRoute,
+)
+
+
+@router.get('/sales', response_model=List[schemas.DailySalesResponse])
+def get_daily_sales(
+    days: int = Query(30, ge=1, le=366),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.RESTAURANT_ADMIN, read=True))
+)-> List[models.RestaurantDailySales]:
+
+    restaurant = svc_restaurant.get_owned_restaurant(db, current_user.id)
+    return svc_sales.get_daily_sales(db, restaurant.id, days=days)
+
+
+@router.get('/top-dishes', response_model=List[schemas.TopDishResponse])
+def get_top_dishes(
+    days: int = Query(30, ge=1, le=366),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.RESTAURANT_ADMIN, read=True))
+)-> list[dict]:
+
+    restaurant = svc_restaurant.get_owned_restaurant(db, current_user.id)
+    return svc_sales.get_top_dishes(db, restaurant.id, days=days, limit=limit)
+
+
+# Exports run in the background: submit, poll until DONE, then download
+@router.post('/exports', status_code=status.HTTP_202_ACCEPTED, response_model=schemas.OrderExportResponse)
+def submit_order_export(
+    export_in: schemas.OrderExportCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.RESTAURANT_ADMIN))
+)-> models.OrderExport:
+
+    restaurant = svc_restaurant.get_owned_restaurant(db, current_user.id)
+    month = date.fromisoformat(f"{export_in.month}-01")
+    return svc_exports.submit_export(db, restaurant.id, current_user.id, month, export_in.format)
+
+
+@router.get('/exports', response_model=List[schemas.OrderExportResponse])
+def get_order_exports(
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.RESTAURANT_ADMIN))
+)-> List[models.OrderExport]:
+
+    restaurant = svc_restaurant.get_owned_restaurant(db, current_user.id)
+    return svc_exports.get_exports(db, restaurant.id, limit=limit)
+
+
+# Polled right after the submit: read from the primary
+@router.get('/exports/{export_id}', response_model=schemas.OrderExportResponse)
+def get_order_export(
+    export_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.RESTAURANT_ADMIN))
+)-> models.OrderExport:
+
+    restaurant = svc_restaurant.get_owned_restaurant(db, current_user.id)
+    return svc_exports.get_export(db, restaurant.id, export_id)
+
+
+@router.get('/exports/{export_id}/download')
+def download_order_export(
+    export_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.RESTAURANT_ADMIN))
+)-> FileResponse:
+
+    restaurant = svc_restaurant.get_owned_restaurant(db, current_user.id)
+    export = svc_exports.get_export(db, restaurant.id, export_id)
+    if export.status != models.ExportStatus.DONE:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Export with ID: '{export_id}' is {export.status.value}")
+    if not os.path.exists(export.path):
+        # Written to another host's export_dir, or removed since
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=f"The file of export with ID: '{export_id}' is no longer available")
+    return FileResponse(
+        export.path,
+        media_type=svc_exports.FORMATS[export.format],
+        filename=f"orders-{export.month:%Y-%m}.{export.format}",
+    )
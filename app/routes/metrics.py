@@ -0,0 +1,29 @@
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from .. import metrics
+from ..config import settings
+
+router = APIRouter(
+    tags=['Metrics']
+)
+
+LOCAL_CLIENTS = {"127.0.0.1", "::1", "localhost", "testclient"}
+
+
+def require_scraper(request: Request):
+    # A scrape reads pool and outbox state (one query), so it is not public
+    if settings.metrics_token is None:
+        if request.client is None or request.client.host not in LOCAL_CLIENTS:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Metrics are only served to local scrapers")
+        return
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), settings.metrics_token.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+@router.get('/metrics', include_in_schema=False, dependencies=[Depends(require_scraper)])
+def get_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from .. import models
+from .. import schemas
+from .. import oauth2
+from ..database import get_db
+from .user import verify_order_owner
+from app.services import svc_order, svc_restaurant, svc_review
+from typing import List
+
+router = APIRouter(
+    prefix="/orders",
+    tags=['Orders']
+)
+
+
+@router.post('/', status_code=status.HTTP_201_CREATED, response_model=schemas.OrderResponse)
+def place_order(
+    order_in: schemas.OrderCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.USER))
+)-> models.Order:
+
+    return svc_order.place_order(db, user_id=current_user.id, order_in=order_in)
+
+
+@router.get('/', response_model=List[schemas.OrderSummaryResponse])
+def get_my_orders(
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.USER))
+)-> List[models.Order]:
+
+    return svc_order.get_orders_for_user(db, current_user.id, skip=skip, limit=limit)
+
+
+# Declared before /{order_id} so "restaurant" is not parsed as an order id
+@router.get('/restaurant', response_model=List[schemas.OrderSummaryResponse])
+def get_restaurant_orders(
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.RESTAURANT_ADMIN))
+)-> List[models.Order]:
+
+    restaurant = svc_restaurant.get_owned_restaurant(db, current_user.id)
+    return svc_order.get_orders_for_restaurant(db, restaurant.id, skip=skip, limit=limit)
+
+
+@router.get('/{order_id}', response_model=schemas.OrderResponse)
+def get_order(
+    order: models.Order = Depends(verify_order_owner),
+    db: Session = Depends(get_db),
+)-> models.Order:
+
+    return svc_order.get_order_with_items(db, order.id)
+
+
+@router.post('/{order_id}/cancel', response_model=schemas.OrderSummaryResponse)
+def cancel_order(
+    order: models.Order = Depends(verify_order_owner),
+    db: Session = Depends(get_db),
+)-> models.Order:
+
+    # Customers can only cancel before the restaurant confirms
+    if order.status != models.OrderStatus.PLACED:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Order with ID: '{order.id}' can no longer be cancelled")
+
+    return svc_order.change_order_status(db, order, models.OrderStatus.CANCELLED)
+
+
+@router.put('/{order_id}/status', response_model=schemas.OrderSummaryResponse)
+def update_order_status(
+    order_id: int,
+    status_in: schemas.OrderStatusUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.RESTAURANT_ADMIN))
+)-> models.Order:
+
+    restaurant = svc_restaurant.get_owned_restaurant(db, current_user.id)
+    order = db.query(models.Order).filter(models.Order.id == order_id, models.Order.restaurant_id == restaurant.id).first()
+
+    if not order:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Order with ID: '{order_id}' not found")
+
+    return svc_order.change_order_status(db, order, status_in.status)
+
+
+@router.post('/{order_id}/review', status_code=status.HTTP_201_CREATED, response_model=schemas.ReviewResponse)
+def review_order(
+    review_in: schemas.ReviewCreate,
+    order: models.Order = Depends(verify_order_owner),
+    db: Session = Depends(get_db),
+)-> models.Review:
+
+    return svc_review.create_review(db, order, review_in)
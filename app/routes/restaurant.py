@@ -1,69 +1,116 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from .. import models
 from .. import schemas
 from .. import oauth2
 from .. import utils
-from ..database import get_db
-from app.services import svc_restaurant, svc_menu
-from typing import List
+from .. import cache, invalidation, sparse
+from ..database import ReplicaFallbackRoute, get_db, get_read_db
+from app.services import svc_restaurant, svc_menu, svc_popular, svc_review
+from typing import List, Literal, Optional
             
 router = APIRouter(
     prefix="/restaurants",
-    tags=['Restaurants']
+    tags=['Restaurants'],
+    route_class=ReplicaFallbackRoute,
 )
 
 
 @router.get('/', response_model=List[schemas.RestaurantResponse])
 def get_all_restaurants(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.USER, models.UserRole.RESTAURANT_ADMIN))
+    sort: Optional[Literal["rating", "price", "menu_size"]] = None,
+    pure_veg: bool = False,
+    max_price: float | None = Query(None, gt=0, description="Only restaurants whose cheapest item costs at most this"),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=100),
+    fields: sparse.FieldSet | None = Depends(sparse.fields(schemas.RestaurantResponse)),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.USER, models.UserRole.RESTAURANT_ADMIN, read=True))
 )-> list[models.Restaurant]:
 
-    restaurants = svc_restaurant.get_restaurants(db)
+    restaurants = svc_restaurant.get_restaurants(
+        db, skip=skip, limit=limit, sort=sort, pure_veg=pure_veg, max_price=max_price, fields=fields
+    )
 
-    if not restaurants:
+    # A filter or skip narrowing the list to nothing is a normal answer, not a missing catalogue
+    if not restaurants and not pure_veg and max_price is None and skip == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No Restaurants registered yet")
+    if fields is not None:
+        return sparse.respond(restaurants, schemas.RestaurantResponse, fields)
     return restaurants  
 
 
 @router.get('/menu', response_model=List[schemas.MenuItemResponse])
 def get_menu_items(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(oauth2.get_current_user)
+    fields: sparse.FieldSet | None = Depends(sparse.fields(schemas.MenuItemResponse)),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(oauth2.get_current_reader)
 )-> List[models.RestaurantMenuItem]:
     
+    # Only the requested columns; the dish is joined in the same query (not loaded per item),
+    # and not at all when no dish field is requested
+    options = sparse.load_options(models.RestaurantMenuItem, fields or sparse.all_fields(schemas.MenuItemResponse))
+
     # Check user role. If user is a restaurant admin, get menu items for that restaurant
     if current_user.role == models.UserRole.RESTAURANT_ADMIN:
         # Get user id from current_user
         # Get restaurant id from user id
         # Get menu items for that restaurant id
         # db.query(models.Restaurant).filter(models.Restaurant.owner_id == current_user.id).first()
-        menu_items = db.query(models.RestaurantMenuItem).filter(models.RestaurantMenuItem.restaurant_id == (
-            db.query(models.Restaurant).filter(models.Restaurant.owner_id == current_user.id).first().id
+        menu_items = db.query(models.RestaurantMenuItem).options(*options).filter(models.RestaurantMenuItem.restaurant_id == (
+            db.query(models.Restaurant).filter(models.Restaurant.owner_id == current_user.id, models.Restaurant.deleted_at.is_(None)).first().id
             )
         ).all()
     else:
-        menu_items = db.query(models.RestaurantMenuItem).all()
+        menu_items = db.query(models.RestaurantMenuItem).options(*options).join(models.Restaurant).filter(models.Restaurant.deleted_at.is_(None)).all()
     
+    if fields is not None:
+        return sparse.respond(menu_items, schemas.MenuItemResponse, fields)
     return menu_items
 
+@router.get('/popular-dishes', response_model=List[schemas.PopularDishResponse])
+def get_popular_dishes(
+    city: str,
+    period: Literal["1d", "7d"] = "1d",
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.USER, models.UserRole.RESTAURANT_ADMIN, read=True))
+)-> List[models.PopularDish]:
+
+    # Precomputed by jobs/popular_dishes.py, never aggregated per request
+    return svc_popular.get_popular_dishes(db, city, period=period, limit=limit)
+
 # Get restuarant dtails
 @router.get('/{restaurant_id}', response_model=schemas.RestaurantWithMenuResponse)
 def get_restaurant_details(
     restaurant_id: int, 
-    db: Session = Depends(get_db), 
-    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.USER, models.UserRole.RESTAURANT_ADMIN))
-)-> models.Restaurant:
+    fields: sparse.FieldSet | None = Depends(sparse.fields(schemas.RestaurantWithMenuResponse)),
+    db: Session = Depends(get_read_db), 
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.USER, models.UserRole.RESTAURANT_ADMIN, read=True))
+)-> schemas.RestaurantWithMenuResponse:
     
-    restaurant = svc_restaurant.get_restaurant_by_id(db, restaurant_id)
+    restaurant = svc_restaurant.get_restaurant_with_menu(db, restaurant_id, fields=fields)
 
     if not restaurant:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Restaurant with id: {restaurant_id} not found")
 
+    if fields is not None:
+        return sparse.respond(restaurant, schemas.RestaurantWithMenuResponse, fields)
     return restaurant
 
 
+@router.get('/{restaurant_id}/reviews', response_model=List[schemas.ReviewResponse])
+def get_restaurant_reviews(
+    restaurant_id: int,
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(oauth2.require_roles(models.UserRole.USER, models.UserRole.RESTAURANT_ADMIN, read=True))
+)-> List[models.Review]:
+
+    return svc_review.get_reviews_for_restaurant(db, restaurant_id, skip=skip, limit=limit)
+
+
 @router.post("/menu", status_code=status.HTTP_201_CREATED)
 def add_menu_item(
     item_in: schemas.MenuItemCreate,
@@ -84,18 +131,38 @@ def update_menu_item(
     # Ensure ONLY a Restaurant Admin can call this
     current_user = Depends(oauth2.require_roles(models.UserRole.RESTAURANT_ADMIN))
 ):
-    menu_item = db.query(models.RestaurantMenuItem).filter(models.RestaurantMenuItem.id == menu_item_id).first()
+    # Only items of the admin's own restaurant. Locks the restaurant, the card aggregates are updated in the same transaction
+    restaurant = svc_menu.get_restaurant_by_user_id(db, current_user.id)
+    menu_item = svc_menu.get_menu_item_for_update(db, restaurant.id, menu_item_id)
     
     if not menu_item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Menu item with ID: '{menu_item_id}' not found")
 
+    # reset_stock only refills items with a daily_stock, a stock without one would never come back
+    daily_stock = item_in.daily_stock if "daily_stock" in item_in.model_fields_set else menu_item.daily_stock
+    if item_in.stock is not None and daily_stock is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="stock can only be set on a menu item with a daily_stock")
+
     if item_in.is_available:
         menu_item.is_available = item_in.is_available
 
     if item_in.price:
+        old_price = menu_item.price
         menu_item.price = item_in.price
-
-
+        db.flush()
+        svc_menu.record_price_changed(db, menu_item.restaurant_id, old_price, menu_item.price)
+
+    if "daily_stock" in item_in.model_fields_set:
+        menu_item.daily_stock = item_in.daily_stock
+        if "stock" not in item_in.model_fields_set:
+            menu_item.stock = item_in.daily_stock
+    if "stock" in item_in.model_fields_set:
+        menu_item.stock = item_in.stock
+    if {"stock", "daily_stock"} & item_in.model_fields_set and menu_item.stock is not None:
+        # Same rule as svc_menu.take_stock: available while there is stock
+        menu_item.is_available = menu_item.stock > 0
+
+    invalidation.publish(db, cache.menus, menu_item.restaurant_id)
     db.commit()
     db.refresh(menu_item)
     return menu_item
@@ -108,12 +175,23 @@ def delete_menu_item(
     # Ensure ONLY a Restaurant Admin can call this
     current_user = Depends(oauth2.require_roles(models.UserRole.RESTAURANT_ADMIN))
 ):
-    menu_item = db.query(models.RestaurantMenuItem).filter(models.RestaurantMenuItem.id == menu_item_id).first()
+    restaurant = svc_menu.get_restaurant_by_user_id(db, current_user.id)
+    menu_item = svc_menu.get_menu_item_for_update(db, restaurant.id, menu_item_id)
     
     if not menu_item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Menu item with ID: '{menu_item_id}' not found")
-    
+
+    # Order items keep pointing at the listing (order history, rollups, exports)
+    if svc_menu.has_orders(db, menu_item_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Menu item with ID: '{menu_item_id}' has been ordered, mark it unavailable instead",
+        )
+
     db.delete(menu_item)
+    db.flush()
+    svc_menu.record_item_removed(db, menu_item.restaurant_id, menu_item.price, bool(menu_item.dish.is_veg))
+    invalidation.publish(db, cache.menus, menu_item.restaurant_id)
     db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
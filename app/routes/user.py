@@ -1,5 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response
 
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from ..database import get_db
@@ -7,6 +9,7 @@ from .. import models
 from .. import schemas
 from .. import oauth2
 from .. import utils
+from .. import cache, invalidation
 
 router = APIRouter(
     prefix="/users",
@@ -32,24 +35,26 @@ def verify_order_owner(
 @router.post('/', status_code=status.HTTP_201_CREATED, response_model=schemas.UserResponse)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 
-    email_exists = db.query(models.User).filter(models.User.email == user.email).first()
-    
-    if email_exists:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
-
-    phone_exists = db.query(models.User).filter(models.User.phone_number == user.phone_number).first()
-
-    if phone_exists:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Phone number already exists")
-
     # hash the password - user.password
     hashed_password = utils.get_password_hash(user.password)
     user.password = hashed_password
 
-    new_user = models.User(**user.dict())
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    # One INSERT ... RETURNING; the unique constraints on email and phone_number do the
+    # duplicate checks, race free, and no refresh SELECT is needed afterwards
+    try:
+        new_user = db.execute(
+            insert(models.User).values(**user.dict()).returning(*models.User.__table__.c)
+        ).one()._asdict()
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        columns = utils.integrity_error_columns(exc)
+        # uq_users_email_lower is on an expression: 'lower(email::text)' on Postgres, the index name on SQLite
+        if any("email" in column for column in columns):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
+        if "phone_number" in columns:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Phone number already exists")
+        raise
 
     return new_user
 
@@ -60,7 +65,7 @@ def update_user(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(oauth2.get_current_user)
 ):
-    user_to_update = db.query(models.User).filter(models.User.id == user_id).first()
+    user_to_update = db.query(models.User).filter(models.User.id == user_id, models.User.deleted_at.is_(None)).first()
     
     if not user_to_update:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id: {user_id} not found")
@@ -81,7 +86,14 @@ def update_user(
     if user.address:
         user_to_update.address = user.address
 
-    db.commit()
+    invalidation.publish(db, cache.principals, user_id)
+    try:
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        if "phone_number" in utils.integrity_error_columns(exc):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Phone number already exists")
+        raise
     db.refresh(user_to_update)
     return user_to_update
 
@@ -93,7 +105,7 @@ def delete_user(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(oauth2.get_current_user)
 ):
-    user_to_delete = db.query(models.User).filter(models.User.id == user_id).first()
+    user_to_delete = db.query(models.User).filter(models.User.id == user_id, models.User.deleted_at.is_(None)).first()
     
     if not user_to_delete:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id: {user_id} not found")
@@ -101,6 +113,17 @@ def delete_user(
     if user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to perform this action")
     
-    db.delete(user_to_delete)
+    # Soft delete, the account and its restaurants disappear from every query right away;
+    # jobs/purge_deleted.py removes the rows and their orders later in small batches
+    user_to_delete.deleted_at = func.now()
+    restaurant_ids = db.execute(
+        update(models.Restaurant)
+        .where(models.Restaurant.owner_id == user_id, models.Restaurant.deleted_at.is_(None))
+        .values(deleted_at=func.now(), is_open=False)
+        .returning(models.Restaurant.id)
+    ).scalars().all()
+    invalidation.publish(db, cache.principals, user_id)
+    if restaurant_ids:
+        invalidation.publish(db, cache.menus, *restaurant_ids)
     db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
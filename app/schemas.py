@@ -1,8 +1,9 @@
-from pydantic import BaseModel, ConfigDict, Field
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from datetime import date, datetime
 from decimal import Decimal
-from typing import Optional, List
-from app.models import UserRole
+from typing import Literal, Optional, List
+from app.models import ExportStatus, OrderStatus, UserRole
+from app import utils
 
 # User Schema
 class UserCreate(BaseModel):
@@ -13,6 +14,20 @@ class UserCreate(BaseModel):
     phone_number: str
     role: UserRole = Field(description="Role of the user")
 
+    # Stored normalized, the form /login looks them up in
+    @field_validator('email')
+    def normalize_email(cls, v):
+        if '@' not in v:
+            raise ValueError('Invalid email address')
+        return utils.normalize_email(v)
+
+    @field_validator('phone_number')
+    def normalize_phone_number(cls, v):
+        phone_number = utils.normalize_phone(v)
+        if phone_number is None:
+            raise ValueError('Invalid phone number')
+        return phone_number
+
 class UserResponse(BaseModel):
     id: int
     name: str
@@ -30,6 +45,15 @@ class UserUpdate(BaseModel):
     address: str | None = None
     phone_number: str | None = None
 
+    @field_validator('phone_number')
+    def normalize_phone_number(cls, v):
+        if v is None:
+            return v
+        phone_number = utils.normalize_phone(v)
+        if phone_number is None:
+            raise ValueError('Invalid phone number')
+        return phone_number
+
 
 # Global Dish Schema
 class GlobalDishResponse(BaseModel):
@@ -48,6 +72,10 @@ class RestaurantResponse(BaseModel):
     city: str
     rating: float
     is_open: bool
+    menu_item_count: int
+    min_price: Decimal | None
+    max_price: Decimal | None
+    is_pure_veg: bool
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -86,21 +114,25 @@ class MenuItemCreate(BaseModel):
     name: str 
     price: float
     is_available: bool = True
+    daily_stock: int | None = Field(None, ge=0)     # portions per day, None = unlimited
 
 class MenuItemUpdate(BaseModel):
     name: str
     price: float | None = None
     is_available: bool | None = None
+    # Sent as null, daily_stock removes the cap. A new daily_stock also resets today's stock unless stock is sent too.
+    daily_stock: int | None = Field(None, ge=0)
+    stock: int | None = Field(None, ge=0)
 
 class MenuItemDelete(BaseModel):
     id: int
 
 
+# rating is derived from reviews, not set at creation
 class RestaurantCreate(BaseModel):
     name: str
     address: str
     city: str
-    rating: float
     is_open: bool
     owner_id: int
 
@@ -141,6 +173,107 @@ class OrderSummaryResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class OrderStatusUpdate(BaseModel):
+    status: OrderStatus
+
+
+class ReviewCreate(BaseModel):
+    rating: int # 1 to 5
+    comment: Optional[str] = None
+
+    @field_validator('rating')
+    def check_rating(cls, v):
+        if v < 1 or v > 5:
+            raise ValueError('Rating must be between 1 and 5')
+        return v
+
+
+class ReviewResponse(BaseModel):
+    id: int
+    order_id: int
+    restaurant_id: int
+    rating: int
+    comment: str | None = None
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class DailySalesResponse(BaseModel):
+    day: date
+    order_count: int
+    cancelled_count: int
+    delivered_count: int
+    revenue: Decimal
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TopDishResponse(BaseModel):
+    menu_item_id: int
+    name: str
+    quantity: int
+    revenue: Decimal
+
+
+class PopularDishResponse(BaseModel):
+    rank: int
+    global_dish_id: int
+    dish_name: str
+    menu_item_id: int
+    restaurant_id: int
+    score: float
+    computed_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Bulk price adjustments (svc_pricing, jobs/adjust_prices.py)
+class PriceRule(BaseModel):
+    # Matches the menu items that satisfy every filter that is set; no filter matches everything
+    city: str | None = None
+    category: str | None = None
+    is_veg: bool | None = None
+    restaurant_ids: list[int] | None = None
+    percent: float = 0.0        # +10 raises by 10%, applied before amount
+    amount: float = 0.0         # added after percent, may be negative
+
+    @field_validator('percent')
+    def check_percent(cls, v):
+        if v <= -100:
+            raise ValueError('percent must be greater than -100')
+        return v
+
+
+class PriceRuleSet(BaseModel):
+    # Matching rules apply in order; rounding and the floor apply once, to items any rule matched
+    rules: list[PriceRule] = Field(min_length=1)
+    round_to: float = Field(1.0, gt=0)      # prices become a multiple of this
+    rounding: Literal["nearest", "up", "down"] = "nearest"
+    floor: float = Field(1.0, ge=0)         # no adjusted price goes below this
+
+
+# Order exports (svc_exports, GET /dashboard/exports)
+class OrderExportCreate(BaseModel):
+    month: str = Field(pattern=r"^\d{4}-(0[1-9]|1[0-2])$")     # YYYY-MM
+    format: Literal["csv", "parquet"] = "csv"
+
+
+class OrderExportResponse(BaseModel):
+    id: int
+    month: date
+    format: str
+    status: ExportStatus
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    row_count: int | None = None
+    file_bytes: int | None = None
+    error: str | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
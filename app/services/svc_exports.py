@@ -0,0 +1,275 @@
+import csv
+import importlib.util
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import database
+from app.config import settings
+from app.models import ExportStatus, GlobalDish, Order, OrderExport, OrderItem, RestaurantMenuItem
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+COLUMNS = [
+    "order_id", "created_at", "status", "total_amount",
+    "order_item_id", "menu_item_id", "dish_name", "category", "quantity", "price_at_order",
+]
+
+# pg_advisory_xact_lock key serializing claims, so two workers can't both take the last slot
+CLAIM_LOCK = 4_702_001
+
+
+def submit_export(db: Session, restaurant_id: int, user_id: int, month: date, format: str)-> OrderExport:
+    if format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parquet exports are not available, request csv")
+    month = month.replace(day=1)
+    if month > date.today():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Month {month:%Y-%m} has not started yet")
+
+    # The same export still waiting or running is returned instead of queueing it twice
+    pending = _pending(db, restaurant_id, month, format)
+    if pending:
+        return pending
+
+    export = OrderExport(restaurant_id=restaurant_id, requested_by=user_id, month=month, format=format)
+    db.add(export)
+    try:
+        db.commit()
+    except IntegrityError:
+        # uq_order_exports_pending: a concurrent request queued it first
+        db.rollback()
+        pending = _pending(db, restaurant_id, month, format)
+        if pending is None:
+            raise
+        return pending
+    db.refresh(export)
+    return export
+
+
+def _pending(db: Session, restaurant_id: int, month: date, format: str)-> OrderExport | None:
+    return db.query(OrderExport).filter(
+        OrderExport.restaurant_id == restaurant_id,
+        OrderExport.month == month,
+        OrderExport.format == format,
+        OrderExport.status.in_([ExportStatus.QUEUED, ExportStatus.RUNNING]),
+    ).first()
+
+
+def get_export(db: Session, restaurant_id: int, export_id: int)->OrderExport:
+    export = db.query(OrderExport).filter(OrderExport.id == export_id, OrderExport.restaurant_id == restaurant_id).first()
+    if not export:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Export with ID: '{export_id}' not found")
+    return export
+
+
+def get_exports(db: Session, restaurant_id: int, limit: int = 20)->List[OrderExport]:
+    return db.query(OrderExport).filter(OrderExport.restaurant_id == restaurant_id).order_by(OrderExport.id.desc()).limit(limit).all()
+
+
+def claim(db: Session)-> int | None:
+    # Starts the oldest waiting export unless export_concurrency are already running (with a live
+    # lease), and returns its id. Exports whose worker died are picked up again once their lease
+    # expires, until export_max_attempts. On Postgres, claims wait for each other on an advisory
+    # lock held for this short transaction; SQLite serializes writers anyway.
+    now = datetime.now()
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(CLAIM_LOCK)))
+
+    running = db.execute(
+        select(func.count()).select_from(OrderExport)
+        .where(OrderExport.status == ExportStatus.RUNNING, OrderExport.locked_until >= now)
+    ).scalar()
+    claimed = None
+    while running < settings.export_concurrency and claimed is None:
+        export = db.execute(
+            select(OrderExport)
+            .where(
+                (OrderExport.status == ExportStatus.QUEUED)
+                | ((OrderExport.status == ExportStatus.RUNNING) & (OrderExport.locked_until < now)),
+            )
+            .order_by(OrderExport.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar()
+        if export is None:
+            break
+        if export.attempts >= settings.export_max_attempts:
+            export.status = ExportStatus.FAILED
+            export.finished_at = now
+            export.locked_until = None
+            export.error = export.error or "Worker stopped while exporting"
+            db.flush()
+            continue
+        export.status = ExportStatus.RUNNING
+        export.started_at = now
+        export.locked_until = now + timedelta(seconds=settings.export_lease_seconds)
+        export.attempts += 1
+        claimed = export.id
+    db.commit()
+    return claimed
+
+
+def _rows(export: OrderExport):
+    start = export.month
+    end = (start + timedelta(days=32)).replace(day=1)
+    return (
+        select(
+            Order.id, Order.created_at, Order.status, Order.total_amount,
+            OrderItem.id, OrderItem.menu_item_id, GlobalDish.name, GlobalDish.category, OrderItem.quantity, OrderItem.price_at_order,
+        )
+        # ix_orders_restaurant_id_created_at; created_at on both sides keeps it to one monthly partition
+        .join(OrderItem, (OrderItem.order_id == Order.id) & (OrderItem.created_at == Order.created_at))
+        .join(RestaurantMenuItem, RestaurantMenuItem.id == OrderItem.menu_item_id)
+        .join(GlobalDish, GlobalDish.id == RestaurantMenuItem.global_dish_id)
+        .where(
+            Order.restaurant_id == export.restaurant_id,
+            Order.created_at >= start, Order.created_at < end,
+            OrderItem.created_at >= start, OrderItem.created_at < end,
+        )
+        .order_by(Order.created_at, Order.id, OrderItem.id)
+    )
+
+
+class _CsvWriter:
+    def __init__(self, path: str):
+        self._handle = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._handle)
+        self._writer.writerow(COLUMNS)
+
+    def write(self, rows: list[tuple])-> None:
+        self._writer.writerows(rows)
+
+    def close(self)-> None:
+        self._handle.close()
+
+
+class _ParquetWriter:
+    # One row group per batch. pyarrow is optional, only workers running parquet exports need it.
+    def __init__(self, path: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([
+            ("order_id", pa.int64()), ("created_at", pa.timestamp("us")), ("status", pa.string()), ("total_amount", pa.float64()),
+            ("order_item_id", pa.int64()), ("menu_item_id", pa.int64()), ("dish_name", pa.string()), ("category", pa.string()),
+            ("quantity", pa.int32()), ("price_at_order", pa.float64()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+
+    def write(self, rows: list[tuple])-> None:
+        arrays = [self._pa.array(column, type=field.type) for column, field in zip(zip(*rows), self._schema)]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self)-> None:
+        self._writer.close()
+
+
+WRITERS = {"csv": _CsvWriter, "parquet": _ParquetWriter}
+
+
+def _update_claimed(export_id: int, attempt: int, **values)-> bool:
+    # Only while this worker still holds the export: a restart by another worker bumps attempts
+    with database.SessionLocal() as db:
+        updated = db.execute(
+            update(OrderExport)
+            .where(OrderExport.id == export_id, OrderExport.status == ExportStatus.RUNNING, OrderExport.attempts == attempt)
+            .values(**values)
+        ).rowcount
+        db.commit()
+    return updated == 1
+
+
+def run_export(export_id: int)-> dict:
+    # Streams the month through a server-side cursor (stream_results, on the replica when there is
+    # one) export_batch_size rows at a time, appending each batch to a temporary file that is renamed
+    # into place at the end, so a download never sees a partial file. The lease is renewed after every
+    # batch; a worker that lost it stops.
+    with database.SessionLocal() as db:
+        export = db.get(OrderExport, export_id)
+        db.expunge(export)
+    attempt = export.attempts
+
+    os.makedirs(settings.export_dir, exist_ok=True)
+    path = os.path.join(settings.export_dir, f"orders-{export.restaurant_id}-{export.month:%Y-%m}-{export.id}.{export.format}")
+    partial = f"{path}.{attempt}.part"
+    engine = database.replica_engine or database.engine
+    # On SQLite the open read would keep the lease update from committing (no MVCC, no server-side cursor)
+    renew_lease = engine.dialect.name == "postgresql"
+    row_count = 0
+    try:
+        writer = WRITERS[export.format](partial)
+        try:
+            with engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=settings.export_batch_size).execute(_rows(export))
+                for rows in result.partitions():
+                    writer.write([(*row[:2], row[2] and row[2].value, *row[3:]) for row in rows])
+                    row_count += len(rows)
+                    if not renew_lease:
+                        continue
+                    lease = datetime.now() + timedelta(seconds=settings.export_lease_seconds)
+                    if not _update_claimed(export_id, attempt, locked_until=lease):
+                        raise RuntimeError("Lease lost, the export was restarted by another worker")
+        finally:
+            writer.close()
+        os.replace(partial, path)
+    except Exception as exc:
+        logger.exception("Export %s, attempt %s failed", export_id, attempt)
+        if os.path.exists(partial):
+            os.remove(partial)
+        # Retried by the next claim until export_max_attempts
+        values = {"error": repr(exc)[:1000], "locked_until": None}
+        if attempt >= settings.export_max_attempts:
+            values.update(status=ExportStatus.FAILED, finished_at=datetime.now())
+        else:
+            values.update(status=ExportStatus.QUEUED)
+        _update_claimed(export_id, attempt, **values)
+        return {"export_id": export_id, "status": values["status"].value, "rows": row_count}
+
+    file_bytes = os.path.getsize(path)
+    _update_claimed(
+        export_id, attempt,
+        status=ExportStatus.DONE, finished_at=datetime.now(), locked_until=None, error=None,
+        row_count=row_count, file_bytes=file_bytes, path=path,
+    )
+    return {"export_id": export_id, "status": ExportStatus.DONE.value, "rows": row_count, "bytes": file_bytes}
+
+
+def expire_exports(db: Session, batch_size: int = 500)-> int:
+    # Deletes finished exports older than export_retention_days, their files first: a download in
+    # between gets a 410, and a file that can't be removed keeps its row for the next run.
+    # Returns how many were deleted.
+    cutoff = datetime.now() - timedelta(days=settings.export_retention_days)
+    deleted = 0
+    while True:
+        expired = db.execute(
+            select(OrderExport.id, OrderExport.path)
+            .where(OrderExport.status.in_([ExportStatus.DONE, ExportStatus.FAILED]), OrderExport.finished_at < cutoff)
+            .order_by(OrderExport.id)
+            .limit(batch_size)
+        ).all()
+        if not expired:
+            return deleted
+        ids = []
+        for export_id, path in expired:
+            try:
+                if path:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.warning("Could not remove the file of export %s: %s", export_id, path, exc_info=True)
+                continue
+            ids.append(export_id)
+        if not ids:
+            return deleted
+        db.execute(delete(OrderExport).where(OrderExport.id.in_(ids)))
+        db.commit()
+        deleted += len(ids)
@@ -1,10 +1,13 @@
-from sqlalchemy.orm import Session
-from app.models import RestaurantMenuItem, GlobalDish, Restaurant
+from sqlalchemy import and_, case, exists, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from app.models import RestaurantMenuItem, GlobalDish, OrderItem, Restaurant
 from fastapi import HTTPException, status
 from app.schemas import MenuItemCreate
+from app import cache, invalidation, outbox
 
 def get_restaurant_by_user_id(db: Session, user_id: int)->Restaurant:
-    restaurant = db.query(Restaurant).filter(Restaurant.owner_id == user_id).first()
+    restaurant = db.query(Restaurant).filter(Restaurant.owner_id == user_id, Restaurant.deleted_at.is_(None)).first()
     
     if not restaurant or not restaurant.is_open:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Current logged in user with user_id: '{user_id}' is not a restaurant owner")
@@ -17,12 +20,185 @@ def check_global_dish_validity(db: Session, dish_name: str)->GlobalDish:
     # If the dish is not available, raise an exception
     # Later change this logic that if the dish is not available, ask admin to add the receipe to global dish table
     # Also once the item is added, the restaurant admin should receive a notification that the item is added to the menu
-    global_dish = db.query(GlobalDish).filter(GlobalDish.name == dish_name).first()
+    def load():
+        global_dish = db.query(GlobalDish).filter(GlobalDish.name == dish_name).first()
+        return cache.snapshot(global_dish) if global_dish else None
+
+    global_dish = cache.dishes.get_or_load(dish_name, load)
     
     if not global_dish:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Global dish with name: '{dish_name}' is not available")
     
-    return global_dish
+    return cache.attach(db, global_dish)
+
+def _card_values(count, veg_count, min_price, max_price)-> dict:
+    # SET clause for the card columns; every expression reads the row as it was before the UPDATE
+    return {
+        Restaurant.menu_item_count: count,
+        Restaurant.veg_item_count: veg_count,
+        Restaurant.min_price: min_price,
+        Restaurant.max_price: max_price,
+        Restaurant.is_pure_veg: and_(count > 0, veg_count == count),
+    }
+
+def _menu_price(aggregate):
+    return select(aggregate(RestaurantMenuItem.price)).where(RestaurantMenuItem.restaurant_id == Restaurant.id).scalar_subquery()
+
+def _veg_items():
+    return (
+        select(func.count(RestaurantMenuItem.id))
+        .join(GlobalDish, GlobalDish.id == RestaurantMenuItem.global_dish_id)
+        .where(RestaurantMenuItem.restaurant_id == Restaurant.id, GlobalDish.is_veg.is_(True))
+        .scalar_subquery()
+    )
+
+def lock_menu(db: Session, restaurant_id: int, global_dish_id: int | None = None)-> bool:
+    # Menu writes of a restaurant queue on its row, so the min / max recomputed below see every
+    # earlier write. The dish is locked first (FOR SHARE, update_dish takes it FOR UPDATE) so an
+    # is_veg flip is counted exactly once; always dish then restaurant, like update_dish.
+    # Returns the dish's current is_veg.
+    is_veg = False
+    if global_dish_id is not None:
+        is_veg = bool(db.execute(
+            select(GlobalDish.is_veg).where(GlobalDish.id == global_dish_id).with_for_update(read=True)
+        ).scalar())
+    db.execute(select(Restaurant.id).where(Restaurant.id == restaurant_id).with_for_update())
+    return is_veg
+
+def get_menu_item_for_update(db: Session, restaurant_id: int, menu_item_id: int)->RestaurantMenuItem | None:
+    # The item as it is once its restaurant is locked (lock_menu), with its dish.
+    # None when it is not on this restaurant's menu, another restaurant is never locked.
+    row = db.query(RestaurantMenuItem.restaurant_id, RestaurantMenuItem.global_dish_id).filter(
+        RestaurantMenuItem.id == menu_item_id, RestaurantMenuItem.restaurant_id == restaurant_id
+    ).first()
+    if row is None:
+        return None
+    lock_menu(db, row.restaurant_id, row.global_dish_id)
+    return db.query(RestaurantMenuItem).options(joinedload(RestaurantMenuItem.dish)).filter(RestaurantMenuItem.id == menu_item_id).first()
+
+def has_orders(db: Session, menu_item_id: int)-> bool:
+    return db.query(exists().where(OrderItem.menu_item_id == menu_item_id)).scalar()
+
+def record_item_added(db: Session, restaurant_id: int, price: float, is_veg: bool)-> None:
+    # One UPDATE of the card columns, after lock_menu
+    db.execute(
+        update(Restaurant)
+        .where(Restaurant.id == restaurant_id)
+        .values(_card_values(
+            Restaurant.menu_item_count + 1,
+            Restaurant.veg_item_count + int(is_veg),
+            case((Restaurant.min_price.is_(None) | (Restaurant.min_price > price), price), else_=Restaurant.min_price),
+            case((Restaurant.max_price.is_(None) | (Restaurant.max_price < price), price), else_=Restaurant.max_price),
+        ))
+        .execution_options(synchronize_session=False)
+    )
+
+def record_item_removed(db: Session, restaurant_id: int, price: float, is_veg: bool)-> None:
+    # After the item's DELETE is flushed: min / max are only recomputed when it held one of them
+    db.execute(
+        update(Restaurant)
+        .where(Restaurant.id == restaurant_id)
+        .values(_card_values(
+            Restaurant.menu_item_count - 1,
+            Restaurant.veg_item_count - int(is_veg),
+            case((Restaurant.min_price == price, _menu_price(func.min)), else_=Restaurant.min_price),
+            case((Restaurant.max_price == price, _menu_price(func.max)), else_=Restaurant.max_price),
+        ))
+        .execution_options(synchronize_session=False)
+    )
+
+def record_price_changed(db: Session, restaurant_id: int, old_price: float, new_price: float)-> None:
+    # After the new price is flushed: a new extreme is taken as is, an old one that moved inwards is recomputed
+    if old_price == new_price:
+        return
+    db.execute(
+        update(Restaurant)
+        .where(Restaurant.id == restaurant_id)
+        .values({
+            Restaurant.min_price: case(
+                (Restaurant.min_price >= new_price, new_price),
+                (Restaurant.min_price == old_price, _menu_price(func.min)),
+                else_=Restaurant.min_price,
+            ),
+            Restaurant.max_price: case(
+                (Restaurant.max_price <= new_price, new_price),
+                (Restaurant.max_price == old_price, _menu_price(func.max)),
+                else_=Restaurant.max_price,
+            ),
+        })
+        .execution_options(synchronize_session=False)
+    )
+
+def record_dish_veg_changed(db: Session, global_dish_id: int, is_veg: bool)-> list[int]:
+    # Every restaurant listing the dish gains or loses a veg item; the caller holds the dish
+    # row lock (update_dish). Returns the restaurant ids.
+    veg_count = Restaurant.veg_item_count + (1 if is_veg else -1)
+    return db.execute(
+        update(Restaurant)
+        .where(Restaurant.id.in_(select(RestaurantMenuItem.restaurant_id).where(RestaurantMenuItem.global_dish_id == global_dish_id)))
+        .values({
+            Restaurant.veg_item_count: veg_count,
+            Restaurant.is_pure_veg: and_(Restaurant.menu_item_count > 0, veg_count == Restaurant.menu_item_count),
+        })
+        .returning(Restaurant.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+def take_stock(db: Session, menu_item_id: int, quantity: int)-> int | None:
+    # For items with a stock counter. A single conditional UPDATE: concurrent orders queue on the row
+    # and each re-checks the stock the previous one left, so it can never be oversold. The item turns
+    # unavailable when it reaches zero. Returns the stock left, None when fewer than quantity remain.
+    return db.execute(
+        update(RestaurantMenuItem)
+        .where(RestaurantMenuItem.id == menu_item_id, RestaurantMenuItem.stock >= quantity)
+        .values(stock=RestaurantMenuItem.stock - quantity, is_available=RestaurantMenuItem.stock > quantity)
+        .returning(RestaurantMenuItem.stock)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+def return_stock(db: Session, quantities: dict[int, int])->bool:
+    # The reverse of take_stock for a cancelled order: items with a stock counter get the quantities
+    # back and are available again. In id order, like place_order. Returns whether an item that was
+    # sold out came back, so the menu caches need refreshing.
+    restocked = False
+    for menu_item_id in sorted(quantities):
+        was_sold_out = db.execute(
+            update(RestaurantMenuItem)
+            .where(RestaurantMenuItem.id == menu_item_id, RestaurantMenuItem.stock.is_not(None))
+            .values(stock=RestaurantMenuItem.stock + quantities[menu_item_id], is_available=True)
+            .returning(RestaurantMenuItem.stock == quantities[menu_item_id])
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        restocked = restocked or bool(was_sold_out)
+    return restocked
+
+def refresh_cards(db: Session, restaurant_ids: list[int])->int:
+    # Recompute the card columns of the given restaurants from their menus and return how many
+    # had drifted (datagen, jobs/reaggregate_ratings.py). Does not commit; callers keep batches small.
+    if not restaurant_ids:
+        return 0
+
+    # Same locking as svc_review.reaggregate_ratings: menu writes committing later apply on top
+    db.execute(select(Restaurant.id).where(Restaurant.id.in_(restaurant_ids)).order_by(Restaurant.id).with_for_update())
+
+    counts = select(func.count(RestaurantMenuItem.id)).where(RestaurantMenuItem.restaurant_id == Restaurant.id).scalar_subquery()
+    values = _card_values(counts, _veg_items(), _menu_price(func.min), _menu_price(func.max))
+    drifted = db.execute(
+        update(Restaurant)
+        .where(
+            Restaurant.id.in_(restaurant_ids),
+            (Restaurant.menu_item_count != values[Restaurant.menu_item_count])
+            | (Restaurant.veg_item_count != values[Restaurant.veg_item_count])
+            | Restaurant.min_price.is_distinct_from(values[Restaurant.min_price])
+            | Restaurant.max_price.is_distinct_from(values[Restaurant.max_price])
+            | (Restaurant.is_pure_veg != values[Restaurant.is_pure_veg]),
+        )
+        .values(values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if drifted:
+        invalidation.publish(db, cache.menus, *restaurant_ids)
+    return drifted
 
 def add_item_to_menu(db: Session, user_id: int, item_in: MenuItemCreate)->RestaurantMenuItem:
     
@@ -35,16 +211,30 @@ def add_item_to_menu(db: Session, user_id: int, item_in: MenuItemCreate)->Restau
     # Check if global dish is valid
     global_dish = check_global_dish_validity(db, item_in.name)
     # print(f"add_item_to_menu -> Global_dish_id: {global_dish.id}")
+    is_veg = lock_menu(db, restaurant.id, global_dish.id)
     
     # Create the link between the Restaurant and the Global Dish
     new_item = RestaurantMenuItem(
         restaurant_id=restaurant.id,
         global_dish_id=global_dish.id,
         price=item_in.price,
-        is_available=item_in.is_available
+        is_available=item_in.is_available and item_in.daily_stock != 0,
+        stock=item_in.daily_stock,
+        daily_stock=item_in.daily_stock,
     )   
 
     db.add(new_item)
+    try:
+        db.flush()
+    except IntegrityError:
+        # uq_restaurant_menu_items_restaurant_dish
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Dish '{item_in.name}' is already on the menu")
+    record_item_added(db, restaurant.id, new_item.price, is_veg)
+    invalidation.publish(db, cache.menus, restaurant.id)
+    outbox.enqueue(db, "menu_item.added", {
+        "restaurant_id": restaurant.id, "global_dish_id": global_dish.id, "dish_name": global_dish.name,
+    })
     db.commit()
     db.refresh(new_item)
     
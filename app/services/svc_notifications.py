@@ -0,0 +1,52 @@
+# Outbox handlers for order and menu events, run by jobs/outbox_worker.py.
+# There is no push/email provider yet, so notifications are logged; order
+# events are also POSTed to settings.order_webhook_url when it is set.
+import logging
+
+import httpx
+
+from app import outbox
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_webhook_client: httpx.AsyncClient | None = None
+
+
+def _client()-> httpx.AsyncClient:
+    global _webhook_client
+    if _webhook_client is None:
+        _webhook_client = httpx.AsyncClient(timeout=5.0)
+    return _webhook_client
+
+
+async def _post_webhook(event: str, payload: dict)-> None:
+    if not settings.order_webhook_url:
+        return
+    response = await _client().post(settings.order_webhook_url, json={"event": event, **payload})
+    response.raise_for_status()     # non 2xx -> retried with backoff by the worker
+
+
+@outbox.handler("menu_item.added")
+async def notify_menu_item_added(payload: dict)-> None:
+    logger.info("Notify owner of restaurant %s: '%s' was added to the menu", payload["restaurant_id"], payload["dish_name"])
+
+
+@outbox.handler("order.placed")
+async def notify_order_placed(payload: dict)-> None:
+    logger.info("Notify restaurant %s: new order %s", payload["restaurant_id"], payload["order_id"])
+
+
+@outbox.handler("order.placed")
+async def webhook_order_placed(payload: dict)-> None:
+    await _post_webhook("order.placed", payload)
+
+
+@outbox.handler("order.status_changed")
+async def notify_order_status_changed(payload: dict)-> None:
+    logger.info("Notify user %s: order %s is now %s", payload["user_id"], payload["order_id"], payload["status"])
+
+
+@outbox.handler("order.status_changed")
+async def webhook_order_status_changed(payload: dict)-> None:
+    await _post_webhook("order.status_changed", payload)
@@ -0,0 +1,134 @@
+from sqlalchemy.orm import Session, selectinload
+from app.models import Order, OrderItem, OrderStatus, Restaurant, RestaurantMenuItem
+from fastapi import HTTPException, status
+from app.schemas import OrderCreate
+from app.services import svc_menu, svc_sales
+from app import cache, invalidation, outbox
+from typing import List
+
+# Forward-only lifecycle. Users may cancel while PLACED, restaurants until CONFIRMED.
+ALLOWED_TRANSITIONS = {
+    OrderStatus.PLACED: {OrderStatus.CONFIRMED, OrderStatus.CANCELLED},
+    OrderStatus.CONFIRMED: {OrderStatus.PREPARING, OrderStatus.CANCELLED},
+    OrderStatus.PREPARING: {OrderStatus.OUT_FOR_DELIVERY},
+    OrderStatus.OUT_FOR_DELIVERY: {OrderStatus.DELIVERED},
+}
+
+
+def get_order_with_items(db: Session, order_id: int)->Order:
+    # Load items, their menu item and dish in three IN queries instead of one lazy load per item
+    return db.query(Order).options(
+        selectinload(Order.items).selectinload(OrderItem.menu_item).selectinload(RestaurantMenuItem.dish)
+    ).filter(Order.id == order_id).first()
+
+
+def get_orders_for_user(db: Session, user_id: int, skip: int = 0, limit: int = 50)->List[Order]:
+    return db.query(Order).filter(Order.user_id == user_id).order_by(Order.id.desc()).offset(skip).limit(limit).all()
+
+
+def get_orders_for_restaurant(db: Session, restaurant_id: int, skip: int = 0, limit: int = 50)->List[Order]:
+    return db.query(Order).filter(Order.restaurant_id == restaurant_id).order_by(Order.id.desc()).offset(skip).limit(limit).all()
+
+
+def place_order(db: Session, user_id: int, order_in: OrderCreate)->Order:
+    if not order_in.items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Order must contain at least one item")
+
+    restaurant = db.query(Restaurant).filter(Restaurant.id == order_in.restaurant_id, Restaurant.deleted_at.is_(None)).first()
+
+    if not restaurant or not restaurant.is_open:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Restaurant with id: {order_in.restaurant_id} is not accepting orders")
+
+    # One query for all requested menu items, restricted to this restaurant
+    requested_ids = {item.menu_item_id for item in order_in.items}
+    menu_items = {
+        menu_item.id: menu_item
+        for menu_item in db.query(RestaurantMenuItem).filter(
+            RestaurantMenuItem.id.in_(requested_ids),
+            RestaurantMenuItem.restaurant_id == restaurant.id,
+        ).all()
+    }
+
+    order = Order(
+        user_id=user_id,
+        restaurant_id=restaurant.id,
+        delivery_address=order_in.delivery_address,
+        status=OrderStatus.PLACED,
+        total_amount=0,
+    )
+
+    total = 0.0
+    for item in order_in.items:
+        menu_item = menu_items.get(item.menu_item_id)
+
+        if not menu_item or not menu_item.is_available:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Menu item with ID: '{item.menu_item_id}' is not available")
+
+        if item.quantity <= 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be greater than zero")
+
+        order.items.append(OrderItem(menu_item_id=menu_item.id, quantity=item.quantity, price_at_order=menu_item.price))
+        total += menu_item.price * item.quantity
+
+    order.total_amount = total
+
+    db.add(order)
+    db.flush()      # assigns order.id for the event
+    svc_sales.record_order_placed(db, order)
+    outbox.enqueue(db, "order.placed", {
+        "order_id": order.id, "restaurant_id": order.restaurant_id, "user_id": order.user_id, "total_amount": order.total_amount,
+    })
+
+    # Stock is taken last so the row locks of popular items are held only until the commit below,
+    # and in id order so two orders never wait on each other's items
+    quantities: dict[int, int] = {}
+    for item in order_in.items:
+        quantities[item.menu_item_id] = quantities.get(item.menu_item_id, 0) + item.quantity
+    sold_out = False
+    for menu_item_id in sorted(quantities):
+        if menu_items[menu_item_id].stock is None:
+            continue
+        left = svc_menu.take_stock(db, menu_item_id, quantities[menu_item_id])
+        if left is None:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Menu item with ID: '{menu_item_id}' has fewer than {quantities[menu_item_id]} left")
+        sold_out = sold_out or left == 0
+    if sold_out:
+        invalidation.publish(db, cache.menus, restaurant.id)
+    db.commit()
+
+    return get_order_with_items(db, order.id)
+
+
+def change_order_status(db: Session, order: Order, new_status: OrderStatus)->Order:
+    previous = order.status
+
+    if new_status not in ALLOWED_TRANSITIONS.get(previous, set()):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Order cannot move from {previous.value} to {new_status.value}")
+
+    # Conditional update: a concurrent change of the same order makes this match nothing,
+    # so the rollups are never adjusted twice
+    updated = db.query(Order).filter(
+        Order.id == order.id,
+        Order.status == previous,
+    ).update({Order.status: new_status}, synchronize_session=False)
+
+    if updated != 1:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Order with ID: '{order.id}' was modified concurrently, retry")
+
+    if new_status == OrderStatus.CANCELLED:
+        quantities: dict[int, int] = {}
+        for item in order.items:
+            quantities[item.menu_item_id] = quantities.get(item.menu_item_id, 0) + item.quantity
+        if svc_menu.return_stock(db, quantities):
+            invalidation.publish(db, cache.menus, order.restaurant_id)
+
+    svc_sales.record_status_change(db, order, previous, new_status)
+    outbox.enqueue(db, "order.status_changed", {
+        "order_id": order.id, "restaurant_id": order.restaurant_id, "user_id": order.user_id,
+        "previous": previous.value, "status": new_status.value,
+    })
+    db.commit()
+    db.refresh(order)
+    return order
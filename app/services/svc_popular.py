@@ -0,0 +1,142 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from app.models import GlobalDish, Order, OrderItem, OrderStatus, PopularDish, Restaurant, RestaurantMenuItem
+from app.sketches import CountMinSketch, TopK
+from typing import List
+
+
+@dataclass(frozen=True)
+class Period:
+    lookback: timedelta     # older orders are ignored
+    half_life: timedelta    # an order this old counts half
+
+
+PERIODS = {
+    "1d": Period(timedelta(days=1), timedelta(hours=6)),
+    "7d": Period(timedelta(days=7), timedelta(days=2)),
+}
+
+# Candidates kept per city, as multiples of k: some may be gone (deleted restaurant) when ranks are written
+DISH_SLACK = 2
+ITEM_SLACK = 5
+
+
+class _Ranking:
+    # One period's sketches. Forward decay: an order at time t adds quantity * 2^((t - landmark) / half_life),
+    # so counts never have to be decayed as the stream goes on; scale() turns them into "as of now" values.
+    def __init__(self, period: Period, now: datetime, k: int, width: int, depth: int):
+        self.since = now - period.lookback
+        self.half_life = period.half_life.total_seconds()
+        self.scale = 2 ** (-period.lookback.total_seconds() / self.half_life)
+        self.k = k
+        self.dishes = CountMinSketch(width, depth, seed=1)
+        self.items = CountMinSketch(width, depth, seed=2)
+        self.top_dishes: dict[int, TopK] = {}
+        self.top_items: dict[int, TopK] = {}
+
+    def add(self, city_id: int, dish_id: int, menu_item_id: int, quantity: int, created_at: datetime)-> None:
+        weight = quantity * 2 ** ((created_at - self.since).total_seconds() / self.half_life)
+        # City in the high bits: the same dish is counted separately per city
+        dish_key = (city_id << 32) | dish_id
+        top = self.top_dishes.get(city_id)
+        if top is None:
+            top = self.top_dishes[city_id] = TopK(self.k * DISH_SLACK)
+            self.top_items[city_id] = TopK(self.k * ITEM_SLACK)
+        top.offer(dish_key, self.dishes.add(dish_key, weight))
+        self.top_items[city_id].offer(menu_item_id, self.items.add(menu_item_id, weight))
+
+
+def compute_popular(
+    db: Session,
+    periods: list[str] | None = None,
+    k: int = 20,
+    width: int = 1 << 15,
+    depth: int = 4,
+    now: datetime | None = None,
+)-> dict:
+    # One streaming pass over the order items of the longest period: memory is the sketches plus
+    # a few candidates per city, however many orders there are. Then replaces the periods' rows
+    # in popular_dishes in one transaction, so readers see the old or the new ranking.
+    now = now or datetime.now()
+    rankings = {name: _Ranking(PERIODS[name], now, k, width, depth) for name in (periods or PERIODS)}
+    since = min(ranking.since for ranking in rankings.values())
+
+    city_ids: dict[str, int] = {}
+    streamed = 0
+    rows = db.execute(
+        select(OrderItem.created_at, OrderItem.quantity, OrderItem.menu_item_id, RestaurantMenuItem.global_dish_id, Restaurant.city)
+        # created_at on both sides prunes the monthly partitions
+        .join(Order, (Order.id == OrderItem.order_id) & (Order.created_at == OrderItem.created_at))
+        .join(RestaurantMenuItem, RestaurantMenuItem.id == OrderItem.menu_item_id)
+        .join(Restaurant, Restaurant.id == Order.restaurant_id)
+        .where(
+            OrderItem.created_at >= since,
+            Order.created_at >= since,
+            Order.status != OrderStatus.CANCELLED,
+            Restaurant.deleted_at.is_(None),
+            Restaurant.city.is_not(None),
+        )
+        .execution_options(yield_per=10_000)
+    )
+    for created_at, quantity, menu_item_id, dish_id, city in rows:
+        city_id = city_ids.setdefault(city, len(city_ids))
+        for ranking in rankings.values():
+            if created_at >= ranking.since:
+                ranking.add(city_id, dish_id, menu_item_id, quantity, created_at)
+        streamed += 1
+
+    # Names and restaurants of the candidate items only
+    candidate_items = {item for ranking in rankings.values() for top in ranking.top_items.values() for item in top.scores}
+    items = {}
+    if candidate_items:
+        items = {row.id: row for row in db.execute(
+            select(RestaurantMenuItem.id, RestaurantMenuItem.global_dish_id, RestaurantMenuItem.restaurant_id, GlobalDish.name)
+            .join(GlobalDish, GlobalDish.id == RestaurantMenuItem.global_dish_id)
+            .join(Restaurant, Restaurant.id == RestaurantMenuItem.restaurant_id)
+            .where(RestaurantMenuItem.id.in_(candidate_items), Restaurant.deleted_at.is_(None))
+        )}
+
+    cities = {city_id: city for city, city_id in city_ids.items()}
+    written = {}
+    db.execute(delete(PopularDish).where(PopularDish.period.in_(list(rankings))))
+    for name, ranking in rankings.items():
+        new_rows = []
+        for city_id, top in ranking.top_dishes.items():
+            # Each dish links to its best selling listing in the city
+            best_item: dict[int, int] = {}
+            for menu_item_id, _ in ranking.top_items[city_id].items():
+                item = items.get(menu_item_id)
+                if item is not None:
+                    best_item.setdefault(item.global_dish_id, menu_item_id)
+
+            rank = 0
+            for dish_key, score in top.items():
+                menu_item_id = best_item.get(dish_key & 0xFFFFFFFF)
+                if menu_item_id is None:
+                    continue
+                rank += 1
+                item = items[menu_item_id]
+                new_rows.append({
+                    "city": cities[city_id], "period": name, "rank": rank,
+                    "global_dish_id": item.global_dish_id, "dish_name": item.name,
+                    "menu_item_id": menu_item_id, "restaurant_id": item.restaurant_id,
+                    "score": round(score * ranking.scale, 3), "computed_at": now,
+                })
+                if rank == k:
+                    break
+        if new_rows:
+            db.execute(insert(PopularDish), new_rows)
+        written[name] = len(new_rows)
+    db.commit()
+
+    sketch_bytes = sum(ranking.dishes.bytes + ranking.items.bytes for ranking in rankings.values())
+    return {"order_items": streamed, "cities": len(city_ids), "rows": written, "sketch_bytes": sketch_bytes}
+
+
+def get_popular_dishes(db: Session, city: str, period: str = "1d", limit: int = 10)-> List[PopularDish]:
+    # A primary key range scan: (city, period, rank)
+    return db.query(PopularDish).filter(
+        PopularDish.city == city, PopularDish.period == period,
+    ).order_by(PopularDish.rank).limit(limit).all()
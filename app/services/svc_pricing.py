@@ -0,0 +1,182 @@
+import csv
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import Float, Integer, bindparam, column, select, update, values
+from sqlalchemy.orm import Session
+from app.models import GlobalDish, Restaurant, RestaurantMenuItem
+from app.schemas import PriceRule, PriceRuleSet
+from app import cache, invalidation
+from app.services import svc_menu
+
+
+@dataclass
+class PriceTable:
+    # Columnar snapshot of the live menu items. Strings are dictionary encoded: city[i] is an
+    # index into cities (-1 when unset), category[i] into categories.
+    ids: np.ndarray                 # int64
+    restaurant_ids: np.ndarray      # int64
+    prices: np.ndarray              # float64
+    city: np.ndarray                # int32
+    category: np.ndarray            # int32
+    is_veg: np.ndarray              # bool
+    cities: list[str]
+    categories: list[str]
+
+    def __len__(self)-> int:
+        return len(self.ids)
+
+
+def _encode(value: str | None, codes: dict[str, int])-> int:
+    if value is None:
+        return -1
+    code = codes.get(value)
+    if code is None:
+        code = codes[value] = len(codes)
+    return code
+
+
+def load_prices(db: Session, chunk_size: int = 50_000)-> PriceTable:
+    # Streams the items of live restaurants, chunk_size rows at a time, into one array per column
+    result = db.execute(
+        select(
+            RestaurantMenuItem.id, RestaurantMenuItem.restaurant_id, RestaurantMenuItem.price,
+            Restaurant.city, GlobalDish.category, GlobalDish.is_veg,
+        )
+        .join(Restaurant, Restaurant.id == RestaurantMenuItem.restaurant_id)
+        .join(GlobalDish, GlobalDish.id == RestaurantMenuItem.global_dish_id)
+        .where(Restaurant.deleted_at.is_(None))
+        .order_by(RestaurantMenuItem.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    cities: dict[str, int] = {}
+    categories: dict[str, int] = {}
+    chunks = []
+    for rows in result.partitions():
+        ids, restaurant_ids, prices, city, category, is_veg = zip(*rows)
+        chunks.append((
+            np.array(ids, dtype=np.int64),
+            np.array(restaurant_ids, dtype=np.int64),
+            np.array(prices, dtype=np.float64),
+            np.array([_encode(value, cities) for value in city], dtype=np.int32),
+            np.array([_encode(value, categories) for value in category], dtype=np.int32),
+            np.array([bool(value) for value in is_veg], dtype=bool),
+        ))
+
+    empty = (np.int64, np.int64, np.float64, np.int32, np.int32, bool)
+    columns = [
+        np.concatenate([chunk[index] for chunk in chunks]) if chunks else np.empty(0, dtype=dtype)
+        for index, dtype in enumerate(empty)
+    ]
+    return PriceTable(*columns, cities=list(cities), categories=list(categories))
+
+
+def _match(table: PriceTable, rule: PriceRule)-> np.ndarray:
+    mask = np.ones(len(table), dtype=bool)
+    if rule.city is not None:
+        code = table.cities.index(rule.city) if rule.city in table.cities else -2
+        mask &= table.city == code
+    if rule.category is not None:
+        code = table.categories.index(rule.category) if rule.category in table.categories else -2
+        mask &= table.category == code
+    if rule.is_veg is not None:
+        mask &= table.is_veg == rule.is_veg
+    if rule.restaurant_ids:
+        mask &= np.isin(table.restaurant_ids, rule.restaurant_ids)
+    return mask
+
+
+def apply_rules(table: PriceTable, rule_set: PriceRuleSet)-> np.ndarray:
+    # New price of every item in table (unchanged where no rule matched); whole-column operations only
+    prices = table.prices.copy()
+    touched = np.zeros(len(table), dtype=bool)
+    for rule in rule_set.rules:
+        mask = _match(table, rule)
+        prices[mask] = prices[mask] * (1 + rule.percent / 100) + rule.amount
+        touched |= mask
+
+    # The epsilon keeps 10 * 1.1 = 11.000000000000002 from rounding up to the next step
+    steps = prices[touched] / rule_set.round_to
+    if rule_set.rounding == "up":
+        steps = np.ceil(steps - 1e-9)
+    elif rule_set.rounding == "down":
+        steps = np.floor(steps + 1e-9)
+    else:
+        steps = np.floor(steps + 0.5)
+    prices[touched] = np.maximum(np.round(steps * rule_set.round_to, 2), rule_set.floor)
+    return prices
+
+
+def changed_rows(table: PriceTable, new_prices: np.ndarray)-> np.ndarray:
+    # Indexes of the items whose price changes, ordered by restaurant so a write batch locks few restaurants
+    changed = np.flatnonzero(new_prices != table.prices)
+    return changed[np.lexsort((table.ids[changed], table.restaurant_ids[changed]))]
+
+
+def summarize(table: PriceTable, new_prices: np.ndarray, changed: np.ndarray)-> dict:
+    old, new = table.prices[changed], new_prices[changed]
+    change_pct = (new - old) / np.where(old == 0, 1, old) * 100
+    codes, counts = np.unique(table.city[changed], return_counts=True)
+    return {
+        "items": len(table),
+        "changed": len(changed),
+        "restaurants": int(np.unique(table.restaurant_ids[changed]).size),
+        "mean_change_pct": round(float(change_pct.mean()), 2) if len(changed) else 0.0,
+        "min_change_pct": round(float(change_pct.min()), 2) if len(changed) else 0.0,
+        "max_change_pct": round(float(change_pct.max()), 2) if len(changed) else 0.0,
+        "changed_by_city": {
+            (table.cities[code] if code >= 0 else None): int(count) for code, count in zip(codes.tolist(), counts.tolist())
+        },
+    }
+
+
+def write_diff(path: str, table: PriceTable, new_prices: np.ndarray, changed: np.ndarray)-> None:
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["menu_item_id", "restaurant_id", "city", "category", "is_veg", "old_price", "new_price"])
+        for index in changed.tolist():
+            city, category = table.city[index], table.category[index]
+            writer.writerow([
+                int(table.ids[index]), int(table.restaurant_ids[index]),
+                table.cities[city] if city >= 0 else "", table.categories[category] if category >= 0 else "",
+                bool(table.is_veg[index]), float(table.prices[index]), float(new_prices[index]),
+            ])
+
+
+def write_prices(db: Session, table: PriceTable, new_prices: np.ndarray, changed: np.ndarray, batch_size: int = 1_000)-> dict:
+    # One short transaction per batch. A row is only updated while it still has the price that
+    # was loaded, so an owner's edit made in the meantime wins and is counted as skipped.
+    postgres = db.get_bind().dialect.name == "postgresql"
+    updated = 0
+    for start in range(0, len(changed), batch_size):
+        batch = changed[start:start + batch_size]
+        rows = list(zip(table.ids[batch].tolist(), new_prices[batch].tolist(), table.prices[batch].tolist()))
+        restaurant_ids = sorted(set(table.restaurant_ids[batch].tolist()))
+
+        # Same lock order as the menu routes (svc_menu.lock_menu): restaurant rows, then items
+        db.execute(select(Restaurant.id).where(Restaurant.id.in_(restaurant_ids)).order_by(Restaurant.id).with_for_update())
+        if postgres:
+            # UPDATE ... FROM (VALUES (id, price, old_price), ...): one statement per batch
+            new = values(column("id", Integer), column("price", Float), column("old_price", Float), name="new").data(rows)
+            updated += db.execute(
+                update(RestaurantMenuItem)
+                .where(RestaurantMenuItem.id == new.c.id, RestaurantMenuItem.price == new.c.old_price)
+                .values(price=new.c.price)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        else:
+            # SQLite has no column aliases for VALUES, executemany instead
+            items = RestaurantMenuItem.__table__
+            updated += db.execute(
+                update(items)
+                .where(items.c.id == bindparam("item_id"), items.c.price == bindparam("old_price"))
+                .values(price=bindparam("new_price")),
+                [{"item_id": item_id, "new_price": price, "old_price": old} for item_id, price, old in rows],
+            ).rowcount
+
+        # min_price / max_price on the restaurant cards, and the cached menus
+        svc_menu.refresh_cards(db, restaurant_ids)
+        invalidation.publish(db, cache.menus, *restaurant_ids)
+        db.commit()
+
+    return {"updated": updated, "skipped": len(changed) - updated}
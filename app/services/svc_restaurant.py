@@ -1,16 +1,74 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from app.models import Restaurant, RestaurantMenuItem
+from fastapi import HTTPException, status
 from typing import List
+from app import cache, database, sparse
+from app.schemas import RestaurantWithMenuResponse
 
-def get_restaurants(db: Session, skip: int = 0, limit: int = 100) -> List[Restaurant]:
-    return db.query(Restaurant).offset(skip).limit(limit).all()
+def get_restaurants(
+    db: Session, skip: int = 0, limit: int = 100, sort: str | None = None, pure_veg: bool = False,
+    max_price: float | None = None, fields: sparse.FieldSet | None = None
+) -> List[Restaurant]:
+    query = db.query(Restaurant).filter(Restaurant.deleted_at.is_(None))
+    if fields is not None:
+        query = query.options(*sparse.load_options(Restaurant, fields))
+
+    # Filters on the stored card aggregates (svc_menu), each backed by a partial index:
+    # ix_restaurants_pure_veg (in rating order) and ix_restaurants_min_price (a range scan)
+    if pure_veg:
+        query = query.filter(Restaurant.is_pure_veg.is_(True))
+    if max_price is not None:
+        query = query.filter(Restaurant.min_price <= max_price)
+
+    # Every ordering walks an index (primary key / ix_restaurants_rating / ix_restaurants_min_price /
+    # ix_restaurants_menu_item_count) instead of sorting; restaurants without a menu sort last by price
+    if sort == "rating":
+        query = query.order_by(Restaurant.rating.desc(), Restaurant.id.desc())
+    elif sort == "price":
+        query = query.order_by(Restaurant.min_price.asc().nulls_last(), Restaurant.id)
+    elif sort == "menu_size":
+        query = query.order_by(Restaurant.menu_item_count.desc(), Restaurant.id.desc())
+    else:
+        query = query.order_by(Restaurant.id)
+
+    return query.offset(skip).limit(limit).all()
 
 def get_restaurant_by_id(db: Session, restaurant_id: int) -> Restaurant:
-    restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
+    restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id, Restaurant.deleted_at.is_(None)).first()
     
     # Get menu items for the restaurant only when restaurant is valid object
     if restaurant:
-        menu_items = db.query(RestaurantMenuItem).filter(RestaurantMenuItem.restaurant_id == restaurant_id).all()
+        menu_items = db.query(RestaurantMenuItem).options(joinedload(RestaurantMenuItem.dish)).filter(RestaurantMenuItem.restaurant_id == restaurant_id).all()
         restaurant.menu_items = menu_items
     
-    return restaurant
\ No newline at end of file
+    return restaurant
+
+def get_restaurant_with_menu(db: Session, restaurant_id: int, fields: sparse.FieldSet | None = None) -> RestaurantWithMenuResponse | Restaurant | None:
+    # Served from the per-worker menus cache; every write to a restaurant or its menu evicts it
+    # (invalidation.publish). Rows read from a lagging replica are served but not cached.
+    if fields is not None:
+        # Partial rows are never cached, but a cached full response serves any subset
+        cached = cache.menus.peek(restaurant_id)
+        if cached is not None:
+            return cached
+        return (
+            db.query(Restaurant)
+            .options(*sparse.load_options(Restaurant, fields))
+            .filter(Restaurant.id == restaurant_id, Restaurant.deleted_at.is_(None))
+            .first()
+        )
+
+    def load():
+        restaurant = get_restaurant_by_id(db, restaurant_id)
+        return RestaurantWithMenuResponse.model_validate(restaurant) if restaurant else None
+
+    return cache.menus.get_or_load(restaurant_id, load, store=db.get_bind() is database.engine)
+
+def get_owned_restaurant(db: Session, user_id: int) -> Restaurant:
+    # Unlike svc_menu.get_restaurant_by_user_id, closed restaurants still see their orders and sales
+    restaurant = db.query(Restaurant).filter(Restaurant.owner_id == user_id, Restaurant.deleted_at.is_(None)).first()
+
+    if not restaurant:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Current logged in user with user_id: '{user_id}' is not a restaurant owner")
+
+    return restaurant
@@ -0,0 +1,87 @@
+from sqlalchemy import Float, cast, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import Order, OrderStatus, Restaurant, Review
+from fastapi import HTTPException, status
+from app.schemas import ReviewCreate
+from app import cache, invalidation
+from typing import List
+
+
+def _average(rating_sum, rating_count):
+    return func.coalesce(cast(rating_sum, Float) / func.nullif(rating_count, 0), 0.0)
+
+
+def create_review(db: Session, order: Order, review_in: ReviewCreate)->Review:
+    if order.status != OrderStatus.DELIVERED:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only delivered orders can be reviewed")
+
+    review = Review(
+        order_id=order.id,
+        user_id=order.user_id,
+        restaurant_id=order.restaurant_id,
+        rating=review_in.rating,
+        comment=review_in.comment,
+    )
+    db.add(review)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Order with ID: '{order.id}' was already reviewed")
+
+    # Single atomic UPDATE: the right hand sides read the row's current values under its
+    # row lock, so concurrent reviews of the same restaurant never lose an increment
+    db.execute(
+        update(Restaurant)
+        .where(Restaurant.id == order.restaurant_id)
+        .values(
+            rating_sum=Restaurant.rating_sum + review_in.rating,
+            rating_count=Restaurant.rating_count + 1,
+            rating=_average(Restaurant.rating_sum + review_in.rating, Restaurant.rating_count + 1),
+        )
+    )
+    invalidation.publish(db, cache.menus, order.restaurant_id)
+    db.commit()
+    db.refresh(review)
+    return review
+
+
+def get_reviews_for_restaurant(db: Session, restaurant_id: int, skip: int = 0, limit: int = 20)->List[Review]:
+    return db.query(Review).filter(Review.restaurant_id == restaurant_id).order_by(Review.id.desc()).offset(skip).limit(limit).all()
+
+
+def reaggregate_ratings(db: Session, restaurant_ids: list[int])->int:
+    # Recompute the aggregates of the given restaurants from their reviews and return how
+    # many had drifted. Does not commit; callers keep batches small.
+    if not restaurant_ids:
+        return 0
+
+    # Lock the rows first, so the aggregate query below (a new snapshot) sees every review
+    # whose increment already landed; reviews committing later increment on top of the result
+    db.execute(select(Restaurant.id).where(Restaurant.id.in_(restaurant_ids)).order_by(Restaurant.id).with_for_update())
+
+    totals = (
+        select(func.coalesce(func.sum(Review.rating), 0))
+        .where(Review.restaurant_id == Restaurant.id)
+        .scalar_subquery()
+    )
+    counts = (
+        select(func.count(Review.id))
+        .where(Review.restaurant_id == Restaurant.id)
+        .scalar_subquery()
+    )
+    drifted = db.execute(
+        update(Restaurant)
+        .where(
+            Restaurant.id.in_(restaurant_ids),
+            (Restaurant.rating_sum != totals)
+            | (Restaurant.rating_count != counts)
+            | Restaurant.rating.is_distinct_from(_average(totals, counts)),
+        )
+        .values(rating_sum=totals, rating_count=counts, rating=_average(totals, counts))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if drifted:
+        invalidation.publish(db, cache.menus, *restaurant_ids)
+    return drifted
@@ -0,0 +1,155 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from sqlalchemy import Date, case, cast, func, insert, select
+from sqlalchemy.orm import Session
+from app.models import (
+    GlobalDish, MenuItemDailySales, Order, OrderItem, OrderStatus, RestaurantDailySales, RestaurantMenuItem
+)
+from typing import List
+
+
+def _upsert_increments(db: Session, model, rows: list[dict], keys: tuple[str, ...])-> None:
+    # INSERT ... ON CONFLICT (keys) DO UPDATE SET col = col + EXCLUDED.col, for every non-key column
+    if not rows:
+        return
+
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+    stmt = dialect_insert(model).values(rows)
+    table = model.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: table.c[column] + stmt.excluded[column] for column in rows[0] if column not in keys},
+    )
+    db.execute(stmt)
+
+
+def _menu_item_rows(order: Order, day, sign: int)-> list[dict]:
+    # One row per menu item (an order may list the same item twice), sorted so
+    # concurrent orders lock rollup rows in the same order
+    totals = defaultdict(lambda: [0, 0.0])
+    for item in order.items:
+        totals[item.menu_item_id][0] += item.quantity
+        totals[item.menu_item_id][1] += item.quantity * item.price_at_order
+
+    return [
+        {
+            "menu_item_id": menu_item_id, "day": day, "restaurant_id": order.restaurant_id,
+            "quantity": sign * quantity, "revenue": sign * revenue,
+        }
+        for menu_item_id, (quantity, revenue) in sorted(totals.items())
+    ]
+
+
+def record_order_placed(db: Session, order: Order)-> None:
+    # Call inside the order's transaction. current_date is taken from the same
+    # transaction clock as orders.created_at (now()), so the day always matches.
+    day = func.current_date()
+    _upsert_increments(db, RestaurantDailySales, [{
+        "restaurant_id": order.restaurant_id, "day": day,
+        "order_count": 1, "cancelled_count": 0, "delivered_count": 0, "revenue": order.total_amount,
+    }], keys=("restaurant_id", "day"))
+    _upsert_increments(db, MenuItemDailySales, _menu_item_rows(order, day, 1), keys=("menu_item_id", "day"))
+
+
+def record_status_change(db: Session, order: Order, previous: OrderStatus, new: OrderStatus)-> None:
+    # Call inside the transaction that changes the status
+    day = order.created_at.date()
+
+    if new == OrderStatus.CANCELLED and previous != OrderStatus.CANCELLED:
+        _upsert_increments(db, RestaurantDailySales, [{
+            "restaurant_id": order.restaurant_id, "day": day,
+            "order_count": 0, "cancelled_count": 1, "delivered_count": 0, "revenue": -order.total_amount,
+        }], keys=("restaurant_id", "day"))
+        _upsert_increments(db, MenuItemDailySales, _menu_item_rows(order, day, -1), keys=("menu_item_id", "day"))
+
+    elif new == OrderStatus.DELIVERED and previous != OrderStatus.DELIVERED:
+        _upsert_increments(db, RestaurantDailySales, [{
+            "restaurant_id": order.restaurant_id, "day": day,
+            "order_count": 0, "cancelled_count": 0, "delivered_count": 1, "revenue": 0.0,
+        }], keys=("restaurant_id", "day"))
+
+
+def get_daily_sales(db: Session, restaurant_id: int, days: int = 30)-> List[RestaurantDailySales]:
+    since = date.today() - timedelta(days=days - 1)
+    return db.query(RestaurantDailySales).filter(
+        RestaurantDailySales.restaurant_id == restaurant_id,
+        RestaurantDailySales.day >= since,
+    ).order_by(RestaurantDailySales.day).all()
+
+
+def get_top_dishes(db: Session, restaurant_id: int, days: int = 30, limit: int = 10)-> list[dict]:
+    since = date.today() - timedelta(days=days - 1)
+    top = (
+        select(
+            MenuItemDailySales.menu_item_id,
+            func.sum(MenuItemDailySales.quantity).label("quantity"),
+            func.sum(MenuItemDailySales.revenue).label("revenue"),
+        )
+        .where(MenuItemDailySales.restaurant_id == restaurant_id, MenuItemDailySales.day >= since)
+        .group_by(MenuItemDailySales.menu_item_id)
+        .order_by(func.sum(MenuItemDailySales.quantity).desc())
+        .limit(limit)
+        .subquery()
+    )
+
+    # Names are joined for the top rows only
+    rows = db.execute(
+        select(top.c.menu_item_id, GlobalDish.name, top.c.quantity, top.c.revenue)
+        .join(RestaurantMenuItem, RestaurantMenuItem.id == top.c.menu_item_id)
+        .join(GlobalDish, GlobalDish.id == RestaurantMenuItem.global_dish_id)
+        .order_by(top.c.quantity.desc())
+    ).all()
+    return [row._asdict() for row in rows]
+
+
+def rebuild(db: Session, since: date | None = None, restaurant_id: int | None = None)-> dict:
+    # Recompute both rollups from raw orders for the given range, replacing what is there.
+    # Runs as one transaction, so dashboards never see a half rebuilt day.
+    # CAST(... AS DATE) has numeric affinity in SQLite, date() is its equivalent
+    day = func.date(Order.created_at) if db.get_bind().dialect.name == "sqlite" else cast(Order.created_at, Date)
+    order_filters, restaurant_filters, item_filters = [], [], []
+    if since is not None:
+        order_filters.append(Order.created_at >= since)
+        restaurant_filters.append(RestaurantDailySales.day >= since)
+        item_filters.append(MenuItemDailySales.day >= since)
+    if restaurant_id is not None:
+        order_filters.append(Order.restaurant_id == restaurant_id)
+        restaurant_filters.append(RestaurantDailySales.restaurant_id == restaurant_id)
+        item_filters.append(MenuItemDailySales.restaurant_id == restaurant_id)
+
+    db.query(RestaurantDailySales).filter(*restaurant_filters).delete(synchronize_session=False)
+    db.query(MenuItemDailySales).filter(*item_filters).delete(synchronize_session=False)
+
+    cancelled = Order.status == OrderStatus.CANCELLED
+    restaurant_rows = db.execute(insert(RestaurantDailySales).from_select(
+        ["restaurant_id", "day", "order_count", "cancelled_count", "delivered_count", "revenue"],
+        select(
+            Order.restaurant_id,
+            day,
+            func.count(),
+            func.sum(case((cancelled, 1), else_=0)),
+            func.sum(case((Order.status == OrderStatus.DELIVERED, 1), else_=0)),
+            func.sum(case((cancelled, 0.0), else_=Order.total_amount)),
+        ).where(*order_filters).group_by(Order.restaurant_id, day),
+    )).rowcount
+
+    item_rows = db.execute(insert(MenuItemDailySales).from_select(
+        ["menu_item_id", "day", "restaurant_id", "quantity", "revenue"],
+        select(
+            OrderItem.menu_item_id,
+            day,
+            Order.restaurant_id,
+            func.sum(OrderItem.quantity),
+            func.sum(OrderItem.quantity * OrderItem.price_at_order),
+        )
+        .join(Order, (Order.id == OrderItem.order_id) & (Order.created_at == OrderItem.created_at))
+        .where(~cancelled, *order_filters)
+        .group_by(OrderItem.menu_item_id, day, Order.restaurant_id),
+    )).rowcount
+
+    db.commit()
+    return {"restaurant_daily_sales": restaurant_rows, "menu_item_daily_sales": item_rows}
@@ -0,0 +1,79 @@
+# This file contains fixed-memory summaries for streaming aggregation, used by
+# jobs that rank over a large stream of rows without holding a counter per key
+# (svc_popular). Keys are non-negative ints; hashing is seeded and deterministic,
+# so the same stream always gives the same result (no PYTHONHASHSEED effects).
+import heapq
+import random
+from array import array
+
+# Mersenne prime 2^61 - 1 for the (a * key + b) mod p hash family
+_PRIME = (1 << 61) - 1
+
+
+class CountMinSketch:
+    # depth rows of width float counters. estimate() never undercounts, and overcounts by
+    # at most ~e / width of the stream total with probability 1 - exp(-depth).
+    def __init__(self, width: int = 1 << 15, depth: int = 4, seed: int = 0):
+        self.width = width
+        self.depth = depth
+        rng = random.Random(seed)
+        self._hashes = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(depth)]
+        self._rows = [array("d", bytes(8 * width)) for _ in range(depth)]
+
+    def add(self, key: int, amount: float = 1.0)-> float:
+        # Conservative update: only the rows at the current minimum grow, which keeps the
+        # overcount lower for positive amounts. Returns the new estimate.
+        width = self.width
+        cells = [(row, (a * key + b) % _PRIME % width) for row, (a, b) in zip(self._rows, self._hashes)]
+        estimate = min(row[index] for row, index in cells) + amount
+        for row, index in cells:
+            if row[index] < estimate:
+                row[index] = estimate
+        return estimate
+
+    def estimate(self, key: int)-> float:
+        width = self.width
+        return min(row[(a * key + b) % _PRIME % width] for row, (a, b) in zip(self._rows, self._hashes))
+
+    @property
+    def bytes(self)-> int:
+        return 8 * self.width * self.depth
+
+
+class TopK:
+    # The k keys with the highest score offered so far, for scores that only grow (sketch
+    # estimates of positive streams). A min-heap with lazy deletion: outdated heap entries
+    # are dropped when they surface, and the heap is compacted once it holds too many.
+    def __init__(self, k: int):
+        self.k = k
+        self.scores: dict[int, float] = {}
+        self._heap: list[tuple[float, int]] = []
+
+    def offer(self, key: int, score: float)-> None:
+        scores = self.scores
+        if key in scores:
+            scores[key] = score
+            heapq.heappush(self._heap, (score, key))
+            if len(self._heap) > 4 * self.k:
+                self._heap = [(value, item) for item, value in scores.items()]
+                heapq.heapify(self._heap)
+            return
+        if len(scores) < self.k:
+            scores[key] = score
+            heapq.heappush(self._heap, (score, key))
+            return
+
+        heap = self._heap
+        while heap[0][0] != scores.get(heap[0][1]):
+            heapq.heappop(heap)
+        if score > heap[0][0]:
+            _, evicted = heapq.heapreplace(heap, (score, key))
+            del scores[evicted]
+            scores[key] = score
+
+    def items(self)-> list[tuple[int, float]]:
+        # (key, score), best first; ties broken by key for a stable order
+        return sorted(self.scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def __len__(self)-> int:
+        return len(self.scores)
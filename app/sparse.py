@@ -0,0 +1,147 @@
+# This file contains sparse fieldsets: `?fields=id,name,menu_items.price` on
+# listing and detail routes. The requested fields are validated against the
+# response schema, then shape both the SQL (load_only on the requested columns,
+# relationships only joined when one of their fields is requested) and the JSON
+# (a pruned copy of the schema, serialized exactly like the full response).
+#
+# A nested field without a sub-field ("dish") means all of its fields.
+from functools import lru_cache
+from typing import Optional, get_args, get_origin
+
+from fastapi import HTTPException, Query, status
+from fastapi.responses import Response
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+# field name -> nested FieldSet, or None for a plain field
+FieldSet = dict[str, Optional["FieldSet"]]
+
+MAX_FIELDS = 50
+
+
+def _nested(schema: type[BaseModel], name: str)-> tuple[type[BaseModel], bool] | None:
+    # -> (nested schema, is a list) when the field holds other models
+    annotation = schema.model_fields[name].annotation
+    many = get_origin(annotation) in (list, set, tuple)
+    if many:
+        annotation = get_args(annotation)[0]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, many
+    return None
+
+
+def all_fields(schema: type[BaseModel])-> FieldSet:
+    return {name: (all_fields(nested[0]) if (nested := _nested(schema, name)) else None) for name in schema.model_fields}
+
+
+def parse(schema: type[BaseModel], raw: str | None)-> FieldSet | None:
+    # "id,name,dish.name" -> {"id": None, "name": None, "dish": {"name": None}}; None when not given
+    if raw is None:
+        return None
+
+    paths = [path.strip() for path in raw.split(",") if path.strip()]
+    if not paths or len(paths) > MAX_FIELDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"fields must list 1 to {MAX_FIELDS} field names",
+        )
+
+    fields: FieldSet = {}
+    for path in paths:
+        current_schema, current = schema, fields
+        parts = path.split(".")
+        for depth, part in enumerate(parts):
+            if part not in current_schema.model_fields:
+                allowed = ", ".join(current_schema.model_fields)
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"Unknown field '{path}', choose from: {allowed}",
+                )
+            nested = _nested(current_schema, part)
+            last = depth == len(parts) - 1
+            if nested is None:
+                if not last:
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"'{part}' has no sub-fields ({path})"
+                    )
+                current[part] = None
+            elif last:
+                current[part] = all_fields(nested[0])
+            else:
+                current = current.setdefault(part, {})
+                current_schema = nested[0]
+    return fields
+
+
+def fields(schema: type[BaseModel]):
+    # FastAPI dependency: fields: sparse.FieldSet | None = Depends(sparse.fields(schemas.RestaurantResponse))
+    def dependency(
+        fields: str | None = Query(None, description=f"Comma separated subset of: {', '.join(schema.model_fields)}"),
+    )-> FieldSet | None:
+        return parse(schema, fields)
+    return dependency
+
+
+def load_options(model, fields: FieldSet, path=None)-> list:
+    # load_only for the requested columns; relationships are eager loaded (joined for
+    # many-to-one, one extra IN query for collections) only when some field of theirs is requested
+    mapper = inspect(model)
+    columns = [getattr(model, name) for name in fields if name in mapper.column_attrs]
+    if not columns:
+        # Only relationship fields requested, the primary key is always loaded anyway
+        columns = [getattr(model, mapper.get_property_by_column(mapper.primary_key[0]).key)]
+    options = []
+    own = path.load_only(*columns) if path is not None else load_only(*columns)
+    options.append(own)
+    for name, nested in fields.items():
+        if nested is None or name not in mapper.relationships:
+            continue
+        relationship = mapper.relationships[name]
+        attribute = getattr(model, name)
+        # Inner join when the foreign key is NOT NULL (menu item -> dish), it can never be missing
+        innerjoin = not any(column.nullable for column in relationship.local_columns)
+        if path is None:
+            loader = selectinload(attribute) if relationship.uselist else joinedload(attribute, innerjoin=innerjoin)
+        else:
+            loader = path.selectinload(attribute) if relationship.uselist else path.joinedload(attribute, innerjoin=innerjoin)
+        options.extend(load_options(relationship.mapper.class_, nested, loader))
+    return options
+
+
+def _freeze(fields: FieldSet)-> tuple:
+    # Hashable form of a FieldSet, for the caches below
+    return tuple(sorted((name, _freeze(nested) if nested is not None else None) for name, nested in fields.items()))
+
+
+@lru_cache(maxsize=256)
+def _model(schema: type[BaseModel], frozen: tuple)-> type[BaseModel]:
+    # A copy of schema with only the requested fields (same types, same order), so the
+    # subset is validated and serialized by pydantic exactly like the full response
+    requested = dict(frozen)
+    definitions = {}
+    for name, info in schema.model_fields.items():
+        if name not in requested:
+            continue
+        nested = _nested(schema, name)
+        if nested is None:
+            definitions[name] = (info.annotation, ...)
+        else:
+            model = _model(nested[0], requested[name])
+            definitions[name] = (list[model] if nested[1] else model, ...)
+    return create_model(f"{schema.__name__}Fields", __config__=ConfigDict(from_attributes=True), **definitions)
+
+
+@lru_cache(maxsize=256)
+def _adapter(schema: type[BaseModel], frozen: tuple, many: bool)-> TypeAdapter:
+    model = _model(schema, frozen)
+    return TypeAdapter(list[model] if many else model)
+
+
+def respond(data, schema: type[BaseModel], fields: FieldSet)-> Response:
+    # Works on ORM rows and on schema instances and only reads the requested attributes, so
+    # nothing outside load_options is lazy loaded. Returned as is, the route's response_model
+    # (which requires every field) is skipped.
+    adapter = _adapter(schema, _freeze(fields), isinstance(data, list))
+    body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+    return Response(body, media_type="application/json")
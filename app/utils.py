@@ -1,12 +1,74 @@
 # This file contains any utility functions
+import functools
+import re
+import time
+import phonenumbers
 from pwdlib import PasswordHash
+from sqlalchemy.exc import IntegrityError
+
+from .metrics import PASSWORD_HASH_SECONDS
 
 password_hash = PasswordHash.recommended()
 
 # Create a utility function to hash a password coming from the user.
 def get_password_hash(password: str)-> str:
-    return password_hash.hash(password)
+    start = time.perf_counter()
+    try:
+        return password_hash.hash(password)
+    finally:
+        PASSWORD_HASH_SECONDS.observe(("hash",), time.perf_counter() - start)
 
 # And another utility to verify if a received password matches the hash stored.
 def verify_password(plain_password: str, hashed_password: str)-> bool:
-    return password_hash.verify(plain_password, hashed_password)
\ No newline at end of file
+    start = time.perf_counter()
+    try:
+        return password_hash.verify(plain_password, hashed_password)
+    finally:
+        PASSWORD_HASH_SECONDS.observe(("verify",), time.perf_counter() - start)
+
+@functools.cache
+def dummy_password_hash()-> str:
+    # Verified against when a login names no user, so that costs as much as a wrong password
+    # (same algorithm and parameters) and response times don't reveal which accounts exist.
+    # Computed once by main.lifespan, so no login pays for it; not at import, jobs don't need it.
+    return get_password_hash("dummy password, never matches a real login")
+
+
+# Phone numbers without a country code are taken as Indian
+PHONE_REGION = "IN"
+
+def normalize_email(email: str)-> str:
+    # Emails are stored and looked up lowercased (uq_users_email_lower)
+    return email.strip().lower()
+
+def normalize_phone(phone_number: str)-> str | None:
+    # E.164 ('98765 43210' -> '+919876543210'), the form phone numbers are stored in;
+    # None when it can't be a phone number
+    try:
+        parsed = phonenumbers.parse(phone_number, PHONE_REGION)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_possible_number(parsed):
+        return None
+    return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+
+
+# Postgres: 'Key (email)=(a@b.c) already exists.' / 'Key (owner_id)=(7) is not present in table "users".'
+# SQLite:   'UNIQUE constraint failed: users.email'
+_PG_KEY = re.compile(r"Key \((.+?)\)=")
+_SQLITE_UNIQUE = re.compile(r"UNIQUE constraint failed: (.+)$")
+
+
+def integrity_error_columns(exc: IntegrityError)-> tuple[str, ...]:
+    # Columns of the violated unique / foreign key constraint, so create endpoints can insert
+    # directly and turn the violation into the same 400 the old pre-check SELECTs returned
+    diag = getattr(exc.orig, "diag", None)
+    detail = getattr(diag, "message_detail", None) or ""
+    match = _PG_KEY.search(detail)
+    if match:
+        return tuple(column.strip() for column in match.group(1).split(","))
+
+    match = _SQLITE_UNIQUE.search(str(exc.orig))
+    if match:
+        return tuple(column.strip().split(".")[-1] for column in match.group(1).split(","))
+    return ()
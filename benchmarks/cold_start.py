@@ -0,0 +1,83 @@
+# Cold-start timing: measures, in fresh interpreters, how long `import app.main`
+# takes and how long the first request takes after startup. Fails (exit 1) if
+# importing the app opens a database connection or a limit is exceeded.
+#
+#   python -m benchmarks.cold_start --database-url sqlite:///bench.db --runs 5 --max-import-ms 1500
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import bootstrap
+
+# Runs in the child interpreter. Any connection attempt during import is recorded
+# through a pool "connect" listener on every engine created.
+PROBE = r"""
+import json, time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+connections = []
+event.listen(Engine, "connect", lambda *args: connections.append(time.perf_counter()))
+
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+connected_during_import = bool(connections)
+
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    ready = time.perf_counter()
+    response = client.get("/restaurants/menu")
+    first_request = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (first_request - ready) * 1000,
+    "first_request_status": response.status_code,
+    "connected_during_import": connected_during_import,
+}))
+"""
+
+
+def measure_once()-> dict:
+    output = subprocess.check_output([sys.executable, "-W", "ignore", "-c", PROBE], env=os.environ, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main()-> int:
+    parser = argparse.ArgumentParser(description="Measure app import and first-request latency")
+    parser.add_argument("--database-url", default="sqlite:///bench.db")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import time is above this")
+    parser.add_argument("--max-first-request-ms", type=float, help="fail if the median first request is above this")
+    args = parser.parse_args()
+
+    bootstrap(args.database_url)
+    runs = [measure_once() for _ in range(args.runs)]
+
+    report = {
+        key: round(statistics.median(run[key] for run in runs), 2)
+        for key in ("import_ms", "startup_ms", "first_request_ms")
+    }
+    report["runs"] = args.runs
+    report["connected_during_import"] = any(run["connected_during_import"] for run in runs)
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if report["connected_during_import"]:
+        failures.append("importing app.main opened a database connection")
+    if args.max_import_ms and report["import_ms"] > args.max_import_ms:
+        failures.append(f"import took {report['import_ms']}ms (limit {args.max_import_ms}ms)")
+    if args.max_first_request_ms and report["first_request_ms"] > args.max_first_request_ms:
+        failures.append(f"first request took {report['first_request_ms']}ms (limit {args.max_first_request_ms}ms)")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# Shared helpers for the benchmark scripts
+import os
+import subprocess
+
+
+def bootstrap(database_url: str)-> None:
+    # app.config reads the environment at import time, so this must run before
+    # anything under app/ is imported. Only the URL matters for benchmarks,
+    # the remaining required settings get throwaway values if unset.
+    os.environ["DATABASE_URL"] = database_url
+    for key, value in {
+        "DATABASE_NAME": "bench",
+        "DATABASE_USER": "bench",
+        "DATABASE_PASSWORD": "bench",
+        "DATABASE_HOST": "localhost",
+        "DATABASE_PORT": "5432",
+        "SECRET_KEY": "benchmark-secret-key-not-for-production-use",
+        "ALGORITHM": "HS256",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+        # Every simulated client shares one IP and few users, the limiter would throttle the run
+        "RATE_LIMIT_ENABLED": "false",
+    }.items():
+        os.environ.setdefault(key, value)
+
+
+def git_revision()-> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(sorted_values: list[float], pct: float)-> float:
+    # Nearest-rank percentile over an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: list[float], errors: int, wall_time: float)-> dict:
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(sum(values) / count * 1000, 3) if count else 0.0,
+        "max_ms": round(values[-1] * 1000, 3) if count else 0.0,
+        "throughput_rps": round(count / wall_time, 2) if wall_time else 0.0,
+    }
@@ -0,0 +1,299 @@
+# Synthetic dataset generator for benchmarks.
+#
+# Ids are assigned up front so dependent rows (menu items, orders, order items)
+# can be generated without reading anything back, and every table is written
+# with chunked executemany INSERTs. Everything derives from the seed, so the same
+# scale + seed always produces the same rows.
+#
+#   python -m benchmarks.datagen --database-url sqlite:///bench.db --scale small
+import argparse
+import json
+import random
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+
+from benchmarks.common import bootstrap
+
+PASSWORD = "password"
+
+CITIES = ["Bengaluru", "Mumbai", "Delhi", "Hyderabad", "Chennai", "Pune", "Kolkata", "Ahmedabad", "Jaipur", "Kochi"]
+CATEGORIES = ["Starters", "Indian", "Chinese", "Italian", "Desserts", "Beverages", "Biryani", "South Indian"]
+STATUS_WEIGHTS = {"DELIVERED": 70, "CANCELLED": 8, "PLACED": 6, "CONFIRMED": 5, "PREPARING": 6, "OUT_FOR_DELIVERY": 5}
+REVIEW_RATE = 0.3   # share of delivered orders that get a review
+
+
+@dataclass
+class Scale:
+    users: int = 1_000
+    restaurants: int = 100
+    dishes: int = 300
+    items_per_restaurant: int = 30
+    orders: int = 5_000
+    items_per_order: int = 3
+    days: int = 90
+
+
+SCALES = {
+    "tiny": Scale(users=50, restaurants=5, dishes=40, items_per_restaurant=10, orders=200),
+    "small": Scale(),
+    "medium": Scale(users=20_000, restaurants=1_000, dishes=1_000, items_per_restaurant=40, orders=100_000),
+    "large": Scale(users=200_000, restaurants=10_000, dishes=3_000, items_per_restaurant=50, orders=2_000_000),
+}
+
+
+# Deterministic layout shared with the scenarios, so they never need to query the DB:
+#   user 1 is the ADMIN, users 2..restaurants+1 own restaurant (id - 1), the rest are USERs
+#   restaurant r has menu items ((r - 1) * items_per_restaurant + 1) .. (r * items_per_restaurant)
+def owner_id(restaurant_id: int)-> int:
+    return restaurant_id + 1
+
+
+def first_customer_id(scale: Scale)-> int:
+    return scale.restaurants + 2
+
+
+def user_name(user_id: int)-> str:
+    return f"user{user_id}"
+
+
+def user_email(user_id: int)-> str:
+    # What the synthetic users log in with
+    return "admin@bench.local" if user_id == 1 else f"{user_name(user_id)}@bench.local"
+
+
+def user_phone(user_id: int)-> str:
+    # E.164, as the API stores phone numbers
+    return f"+919{user_id:09d}"
+
+
+def menu_item_ids(scale: Scale, restaurant_id: int)-> range:
+    start = (restaurant_id - 1) * scale.items_per_restaurant + 1
+    return range(start, start + scale.items_per_restaurant)
+
+
+def is_restaurant_open(restaurant_id: int)-> bool:
+    return restaurant_id % 20 != 0
+
+
+def is_item_available(menu_item_id: int)-> bool:
+    return menu_item_id % 20 != 0
+
+
+def _insert_chunks(conn, table, rows, chunk_size: int)-> int:
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        conn.execute(table.insert(), chunk)
+        written += len(chunk)
+    return written
+
+
+def _reset_sequences(conn, tables)-> None:
+    from sqlalchemy import text
+
+    # Explicit ids bypass the serial sequences, move them past the generated rows
+    if conn.dialect.name != "postgresql":
+        return
+    for table in tables:
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"COALESCE((SELECT max(id) FROM {table.name}), 0) + 1, false)"
+        ))
+
+
+def _create_order_partitions(engine, from_month)-> None:
+    from sqlalchemy import text
+
+    # Monthly partitions only exist from "now" after migrating, generated orders go back further
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT to_regproc('create_order_partitions')")).scalar():
+            conn.execute(text("SELECT create_order_partitions(3, :from_month)"), {"from_month": from_month})
+
+
+def create_schema(engine, reset: bool = True, migrate_to: str | None = None)-> None:
+    # migrate_to builds the schema with Alembic (Postgres only, the migrations use
+    # partitioning and other Postgres DDL) instead of create_all() from the models
+    from sqlalchemy import text
+    from app import models
+
+    if migrate_to is None:
+        if reset:
+            models.Base.metadata.drop_all(engine)
+        models.Base.metadata.create_all(engine)
+        return
+
+    from alembic import command
+    from alembic.config import Config
+
+    if reset:
+        with engine.begin() as conn:
+            conn.execute(text("DROP SCHEMA public CASCADE"))
+            conn.execute(text("CREATE SCHEMA public"))
+    command.upgrade(Config("alembic.ini"), migrate_to)
+
+
+def generate(engine, scale: Scale, seed: int = 42, reset: bool = True, chunk_size: int = 5_000, migrate_to: str | None = None)-> dict:
+    from app import models, utils
+    from app.services import svc_menu, svc_review
+
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    timings = {}
+    counts = {}
+
+    create_schema(engine, reset=reset, migrate_to=migrate_to)
+    if migrate_to is not None:
+        _create_order_partitions(engine, (now - timedelta(days=scale.days)).date())
+
+    # Hashing is deliberately slow, so every synthetic user shares one hash
+    password = utils.get_password_hash(PASSWORD)
+
+    with engine.begin() as conn:
+        started = time.perf_counter()
+        users = [{
+            "id": 1, "name": "admin", "email": user_email(1), "password": password,
+            "phone_number": user_phone(1), "address": "HQ", "role": "ADMIN",
+        }]
+        for user_id in range(2, scale.users + scale.restaurants + 2):
+            users.append({
+                "id": user_id,
+                "name": user_name(user_id),
+                "email": user_email(user_id),
+                "password": password,
+                "phone_number": user_phone(user_id),
+                "address": f"{rng.randint(1, 999)} {rng.choice(CITIES)} Road",
+                "role": "RESTAURANT_ADMIN" if user_id < first_customer_id(scale) else "USER",
+            })
+        counts["users"] = _insert_chunks(conn, models.User.__table__, users, chunk_size)
+        del users
+
+        restaurants = [{
+            "id": restaurant_id,
+            "name": f"Restaurant {restaurant_id}",
+            "address": f"{rng.randint(1, 999)} Market Street",
+            "city": rng.choice(CITIES),
+            "is_open": is_restaurant_open(restaurant_id),
+            "owner_id": owner_id(restaurant_id),
+        } for restaurant_id in range(1, scale.restaurants + 1)]
+        counts["restaurants"] = _insert_chunks(conn, models.Restaurant.__table__, restaurants, chunk_size)
+        # Reviews scatter around a per-restaurant quality, so ratings differ between restaurants
+        quality = {restaurant_id: rng.uniform(2.5, 4.8) for restaurant_id in range(1, scale.restaurants + 1)}
+        del restaurants
+
+        dishes = [{
+            "id": dish_id,
+            "name": f"Dish {dish_id}",
+            "description": f"Synthetic dish number {dish_id}",
+            "category": rng.choice(CATEGORIES),
+            "is_veg": rng.random() < 0.6,
+        } for dish_id in range(1, scale.dishes + 1)]
+        counts["global_dishes"] = _insert_chunks(conn, models.GlobalDish.__table__, dishes, chunk_size)
+        del dishes
+
+        menu_items = []
+        prices = {}
+        per_restaurant = min(scale.items_per_restaurant, scale.dishes)
+        for restaurant_id in range(1, scale.restaurants + 1):
+            dish_ids = rng.sample(range(1, scale.dishes + 1), per_restaurant)
+            for menu_item_id, dish_id in zip(menu_item_ids(scale, restaurant_id), dish_ids):
+                price = float(rng.randrange(50, 600, 5))
+                prices[menu_item_id] = price
+                menu_items.append({
+                    "id": menu_item_id,
+                    "restaurant_id": restaurant_id,
+                    "global_dish_id": dish_id,
+                    "price": price,
+                    "is_available": is_item_available(menu_item_id),
+                })
+        counts["restaurant_menu_items"] = _insert_chunks(conn, models.RestaurantMenuItem.__table__, menu_items, chunk_size)
+        del menu_items
+        timings["catalog_s"] = time.perf_counter() - started
+
+        # Orders are generated and written one chunk at a time to keep memory flat
+        started = time.perf_counter()
+        statuses, weights = zip(*STATUS_WEIGHTS.items())
+        customers = range(first_customer_id(scale), scale.users + scale.restaurants + 2)
+        window = scale.days * 24 * 3600
+        order_item_id = 1
+        counts["orders"] = counts["order_items"] = counts["reviews"] = 0
+        review_id = 1
+
+        for chunk_start in range(1, scale.orders + 1, chunk_size):
+            orders, order_items, reviews = [], [], []
+            for order_id in range(chunk_start, min(chunk_start + chunk_size, scale.orders + 1)):
+                restaurant_id = rng.randint(1, scale.restaurants)
+                menu = menu_item_ids(scale, restaurant_id)[:per_restaurant]
+                created_at = now - timedelta(seconds=rng.randrange(window))
+                total = 0.0
+                for menu_item_id in rng.sample(menu, min(rng.randint(1, scale.items_per_order), len(menu))):
+                    quantity = rng.randint(1, 3)
+                    total += prices[menu_item_id] * quantity
+                    order_items.append({
+                        "id": order_item_id, "order_id": order_id, "menu_item_id": menu_item_id,
+                        "quantity": quantity, "price_at_order": prices[menu_item_id], "created_at": created_at,
+                    })
+                    order_item_id += 1
+                order = {
+                    "id": order_id,
+                    "user_id": rng.choice(customers),
+                    "restaurant_id": restaurant_id,
+                    "total_amount": total,
+                    "status": rng.choices(statuses, weights)[0],
+                    "delivery_address": f"{rng.randint(1, 999)} {rng.choice(CITIES)} Road",
+                    "created_at": created_at,
+                }
+                orders.append(order)
+                if order["status"] == "DELIVERED" and rng.random() < REVIEW_RATE:
+                    reviews.append({
+                        "id": review_id, "order_id": order_id, "user_id": order["user_id"], "restaurant_id": restaurant_id,
+                        "rating": min(5, max(1, round(rng.gauss(quality[restaurant_id], 1.0)))),
+                        "comment": None, "created_at": created_at + timedelta(hours=1),
+                    })
+                    review_id += 1
+            counts["orders"] += _insert_chunks(conn, models.Order.__table__, orders, chunk_size)
+            counts["order_items"] += _insert_chunks(conn, models.OrderItem.__table__, order_items, chunk_size)
+            counts["reviews"] += _insert_chunks(conn, models.Review.__table__, reviews, chunk_size)
+        timings["orders_s"] = time.perf_counter() - started
+
+        # Same code path as the drift correction job fills the rating and menu card aggregates
+        started = time.perf_counter()
+        restaurant_ids = list(range(1, scale.restaurants + 1))
+        for start in range(0, len(restaurant_ids), chunk_size):
+            svc_review.reaggregate_ratings(conn, restaurant_ids[start:start + chunk_size])
+            svc_menu.refresh_cards(conn, restaurant_ids[start:start + chunk_size])
+        timings["aggregates_s"] = time.perf_counter() - started
+
+        _reset_sequences(conn, [table for table in models.Base.metadata.sorted_tables if "id" in table.c])
+
+    total_rows = sum(counts.values())
+    total_time = sum(timings.values())
+    return {
+        "scale": asdict(scale),
+        "seed": seed,
+        "rows": counts,
+        "timings_s": {key: round(value, 3) for key, value in timings.items()},
+        "rows_per_s": round(total_rows / total_time, 1) if total_time else 0.0,
+    }
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark dataset")
+    parser.add_argument("--database-url", default="sqlite:///bench.db")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=5_000)
+    parser.add_argument("--migrate-to", help="build the schema with alembic upgrade to this revision (Postgres)")
+    args = parser.parse_args()
+
+    bootstrap(args.database_url)
+    from app import database
+
+    report = generate(
+        database.init_engine(), SCALES[args.scale], seed=args.seed, chunk_size=args.chunk_size, migrate_to=args.migrate_to
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+# This file contains the delivery dispatch engine: it keeps rider locations in
+# memory and, once per tick, assigns the pending orders (ready at the restaurant,
+# about to go OUT_FOR_DELIVERY) to riders in one batch.
+#
+#   - Riders with spare capacity sit in a uniform grid (GridIndex), so an order
+#     only looks at the few cells around its restaurant instead of every rider.
+#   - Each order keeps its `candidates` nearest riders; all (cost, order, rider)
+#     pairs of the tick go into one heap and are taken cheapest first. A pair whose
+#     rider took another order meanwhile is re-costed and pushed back (lazy update),
+#     so a rider's growing load is always priced in.
+#
+# Positions are planar (x, y) in km; project() turns lat / lon into that frame.
+# Pure Python and single threaded, no database access: the caller persists the
+# assignments (e.g. svc_order.change_order_status(..., OUT_FOR_DELIVERY)).
+#
+# Only dispatch_sim.py drives it for now. It moves into app/ together with its
+# integration (rider accounts and location pings, a worker running tick() and
+# persisting the assignments) once the schema has riders.
+import heapq
+import math
+from dataclasses import dataclass
+from typing import Iterator
+
+Point = tuple[float, float]
+
+EARTH_KM_PER_DEGREE = 111.32
+
+
+def project(lat: float, lon: float, origin: tuple[float, float])-> Point:
+    # Equirectangular projection around origin (lat, lon), accurate to well under 1% across a city
+    return (
+        (lon - origin[1]) * EARTH_KM_PER_DEGREE * math.cos(math.radians(origin[0])),
+        (lat - origin[0]) * EARTH_KM_PER_DEGREE,
+    )
+
+
+def distance(a: Point, b: Point)-> float:
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+class GridIndex:
+    # Keys (rider ids) bucketed by cell_km x cell_km cells; moves within a cell are free
+    def __init__(self, cell_km: float):
+        self.cell_km = cell_km
+        self._cells: dict[tuple[int, int], dict[int, Point]] = {}
+        self._where: dict[int, tuple[int, int]] = {}
+
+    def _cell(self, point: Point)-> tuple[int, int]:
+        return (math.floor(point[0] / self.cell_km), math.floor(point[1] / self.cell_km))
+
+    def move(self, key: int, point: Point)-> None:
+        cell = self._cell(point)
+        old = self._where.get(key)
+        if old is not None and old != cell:
+            members = self._cells[old]
+            del members[key]
+            if not members:
+                del self._cells[old]
+        self._cells.setdefault(cell, {})[key] = point
+        self._where[key] = cell
+
+    def remove(self, key: int)-> None:
+        cell = self._where.pop(key, None)
+        if cell is not None:
+            members = self._cells[cell]
+            del members[key]
+            if not members:
+                del self._cells[cell]
+
+    def __contains__(self, key: int)-> bool:
+        return key in self._where
+
+    def __len__(self)-> int:
+        return len(self._where)
+
+    def _ring(self, center: tuple[int, int], ring: int)-> Iterator[tuple[int, int]]:
+        cx, cy = center
+        if ring == 0:
+            yield center
+            return
+        for dx in range(-ring, ring + 1):
+            yield (cx + dx, cy - ring)
+            yield (cx + dx, cy + ring)
+        for dy in range(-ring + 1, ring):
+            yield (cx - ring, cy + dy)
+            yield (cx + ring, cy + dy)
+
+    def nearest(self, point: Point, k: int, max_km: float, exclude: set[int] | None = None)-> list[tuple[float, int]]:
+        # Up to k (distance, key) pairs within max_km, nearest first. Rings of cells are scanned
+        # outwards until the k-th distance is closer than anything the next ring could hold.
+        center = self._cell(point)
+        cx, cy = center
+        px, py = point
+        limit = max_km * max_km
+        found: list[tuple[float, int]] = []     # (squared km, key), the hot loop avoids sqrt and calls
+
+        def scan(members: dict[int, Point])-> None:
+            for key, (x, y) in members.items():
+                squared = (x - px) * (x - px) + (y - py) * (y - py)
+                if squared <= limit and not (exclude and key in exclude):
+                    found.append((squared, key))
+
+        # Distance from the point to the nearest edge of its own cell
+        margin = min(px - cx * self.cell_km, (cx + 1) * self.cell_km - px, py - cy * self.cell_km, (cy + 1) * self.cell_km - py)
+        rings = math.ceil(max_km / self.cell_km)
+        for ring in range(rings + 1):
+            if 8 * ring > len(self._cells):
+                # Sparse index (e.g. most riders busy): visiting the occupied cells beats the empty rings
+                for (x_cell, y_cell), members in self._cells.items():
+                    if ring <= max(abs(x_cell - cx), abs(y_cell - cy)) <= rings:
+                        scan(members)
+                break
+            for cell in self._ring(center, ring):
+                members = self._cells.get(cell)
+                if members:
+                    scan(members)
+            if len(found) >= k:
+                found.sort()
+                # Anything in an unscanned cell is further away than this
+                reach = ring * self.cell_km + margin
+                if found[k - 1][0] <= reach * reach:
+                    break
+        found.sort()
+        return [(math.sqrt(squared), key) for squared, key in found[:k]]
+
+
+@dataclass(slots=True)
+class Rider:
+    id: int
+    location: Point
+    capacity: int
+    load: int = 0           # orders assigned and not yet delivered
+
+
+@dataclass(slots=True)
+class PendingOrder:
+    order_id: int
+    pickup: Point           # restaurant
+    dropoff: Point          # customer
+    submitted_at: float     # seconds, same clock as tick(now)
+    trip_km: float = 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class Assignment:
+    order_id: int
+    rider_id: int
+    pickup_km: float
+    trip_km: float
+    cost: float
+
+
+class Dispatcher:
+    # Cost of giving an order to a rider, in km:
+    #   pickup distance
+    #   + rider load * (load_penalty_km + trip_weight * restaurant-to-customer km)
+    #   - wait_credit_km per minute the order has been waiting
+    # An idle rider's cost is just the pickup distance. A rider already carrying orders delays
+    # them, more so for long trips. Orders that waited longer win contested riders.
+    def __init__(
+        self,
+        cell_km: float = 0.5,
+        max_pickup_km: float = 5.0,
+        candidates: int = 6,
+        capacity: int = 2,
+        load_penalty_km: float = 1.5,
+        trip_weight: float = 0.3,
+        wait_credit_km: float = 0.5,
+        requery_limit: int = 2,
+    ):
+        self.max_pickup_km = max_pickup_km
+        self.candidates = candidates
+        self.capacity = capacity
+        self.load_penalty_km = load_penalty_km
+        self.trip_weight = trip_weight
+        self.wait_credit_km = wait_credit_km
+        self.requery_limit = requery_limit      # fresh candidate lookups per order per tick
+        self.riders: dict[int, Rider] = {}
+        self.pending: dict[int, PendingOrder] = {}
+        # Only riders with spare capacity are indexed
+        self.available = GridIndex(cell_km)
+
+    def update_rider(self, rider_id: int, location: Point, capacity: int | None = None)-> None:
+        # Location ping; the first one brings the rider online
+        rider = self.riders.get(rider_id)
+        if rider is None:
+            rider = self.riders[rider_id] = Rider(rider_id, location, capacity or self.capacity)
+        else:
+            rider.location = location
+            if capacity is not None:
+                rider.capacity = capacity
+        self._reindex(rider)
+
+    def remove_rider(self, rider_id: int)-> None:
+        # Offline; orders already assigned stay with them
+        self.riders.pop(rider_id, None)
+        self.available.remove(rider_id)
+
+    def delivered(self, rider_id: int)-> None:
+        rider = self.riders.get(rider_id)
+        if rider is not None and rider.load > 0:
+            rider.load -= 1
+            self._reindex(rider)
+
+    def _reindex(self, rider: Rider)-> None:
+        if rider.load < rider.capacity:
+            self.available.move(rider.id, rider.location)
+        else:
+            self.available.remove(rider.id)
+
+    def submit(self, order_id: int, pickup: Point, dropoff: Point, now: float)-> None:
+        self.pending[order_id] = PendingOrder(order_id, pickup, dropoff, now, distance(pickup, dropoff))
+
+    def cancel(self, order_id: int)-> bool:
+        return self.pending.pop(order_id, None) is not None
+
+    def cost(self, order: PendingOrder, rider: Rider, pickup_km: float, now: float)-> float:
+        return (
+            pickup_km
+            + rider.load * (self.load_penalty_km + self.trip_weight * order.trip_km)
+            - self.wait_credit_km * (now - order.submitted_at) / 60
+        )
+
+    def _candidates(self, order: PendingOrder, exclude: set[int] | None)-> list[tuple[float, int]]:
+        return self.available.nearest(order.pickup, self.candidates, self.max_pickup_km, exclude)
+
+    def tick(self, now: float)-> list[Assignment]:
+        # Assigns what it can of the pending orders; the rest wait for the next tick
+        heap: list[tuple[float, int, int, int, float]] = []    # (cost, order_id, rider_id, rider load when costed, pickup_km)
+        tried: dict[int, set[int]] = {}
+        open_pairs: dict[int, int] = {}
+        requeries: dict[int, int] = {}
+
+        def offer(order: PendingOrder)-> list[tuple[float, int, int, int, float]]:
+            seen = tried.setdefault(order.order_id, set())
+            pairs = []
+            for pickup_km, rider_id in self._candidates(order, seen):
+                rider = self.riders[rider_id]
+                seen.add(rider_id)
+                pairs.append((self.cost(order, rider, pickup_km, now), order.order_id, rider_id, rider.load, pickup_km))
+            open_pairs[order.order_id] = len(pairs)
+            if len(pairs) < self.candidates:
+                # That was every available rider in range, and none become available mid-tick
+                requeries[order.order_id] = self.requery_limit
+            return pairs
+
+        for order in self.pending.values():
+            heap.extend(offer(order))
+        heapq.heapify(heap)
+
+        assignments = []
+        while heap:
+            cost, order_id, rider_id, load, pickup_km = heapq.heappop(heap)
+            order = self.pending.get(order_id)
+            if order is None:
+                continue
+            rider = self.riders[rider_id]
+            if rider.load >= rider.capacity:
+                open_pairs[order_id] -= 1
+                if open_pairs[order_id] == 0 and requeries.get(order_id, 0) < self.requery_limit:
+                    # Every candidate filled up: look again among the riders still available
+                    requeries[order_id] = requeries.get(order_id, 0) + 1
+                    for pair in offer(order):
+                        heapq.heappush(heap, pair)
+                continue
+            if rider.load != load:
+                # Costed before the rider took another order this tick
+                heapq.heappush(heap, (self.cost(order, rider, pickup_km, now), order_id, rider_id, rider.load, pickup_km))
+                continue
+
+            del self.pending[order_id]
+            rider.load += 1
+            self._reindex(rider)
+            assignments.append(Assignment(order_id, rider_id, pickup_km, order.trip_km, cost))
+        return assignments
@@ -0,0 +1,169 @@
+# Dispatch simulation: a seeded city (restaurant clusters, customers around them,
+# riders pinging their location every tick) driven through benchmarks.dispatch on a
+# simulated clock. Reports the wall time of each tick() (and of the location
+# pings), plus assignment quality: wait until assignment and pickup distance.
+# The same seed gives the same assignments, the report's digest shows it.
+#
+#   python -m benchmarks.dispatch_sim --riders 40000 --orders-per-tick 2000 --ticks 60
+#   python -m benchmarks.dispatch_sim --matcher scan --riders 2000 --orders-per-tick 200    # every rider per order
+#
+# Exits with status 1 if the p95 tick took longer than --max-tick-ms.
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import random
+import sys
+import time
+
+from benchmarks.common import percentile, summarize
+from benchmarks import dispatch
+
+
+class ScanDispatcher(dispatch.Dispatcher):
+    # Baseline without the grid: distance to every available rider for every order
+    def _candidates(self, order, exclude):
+        pairs = (
+            (dispatch.distance(order.pickup, rider.location), rider.id)
+            for rider in self.riders.values()
+            if rider.load < rider.capacity and not (exclude and rider.id in exclude)
+        )
+        return heapq.nsmallest(self.candidates, (pair for pair in pairs if pair[0] <= self.max_pickup_km))
+
+
+class City:
+    def __init__(self, rng: random.Random, size_km: float, restaurants: int, hotspots: int):
+        self.rng = rng
+        self.size_km = size_km
+        centers = [(rng.uniform(0, size_km), rng.uniform(0, size_km)) for _ in range(hotspots)]
+        self.restaurants = []
+        for _ in range(restaurants):
+            x, y = rng.choice(centers)
+            self.restaurants.append(self.clip((rng.gauss(x, 1.0), rng.gauss(y, 1.0))))
+
+    def clip(self, point: dispatch.Point)-> dispatch.Point:
+        return (min(max(point[0], 0.0), self.size_km), min(max(point[1], 0.0), self.size_km))
+
+    def anywhere(self)-> dispatch.Point:
+        return (self.rng.uniform(0, self.size_km), self.rng.uniform(0, self.size_km))
+
+    def order(self)-> tuple[dispatch.Point, dispatch.Point]:
+        pickup = self.rng.choice(self.restaurants)
+        km = self.rng.uniform(0.5, 6.0)
+        angle = self.rng.uniform(0, 2 * math.pi)
+        return pickup, self.clip((pickup[0] + km * math.cos(angle), pickup[1] + km * math.sin(angle)))
+
+
+def simulate(args)-> dict:
+    rng = random.Random(args.seed)
+    city = City(rng, args.city_km, args.restaurants, args.hotspots)
+    matcher = ScanDispatcher if args.matcher == "scan" else dispatch.Dispatcher
+    dispatcher = matcher(cell_km=args.cell_km, candidates=args.candidates, capacity=args.capacity)
+
+    locations = {rider_id: city.anywhere() for rider_id in range(1, args.riders + 1)}
+    busy_until = dict.fromkeys(locations, 0.0)
+    for rider_id, location in locations.items():
+        dispatcher.update_rider(rider_id, location)
+
+    deliveries: list[tuple[float, int, int, dispatch.Point]] = []     # (done_at, rider_id, order_id, dropoff)
+    digest = hashlib.sha256()
+    tick_latencies, ping_latencies, waits, pickups = [], [], [], []
+    order_id = submitted = 0
+
+    for tick in range(args.ticks):
+        now = tick * args.tick_seconds
+
+        # Deliveries that finished since the last tick free their rider at the customer
+        while deliveries and deliveries[0][0] <= now:
+            _, rider_id, _, dropoff = heapq.heappop(deliveries)
+            locations[rider_id] = dropoff
+            dispatcher.delivered(rider_id)
+
+        # Every rider pings; idle ones wander a little
+        started = time.perf_counter()
+        for rider_id, location in locations.items():
+            if busy_until[rider_id] <= now:
+                location = locations[rider_id] = city.clip(
+                    (location[0] + rng.uniform(-0.2, 0.2), location[1] + rng.uniform(-0.2, 0.2))
+                )
+            dispatcher.update_rider(rider_id, location)
+        ping_latencies.append(time.perf_counter() - started)
+
+        for _ in range(rng.randint(args.orders_per_tick * 4 // 5, args.orders_per_tick * 6 // 5)):
+            order_id += 1
+            pickup, dropoff = city.order()
+            dispatcher.submit(order_id, pickup, dropoff, now)
+        submitted = order_id
+
+        orders = {order.order_id: order for order in dispatcher.pending.values()}
+        started = time.perf_counter()
+        assignments = dispatcher.tick(now)
+        tick_latencies.append(time.perf_counter() - started)
+
+        for assignment in assignments:
+            order = orders[assignment.order_id]
+            waits.append(now - order.submitted_at)
+            pickups.append(assignment.pickup_km)
+            digest.update(f"{tick}:{assignment.order_id}:{assignment.rider_id};".encode())
+            # Deliveries of one rider happen one after the other
+            start = max(now, busy_until[assignment.rider_id])
+            done_at = start + (assignment.pickup_km + assignment.trip_km) / args.speed_kmh * 3600
+            busy_until[assignment.rider_id] = done_at
+            heapq.heappush(deliveries, (done_at, assignment.rider_id, assignment.order_id, order.dropoff))
+
+    waits.sort()
+    pickups.sort()
+    return {
+        "matcher": args.matcher,
+        "riders": args.riders,
+        "ticks": args.ticks,
+        "orders_submitted": submitted,
+        "orders_assigned": len(waits),
+        "orders_pending_at_end": len(dispatcher.pending),
+        "tick": summarize(tick_latencies, 0, sum(tick_latencies)),
+        "ping": summarize(ping_latencies, 0, sum(ping_latencies)),
+        "assigned_per_s": round(len(waits) / sum(tick_latencies), 1) if sum(tick_latencies) else 0.0,
+        "wait_s": {"p50": percentile(waits, 50), "p95": percentile(waits, 95), "max": waits[-1] if waits else 0.0},
+        "pickup_km": {
+            "mean": round(sum(pickups) / len(pickups), 3) if pickups else 0.0,
+            "p95": round(percentile(pickups, 95), 3),
+        },
+        "digest": digest.hexdigest()[:16],
+    }
+
+
+def main()-> int:
+    parser = argparse.ArgumentParser(description="Deterministic dispatch simulation")
+    parser.add_argument("--matcher", choices=["grid", "scan"], default="grid")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--riders", type=int, default=40_000)
+    parser.add_argument("--orders-per-tick", type=int, default=2_000, help="mean, varies +-20%% per tick")
+    parser.add_argument("--ticks", type=int, default=60)
+    parser.add_argument("--tick-seconds", type=float, default=30.0, help="simulated time between ticks")
+    parser.add_argument("--city-km", type=float, default=25.0)
+    parser.add_argument("--restaurants", type=int, default=5_000)
+    parser.add_argument("--hotspots", type=int, default=80)
+    parser.add_argument("--speed-kmh", type=float, default=25.0)
+    parser.add_argument("--cell-km", type=float, default=0.5)
+    parser.add_argument("--candidates", type=int, default=6)
+    parser.add_argument("--capacity", type=int, default=2)
+    parser.add_argument("--max-tick-ms", type=float, help="fail if the p95 tick took longer than this")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = simulate(args)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+
+    if args.max_tick_ms is not None and report["tick"]["p95_ms"] > args.max_tick_ms:
+        print(f"FAIL: p95 tick {report['tick']['p95_ms']:.1f}ms (limit {args.max_tick_ms}ms)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# Bulk price adjustment throughput: loads the menu prices into arrays, applies a
+# promotion-style rule set (app.services.svc_pricing) and writes the changed rows
+# back, timing each phase. The rules are also applied with a plain Python loop
+# over the rows, for comparison; both must give the same prices. After the write
+# the prices are reloaded and checked against the computed ones.
+#
+#   python -m benchmarks.pricing --database-url sqlite:///bench.db --scale medium
+#   python -m benchmarks.pricing --skip-datagen --dry-run      # load and compute only
+import argparse
+import json
+import math
+import time
+
+from benchmarks.common import bootstrap
+
+# City promotion, surge in two cities, a flat category surcharge and a veg discount
+RULES = {
+    "rules": [
+        {"city": "Bengaluru", "percent": -10},
+        {"city": "Mumbai", "percent": 15},
+        {"city": "Delhi", "percent": 15},
+        {"category": "Desserts", "amount": 5},
+        {"is_veg": True, "category": "Indian", "percent": -5, "amount": -2},
+    ],
+    "round_to": 5,
+    "rounding": "nearest",
+    "floor": 10,
+}
+
+
+def apply_rules_loop(table, rule_set)-> list[float]:
+    # The same rules one row at a time, as a baseline for the vectorized version
+    prices = []
+    for index in range(len(table)):
+        price = float(table.prices[index])
+        city = table.cities[table.city[index]] if table.city[index] >= 0 else None
+        category = table.categories[table.category[index]] if table.category[index] >= 0 else None
+        is_veg = bool(table.is_veg[index])
+        touched = False
+        for rule in rule_set.rules:
+            if rule.city is not None and rule.city != city:
+                continue
+            if rule.category is not None and rule.category != category:
+                continue
+            if rule.is_veg is not None and rule.is_veg != is_veg:
+                continue
+            if rule.restaurant_ids and int(table.restaurant_ids[index]) not in rule.restaurant_ids:
+                continue
+            price = price * (1 + rule.percent / 100) + rule.amount
+            touched = True
+        if touched:
+            steps = price / rule_set.round_to
+            if rule_set.rounding == "up":
+                steps = math.ceil(steps - 1e-9)
+            elif rule_set.rounding == "down":
+                steps = math.floor(steps + 1e-9)
+            else:
+                steps = math.floor(steps + 0.5)
+            price = max(round(steps * rule_set.round_to, 2), rule_set.floor)
+        prices.append(price)
+    return prices
+
+
+def rate(rows: int, seconds: float)-> float:
+    return round(rows / seconds, 1) if seconds else 0.0
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Measure bulk price adjustment throughput")
+    parser.add_argument("--database-url", default="sqlite:///bench.db")
+    parser.add_argument("--scale", default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-datagen", action="store_true", help="reuse the dataset already in the database")
+    parser.add_argument("--batch-size", type=int, default=1_000, help="rows per write transaction")
+    parser.add_argument("--dry-run", action="store_true", help="skip the write phase")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    bootstrap(args.database_url)
+    from app import database
+    from app.schemas import PriceRuleSet
+    from app.services import svc_pricing
+    from benchmarks import datagen
+
+    engine = database.init_engine()
+    if not args.skip_datagen:
+        datagen.generate(engine, datagen.SCALES[args.scale], seed=args.seed)
+    rule_set = PriceRuleSet.model_validate(RULES)
+
+    with database.SessionLocal() as db:
+        started = time.perf_counter()
+        table = svc_pricing.load_prices(db)
+        db.rollback()
+        load_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        new_prices = svc_pricing.apply_rules(table, rule_set)
+        changed = svc_pricing.changed_rows(table, new_prices)
+        compute_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        loop_prices = apply_rules_loop(table, rule_set)
+        loop_s = time.perf_counter() - started
+        loop_mismatches = sum(1 for a, b in zip(loop_prices, new_prices.tolist()) if a != b)
+
+        report = {
+            "scale": args.scale,
+            "summary": svc_pricing.summarize(table, new_prices, changed),
+            "load": {"seconds": round(load_s, 3), "rows_per_s": rate(len(table), load_s)},
+            "compute": {"seconds": round(compute_s, 4), "rows_per_s": rate(len(table), compute_s)},
+            "compute_loop": {
+                "seconds": round(loop_s, 4),
+                "rows_per_s": rate(len(table), loop_s),
+                "mismatches": loop_mismatches,
+            },
+        }
+
+        if not args.dry_run:
+            started = time.perf_counter()
+            result = svc_pricing.write_prices(db, table, new_prices, changed, args.batch_size)
+            write_s = time.perf_counter() - started
+            check = svc_pricing.load_prices(db)
+            db.rollback()
+            expected = dict(zip(table.ids.tolist(), new_prices.tolist()))
+            report["write"] = {
+                **result,
+                "batch_size": args.batch_size,
+                "seconds": round(write_s, 3),
+                "rows_per_s": rate(result["updated"], write_s),
+                "mismatches": sum(1 for item_id, price in zip(check.ids.tolist(), check.prices.tolist()) if expected.get(item_id) != price),
+            }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
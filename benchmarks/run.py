@@ -0,0 +1,128 @@
+# Load-test runner: generates (or reuses) a synthetic dataset, drives the
+# scripted scenarios against the app and writes a machine-readable baseline.
+#
+#   python -m benchmarks.run --database-url sqlite:///bench.db --scale small --output baseline.json
+#   python -m benchmarks.run --skip-datagen --compare baseline.json       # exit 1 on regression
+#   python -m benchmarks.run --base-url http://localhost:8000 --skip-datagen   # live server
+import argparse
+import json
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from benchmarks.common import bootstrap, git_revision, summarize
+
+
+def run_scenario(client, ctx, scenario, requests: int, concurrency: int, warmup: int)-> dict:
+    for _ in range(warmup):
+        scenario(client, ctx)
+
+    def worker(index: int, count: int):
+        ctx.seed_worker(f"{scenario.__name__}-{index}")
+        latencies, errors = [], 0
+        for _ in range(count):
+            start = time.perf_counter()
+            response = scenario(client, ctx)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+        return latencies, errors
+
+    shares = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, range(concurrency), shares))
+    wall_time = time.perf_counter() - started
+
+    latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+    return summarize(latencies, sum(errors for _, errors in results), wall_time)
+
+
+def compare(report: dict, baseline: dict, tolerance: float)-> list[str]:
+    regressions = []
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return regressions
+
+
+def main()-> int:
+    parser = argparse.ArgumentParser(description="Run the API benchmark scenarios")
+    parser.add_argument("--database-url", default="sqlite:///bench.db")
+    parser.add_argument("--base-url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--scale", default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-datagen", action="store_true", help="reuse the dataset already in the database")
+    parser.add_argument("--scenarios", default="browse,login,view_menu,place_order,admin_update")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    bootstrap(args.database_url)
+    from benchmarks import datagen, scenarios
+
+    scale = datagen.SCALES[args.scale]
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "database": args.database_url.split(":", 1)[0],
+            "target": args.base_url or "in-process",
+            "scale": args.scale,
+            "seed": args.seed,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+        },
+        "datagen": None,
+        "scenarios": {},
+    }
+
+    if not args.skip_datagen:
+        from app import database
+        report["datagen"] = datagen.generate(database.init_engine(), scale, seed=args.seed)
+
+    if args.base_url:
+        import httpx
+        client = httpx.Client(base_url=args.base_url, timeout=30)
+    else:
+        from fastapi.testclient import TestClient
+        from app.main import app
+        client = TestClient(app)
+
+    ctx = scenarios.Context(scale, args.seed)
+    with client:
+        scenarios.prepare(client, ctx)
+        for name in args.scenarios.split(","):
+            report["scenarios"][name] = run_scenario(
+                client, ctx, scenarios.SCENARIOS[name], args.requests, args.concurrency, args.warmup
+            )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    print(output)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            regressions = compare(report, json.load(fh), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
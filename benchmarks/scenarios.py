@@ -0,0 +1,100 @@
+# Scripted API scenarios. Each scenario is a function (client, ctx) -> response
+# making one request; the runner times calls and counts non-2xx as errors.
+import random
+import threading
+
+from benchmarks import datagen
+
+
+class Context:
+    def __init__(self, scale: datagen.Scale, seed: int):
+        self.scale = scale
+        self.seed = seed
+        self.user_tokens: list[str] = []
+        self.owner_tokens: dict[int, str] = {}
+        self._local = threading.local()
+
+    def seed_worker(self, worker: str)-> None:
+        # One generator per worker thread avoids locking; seeded from the worker's position
+        # (not the thread id, which changes between runs) so every run replays the same requests
+        self._local.rng = random.Random(f"{self.seed}-{worker}")
+
+    @property
+    def rng(self)-> random.Random:
+        rng = getattr(self._local, "rng", None)
+        if rng is None:
+            # Threads that are not workers (setup, warmup) share one stream
+            rng = self._local.rng = random.Random(f"{self.seed}-main")
+        return rng
+
+    def open_restaurant(self)-> int:
+        while True:
+            restaurant_id = self.rng.randint(1, self.scale.restaurants)
+            if datagen.is_restaurant_open(restaurant_id):
+                return restaurant_id
+
+    def available_items(self, restaurant_id: int)-> list[int]:
+        return [
+            item_id for item_id in datagen.menu_item_ids(self.scale, restaurant_id)[:self.scale.dishes]
+            if datagen.is_item_available(item_id)
+        ]
+
+    def customer_id(self)-> int:
+        return self.rng.randint(datagen.first_customer_id(self.scale), self.scale.users + self.scale.restaurants + 1)
+
+
+def _auth(token: str)-> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _login(client, user_id: int)-> str:
+    response = client.post("/login", data={"username": datagen.user_email(user_id), "password": datagen.PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def prepare(client, ctx: Context, users: int = 20, owners: int = 5)-> None:
+    # Tokens are fetched once so only the login scenario pays for password hashing
+    ctx.user_tokens = [_login(client, ctx.customer_id()) for _ in range(users)]
+    for restaurant_id in range(1, min(owners, ctx.scale.restaurants) + 1):
+        ctx.owner_tokens[restaurant_id] = _login(client, datagen.owner_id(restaurant_id))
+
+
+def browse(client, ctx: Context):
+    return client.get("/restaurants/", headers=_auth(ctx.rng.choice(ctx.user_tokens)))
+
+
+def login(client, ctx: Context):
+    return client.post("/login", data={"username": datagen.user_email(ctx.customer_id()), "password": datagen.PASSWORD})
+
+
+def view_menu(client, ctx: Context):
+    return client.get(f"/restaurants/{ctx.open_restaurant()}", headers=_auth(ctx.rng.choice(ctx.user_tokens)))
+
+
+def place_order(client, ctx: Context):
+    restaurant_id = ctx.open_restaurant()
+    items = ctx.available_items(restaurant_id)
+    picked = ctx.rng.sample(items, min(len(items), ctx.rng.randint(1, ctx.scale.items_per_order)))
+    payload = {
+        "restaurant_id": restaurant_id,
+        "delivery_address": "42 Benchmark Lane",
+        "items": [{"menu_item_id": item_id, "quantity": ctx.rng.randint(1, 3)} for item_id in picked],
+    }
+    return client.post("/orders/", json=payload, headers=_auth(ctx.rng.choice(ctx.user_tokens)))
+
+
+def admin_update(client, ctx: Context):
+    restaurant_id = ctx.rng.choice(list(ctx.owner_tokens))
+    item_id = ctx.rng.choice(ctx.available_items(restaurant_id))
+    payload = {"name": "", "price": float(ctx.rng.randrange(50, 600, 5)), "is_available": True}
+    return client.put(f"/restaurants/menu/{item_id}", json=payload, headers=_auth(ctx.owner_tokens[restaurant_id]))
+
+
+SCENARIOS = {
+    "browse": browse,
+    "login": login,
+    "view_menu": view_menu,
+    "place_order": place_order,
+    "admin_update": admin_update,
+}
@@ -0,0 +1,98 @@
+# Sparse fieldset savings: requests each listing / detail route with the full
+# response and with ?fields= subsets, in-process, and reports response bytes,
+# SQL statements (from the Server-Timing header) and latency for each variant.
+# The in-process caches are bypassed so every request runs its queries.
+#
+#   python -m benchmarks.sparse_fields --database-url sqlite:///bench.db --scale small --requests 100
+import argparse
+import json
+import re
+import time
+
+from benchmarks.common import bootstrap, summarize
+
+# (name, path) per route: the full response first, then the subsets a list screen would ask for
+VARIANTS = {
+    "restaurants": [
+        ("full", "/restaurants/?limit=100"),
+        ("id,name", "/restaurants/?limit=100&fields=id,name"),
+        ("id,name,rating", "/restaurants/?limit=100&fields=id,name,rating"),
+    ],
+    "menu": [
+        ("full", "/restaurants/menu"),
+        ("id,price", "/restaurants/menu?fields=id,price"),
+        ("id,price,dish.name", "/restaurants/menu?fields=id,price,dish.name"),
+    ],
+    "restaurant_detail": [
+        ("full", "/restaurants/{restaurant_id}"),
+        ("name,menu_items.price", "/restaurants/{restaurant_id}?fields=name,menu_items.id,menu_items.price"),
+        ("name,menu_items.dish.name", "/restaurants/{restaurant_id}?fields=name,menu_items.id,menu_items.dish.name"),
+    ],
+}
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def measure(client, headers: dict, path: str, requests: int)-> dict:
+    latencies, errors, size, queries = [], 0, 0, 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        latencies.append(time.perf_counter() - request_started)
+        if response.status_code != 200:
+            errors += 1
+        size = len(response.content)
+        match = QUERIES.search(response.headers.get("server-timing", ""))
+        queries = int(match.group(1)) if match else 0
+    result = summarize(latencies, errors, time.perf_counter() - started)
+    result.update({"bytes": size, "queries": queries})
+    return result
+
+
+def main()-> None:
+    parser = argparse.ArgumentParser(description="Measure the bytes and queries saved by ?fields=")
+    parser.add_argument("--database-url", default="sqlite:///bench.db")
+    parser.add_argument("--scale", default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-datagen", action="store_true", help="reuse the dataset already in the database")
+    parser.add_argument("--requests", type=int, default=100, help="measured requests per variant")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    bootstrap(args.database_url)
+    from fastapi.testclient import TestClient
+    from app import cache, database
+    from app.main import app
+    from benchmarks import datagen, scenarios
+
+    scale = datagen.SCALES[args.scale]
+    if not args.skip_datagen:
+        datagen.generate(database.init_engine(), scale, seed=args.seed)
+
+    report = {"scale": args.scale, "requests": args.requests, "routes": {}}
+    with TestClient(app) as client:
+        token = scenarios._login(client, datagen.first_customer_id(scale))
+        headers = {"Authorization": f"Bearer {token}"}
+        # Measure the queries themselves, not the per-worker caches
+        cache.suspend()
+
+        for route, variants in VARIANTS.items():
+            results = {}
+            for name, path in variants:
+                path = path.format(restaurant_id=1)
+                measure(client, headers, path, 5)       # warm up
+                results[name] = measure(client, headers, path, args.requests)
+            full = results["full"]
+            for name, result in results.items():
+                result["bytes_saved_pct"] = round(100 * (1 - result["bytes"] / full["bytes"]), 1) if full["bytes"] else 0.0
+            report["routes"][route] = results
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()